@@ -5,23 +5,48 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from fastapi.responses import RedirectResponse
+from fastapi.responses import Response
 from starlette.middleware.sessions import SessionMiddleware
 from pathlib import Path
+from datetime import date
+from typing import Any, List, Optional, Tuple
+from pydantic import ValidationError
 
 from .database import (
-    init_connection_pool, get_top_5_payouts, log_query, test_connection,
-    get_distinct_states, get_distinct_rto_options, get_distinct_vehicle_categories,
-    get_distinct_vehicle_types, get_distinct_fuel_types, get_distinct_policy_types,
+    init_connection_pool, get_payouts_and_log, test_connection, preload_rule_cache,
+    get_distinct_states, get_distinct_vehicle_categories,
+    get_distinct_vehicle_types, get_distinct_fuel_types,
     get_distinct_business_types, get_distinct_vehicle_ages, get_distinct_cc_slabs,
     get_distinct_gvw_slabs, get_distinct_watt_slabs, get_distinct_seating_capacities,
     get_distinct_ncb_slabs, get_distinct_cpa_covers, get_distinct_zero_depreciation,
-    get_distinct_trailers, get_distinct_makes, get_distinct_models
+    get_distinct_trailers, get_distinct_makes, get_distinct_models, get_payout_cache_stats, get_db_pool_stats,
+    get_query_log_stats, flush_query_log, get_query_log_summary, QUERY_LOG_ROLLUPS,
+    warm_payout_cache, get_warmup_stats, get_distinct_cache_stats, get_data_version,
+    get_facet_counts, preload_rto_master, get_rto_payload_json, start_query_log
 )
-from .schemas import PayoutResponse, CompanyPayout
-from .config import API_HOST, API_PORT, STATE_CODE_MAP, STATE_DISPLAY_NAMES, VEHICLE_CATEGORY_MAP
+from .db_async import run_db, get_db_executor_stats
+from .catalog import get_catalog, policy_options
+from .schemas import (
+    PayoutResponse, PayoutResponseV2, CompanyPayout, PayoutQuery, BatchPayoutResponse, BatchPayoutResponseV2
+)
+from .responses import FastJSONResponse, add_compression
+from .templates import PageTemplate, TemplateCache
+from .config import API_HOST, API_PORT, PAYOUT_TOP_N_DEFAULT, STATE_CODE_MAP, STATE_DISPLAY_NAMES
 import os
+import hashlib
 import logging
 
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+PAYOUT_TOP_N_MAX = int(os.getenv("PAYOUT_TOP_N_MAX", "50"))
+QUERY_LOG_SUMMARY_MAX_ROWS = int(os.getenv("QUERY_LOG_SUMMARY_MAX_ROWS", "1000"))
+DROPDOWN_CACHE_MAX_AGE = int(os.getenv("DROPDOWN_CACHE_MAX_AGE", "60"))
+RTO_CACHE_MAX_AGE = int(os.getenv("RTO_CACHE_MAX_AGE", "86400"))
+API_FAST_JSON = os.getenv("API_FAST_JSON", "false").lower() in ("1", "true", "yes")
+API_COMPRESSION = os.getenv("API_COMPRESSION", "off")
+API_COMPRESSION_MIN_SIZE = int(os.getenv("API_COMPRESSION_MIN_SIZE", "1024"))
+# Response class for JSON bodies (see backend/responses.py)
+JSON_RESPONSE = FastJSONResponse if API_FAST_JSON else JSONResponse
+
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
     level=LOG_LEVEL,
@@ -32,13 +57,16 @@ logger = logging.getLogger(__name__)
 # Initialize FastAPI app
 app = FastAPI(
     title="POSP Payout Checker",
-    description="Insurance Payout Commission Lookup System"
+    description="Insurance Payout Commission Lookup System",
+    default_response_class=JSON_RESPONSE,
 )
 
 SESSION_SECRET = os.getenv("SESSION_SECRET_KEY", "change-this-session-secret")
 LOGIN_USER_ID = os.getenv("APP_USER_ID")
 LOGIN_PASSWORD = os.getenv("APP_PASSWORD")
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET, same_site="lax")
+logger.info("API responses: fast JSON=%s, compression=%s",
+            API_FAST_JSON, add_compression(app, API_COMPRESSION, API_COMPRESSION_MIN_SIZE))
 
 # Initialize database connection pool on startup
 @app.on_event("startup")
@@ -51,32 +79,60 @@ async def startup_event():
     """
     auto_connect = os.getenv("DB_AUTO_CONNECT", "true").lower() in ("1", "true", "yes")
     logger.info("Starting up - DB auto-connect=%s", auto_connect)
+    logger.info("RTO master ready (%d states)", await run_db(preload_rto_master))
     if auto_connect:
         logger.info("Initializing database connection...")
-        init_connection_pool()
-        if not test_connection():
+        await run_db(init_connection_pool)
+        if not await run_db(test_connection):
             logger.warning("Database connection test failed. Check MySQL is running.")
         else:
             logger.info("Database connection ready")
+            start_query_log()
+            if os.getenv("PAYOUT_ENGINE", "sql").strip().lower() in ("memory", "numpy"):
+                logger.info("In-memory payout engine ready (%d rules)", await run_db(preload_rule_cache))
+            # Serve the dropdown catalog and the most frequent recent quotes from cache from the first request on
+            await run_db(warm_payout_cache)
     else:
         logger.info("Running in UI-only mode (DB disabled). Connect DB after Excel is ready.")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write out queued query_log rows before the process exits."""
+    await run_db(flush_query_log)
+
 ROOT = Path(__file__).resolve().parents[1]
 FRONTEND_DIR = ROOT / "frontend"
 
 # Mount static files for serving HTML, CSS, JS, images
 app.mount("/static", StaticFiles(directory=str(FRONTEND_DIR)), name="static")
 
+# entry.html / index.html, read once (see backend/templates.py)
+TEMPLATES = TemplateCache(FRONTEND_DIR, reload=os.getenv("TEMPLATE_RELOAD", "false").lower() in ("1", "true", "yes"))
+TEMPLATES.preload("entry.html", "index.html")
+
+
+def _page_response(request: Request, page: PageTemplate, **values: str) -> Response:
+    """Cached HTML page. Without placeholder values it carries an ETag and is sent gzipped when accepted."""
+    if any(values.values()):
+        return HTMLResponse(page.render(**values), headers={"Cache-Control": "no-store"})
+    gzipped = "gzip" in request.headers.get("accept-encoding", "")
+    etag = page.etag[:-1] + '-gz"' if gzipped else page.etag
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return HTMLResponse(page.gzip_body, headers=headers)
+    return HTMLResponse(page.body, headers=headers)
+
 @app.get("/", response_class=HTMLResponse)
 async def entry_page(request: Request):
     """Serve the entry page (landing page)"""
     if request.session.get("authenticated"):
         return RedirectResponse(url="/form", status_code=303)
-    with open(FRONTEND_DIR / "entry.html", "r", encoding="utf-8") as f:
-        html = f.read()
     login_error = request.query_params.get("error", "")
-    html = html.replace("__LOGIN_ERROR__", login_error)
-    return HTMLResponse(html)
+    return _page_response(request, TEMPLATES.get("entry.html"), LOGIN_ERROR=login_error)
 
 
 @app.post("/login")
@@ -108,16 +164,153 @@ async def get_form(request: Request):
     """Serve the main payout checker form"""
     if not request.session.get("authenticated"):
         return RedirectResponse(url="/?error=Please%20login%20to%20continue", status_code=303)
-    with open(FRONTEND_DIR / "index.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(f.read())
+    return _page_response(request, TEMPLATES.get("index.html"))
+
+
+def _api_login_required(request: Request) -> Optional[Response]:
+    """401 for API routes that need a logged-in session (the /form check), None when logged in."""
+    if request.session.get("authenticated"):
+        return None
+    return JSONResponse({"status": "error", "message": "Please login to continue"}, status_code=401)
+
+# ==================== RUNTIME STATS ====================
+
+@app.get("/api/stats")
+async def get_stats(request: Request):
+    """Runtime counters (result/dropdown caches, database worker usage, connection pool, query_log writer, warm-up).
+    Needs a login session."""
+    denied = _api_login_required(request)
+    if denied is not None:
+        return denied
+    return {
+        "payout_cache": get_payout_cache_stats(),
+        "distinct_cache": get_distinct_cache_stats(),
+        "db_executor": get_db_executor_stats(),
+        "db_pool": get_db_pool_stats(),
+        "query_log": get_query_log_stats(),
+        "warmup": get_warmup_stats(),
+    }
+
+
+@app.post("/api/cache/warmup")
+async def warm_cache(request: Request):
+    """Re-run the cache warm-up (e.g. from the import pipeline once an import is published). Needs a login session."""
+    denied = _api_login_required(request)
+    if denied is not None:
+        return denied
+    return {"status": "success", "warmup": await run_db(warm_payout_cache)}
+
+@app.get("/api/query-log/summary")
+async def get_query_log_rollup(
+    request: Request,
+    granularity: str = "daily",
+    since: str = None,
+    until: str = None,
+    group_by: str = None,
+    state: str = None,
+    rto: str = None,
+    vehicle_type: str = None,
+    fuel_type: str = None,
+    policy_type: str = None,
+    result_bucket: str = None,
+    limit: int = 100,
+):
+    """Query counts from the hourly/daily query_log rollups (scripts/rollup_query_log.py).
+
+    group_by is a comma list of state, rto, vehicle_type, fuel_type, policy_type,
+    result_bucket ('0', '1-4', '5+') and bucket (one row per hour/day). Needs a login session.
+    """
+    denied = _api_login_required(request)
+    if denied is not None:
+        return denied
+    if granularity not in QUERY_LOG_ROLLUPS:
+        return {"status": "error", "message": f"granularity must be one of: {', '.join(QUERY_LOG_ROLLUPS)}"}
+    if not 1 <= limit <= QUERY_LOG_SUMMARY_MAX_ROWS:
+        return {"status": "error", "message": f"limit must be between 1 and {QUERY_LOG_SUMMARY_MAX_ROWS}"}
+    filters = {
+        key: value for key, value in (
+            ("state", state), ("rto", rto), ("vehicle_type", vehicle_type),
+            ("fuel_type", fuel_type), ("policy_type", policy_type), ("result_bucket", result_bucket),
+        ) if value is not None
+    }
+    columns = [c.strip() for c in group_by.split(",") if c.strip()] if group_by else None
+    try:
+        rows = await run_db(get_query_log_summary, granularity, since, until, columns, filters, limit)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "granularity": granularity, "rows": rows}
 
 # ==================== DROPDOWN DATA ENDPOINTS ====================
 # These endpoints return distinct values from the database for UI dropdown population
 
+_DROPDOWN_PATHS = (
+    "/api/catalog", "/api/states", "/api/state-code/", "/api/vehicle-categories",
+    "/api/vehicle-types", "/api/fuel-types", "/api/policy-types", "/api/business-types",
+    "/api/vehicle-ages", "/api/cc-slabs", "/api/gvw-slabs", "/api/watt-slabs",
+    "/api/seating-capacities", "/api/ncb-slabs", "/api/cpa-covers", "/api/zero-depreciation",
+    "/api/trailers", "/api/makes", "/api/models",
+)
+
+
+def _dropdown_etag(version: tuple, request: Request) -> str:
+    """Strong ETag: active import (id, updated_at) + today + path + query with empty parameters dropped."""
+    query = sorted((k, v.strip()) for k, v in request.query_params.multi_items() if v.strip())
+    # date: facet counts follow the rules active today
+    digest = hashlib.sha1(repr((version, date.today(), request.url.path, query)).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+@app.middleware("http")
+async def dropdown_conditional_get(request: Request, call_next):
+    """ETag / Cache-Control on the dropdown endpoints; If-None-Match hits get a 304 without running the handler.
+
+    The data version comes from the in-process active-import state (re-read from
+    MySQL at most every ACTIVE_IMPORT_TTL seconds), so a 304 costs no query.
+    """
+    if request.method != "GET" or not request.url.path.startswith(_DROPDOWN_PATHS) or not _db_auto_connect():
+        return await call_next(request)
+    try:
+        version = await run_db(get_data_version)
+    except Exception:
+        # No data version (database unreachable): serve without validators
+        return await call_next(request)
+    etag = _dropdown_etag(version, request)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={DROPDOWN_CACHE_MAX_AGE}" if DROPDOWN_CACHE_MAX_AGE > 0 else "private, no-cache",
+    }
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
+async def _with_facets(body: dict, key: str, field: str, facets: bool, **upstream) -> dict:
+    """Add body["counts"] (insurers / active rules per option of body[key]) when ?facets=true."""
+    if facets:
+        filters = {k: v for k, v in upstream.items() if v}
+        body["counts"] = await run_db(get_facet_counts, field, body[key], filters)
+    return body
+
+
+@app.get("/api/catalog")
+async def get_dropdown_catalog():
+    """Every dropdown list of the form in one payload, rebuilt only when the active import changes.
+
+    Lists are the ones the endpoints below return for the same parameters (see backend/catalog.py).
+    """
+    return await run_db(get_catalog)
+
 @app.get("/api/states")
 async def get_states():
     """Get all distinct states (with display names)"""
-    return {"states": get_distinct_states()}
+    return {"states": await run_db(get_distinct_states)}
 
 @app.get("/api/state-code/{display_name}")
 async def get_state_code(display_name: str):
@@ -126,105 +319,265 @@ async def get_state_code(display_name: str):
     return {"code": state_code}
 
 @app.get("/api/rtos/{state}")
-async def get_rtos(state: str):
-    """Get all RTO codes for a state"""
-    rto_options = [
-        opt for opt in get_distinct_rto_options(state)
-        if str(opt.get("code", "")).strip().lower() != "others"
-    ]
-    return {
-        "rtos": [
-            opt.get("code")
-            for opt in rto_options
-            if opt.get("code") and str(opt.get("code")).strip().lower() != "others"
-        ],
-        "rto_options": rto_options,
+async def get_rtos(state: str, request: Request):
+    """Get all RTO codes for a state (prebuilt JSON of the compiled RTO master, cached by version)"""
+    version, body = get_rto_payload_json(state)
+    headers = {
+        "ETag": '"%s"' % hashlib.sha1(f"{version}:{state.strip().upper()}".encode("utf-8")).hexdigest(),
+        "Cache-Control": f"public, max-age={RTO_CACHE_MAX_AGE}",
     }
+    if _etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/vehicle-categories")
 async def get_vehicle_categories():
     """Get all vehicle categories"""
-    return {"categories": get_distinct_vehicle_categories()}
+    return {"categories": await run_db(get_distinct_vehicle_categories)}
 
 @app.get("/api/vehicle-types")
-async def get_vehicle_types(category: str = None):
-    """Get all vehicle types (optionally filtered by category)"""
-    return {"types": get_distinct_vehicle_types(category)}
+async def get_vehicle_types(category: str = None, facets: bool = False):
+    """Get all vehicle types (optionally filtered by category; facets=true adds per-option counts)"""
+    body = {"types": await run_db(get_distinct_vehicle_types, category)}
+    return await _with_facets(body, "types", "vehicle_type", facets, vehicle_category=category)
 
 @app.get("/api/fuel-types")
-async def get_fuel_types(vehicle_type: str = None, category: str = None):
-    """Get all fuel types (optionally filtered by vehicle type)"""
-    return {"fuels": get_distinct_fuel_types(vehicle_type, category)}
+async def get_fuel_types(vehicle_type: str = None, category: str = None, facets: bool = False):
+    """Get all fuel types (optionally filtered by vehicle type; facets=true adds per-option counts)"""
+    body = {"fuels": await run_db(get_distinct_fuel_types, vehicle_type, category)}
+    return await _with_facets(body, "fuels", "fuel_type", facets, vehicle_type=vehicle_type, vehicle_category=category)
 
 @app.get("/api/policy-types")
-async def get_policy_types(vehicle_type: str = None, fuel_type: str = None, category: str = None):
-    """Get all policy types (optionally filtered by vehicle_type and fuel_type)"""
-    policies = [p for p in get_distinct_policy_types(vehicle_type, fuel_type, category) if str(p).strip().lower() != 'all']
-    return {"policies": policies}
+async def get_policy_types(vehicle_type: str = None, fuel_type: str = None, category: str = None, facets: bool = False):
+    """Get all policy types (optionally filtered by vehicle_type and fuel_type; facets=true adds per-option counts)"""
+    body = {"policies": await run_db(policy_options, vehicle_type, fuel_type, category)}
+    return await _with_facets(body, "policies", "policy_type", facets,
+                              vehicle_type=vehicle_type, fuel_type=fuel_type, vehicle_category=category)
 
 @app.get("/api/business-types")
-async def get_business_types(vehicle_type: str = None, fuel_type: str = None, category: str = None):
-    """Get all business types (optionally filtered by vehicle_type and fuel_type)"""
-    return {"business_types": get_distinct_business_types(vehicle_type, fuel_type, category)}
+async def get_business_types(vehicle_type: str = None, fuel_type: str = None, category: str = None, facets: bool = False):
+    """Get all business types (optionally filtered by vehicle_type and fuel_type; facets=true adds per-option counts)"""
+    body = {"business_types": await run_db(get_distinct_business_types, vehicle_type, fuel_type, category)}
+    return await _with_facets(body, "business_types", "business_type", facets,
+                              vehicle_type=vehicle_type, fuel_type=fuel_type, vehicle_category=category)
 
 @app.get("/api/vehicle-ages")
 async def get_vehicle_ages():
     """Get all vehicle ages"""
-    # UI rule: show New first, then numeric ages 1..50
-    ages = ["New"] + [str(i) for i in range(1, 51)]
-    return {"ages": ages}
+    return {"ages": get_distinct_vehicle_ages()}
 
 @app.get("/api/cc-slabs")
-async def get_cc_slabs(vehicle_type: str = None, fuel_type: str = None, category: str = None):
-    """Get all CC slabs (optionally filtered by vehicle_type and fuel_type)"""
-    return {"cc_slabs": get_distinct_cc_slabs(vehicle_type, fuel_type, category)}
+async def get_cc_slabs(vehicle_type: str = None, fuel_type: str = None, category: str = None, facets: bool = False):
+    """Get all CC slabs (optionally filtered by vehicle_type and fuel_type; facets=true adds per-option counts)"""
+    body = {"cc_slabs": await run_db(get_distinct_cc_slabs, vehicle_type, fuel_type, category)}
+    return await _with_facets(body, "cc_slabs", "cc_slab", facets,
+                              vehicle_type=vehicle_type, fuel_type=fuel_type, vehicle_category=category)
 
 @app.get("/api/gvw-slabs")
 async def get_gvw_slabs(vehicle_type: str = None):
     """Get all GVW slabs (optionally filtered by vehicle_type)"""
-    return {"gvw_slabs": get_distinct_gvw_slabs(vehicle_type)}
+    return {"gvw_slabs": await run_db(get_distinct_gvw_slabs, vehicle_type)}
 
 @app.get("/api/watt-slabs")
-async def get_watt_slabs(vehicle_type: str = None, fuel_type: str = None, category: str = None):
-    """Get all Watt slabs (optionally filtered by vehicle_type and fuel_type)"""
-    return {"watt_slabs": get_distinct_watt_slabs(vehicle_type, fuel_type, category)}
+async def get_watt_slabs(vehicle_type: str = None, fuel_type: str = None, category: str = None, facets: bool = False):
+    """Get all Watt slabs (optionally filtered by vehicle_type and fuel_type; facets=true adds per-option counts)"""
+    body = {"watt_slabs": await run_db(get_distinct_watt_slabs, vehicle_type, fuel_type, category)}
+    return await _with_facets(body, "watt_slabs", "watt_slab", facets,
+                              vehicle_type=vehicle_type, fuel_type=fuel_type, vehicle_category=category)
 
 @app.get("/api/seating-capacities")
 async def get_seating_capacities(vehicle_type: str = None, fuel_type: str = None, category: str = None):
     """Get all seating capacities (optionally filtered by vehicle_type and fuel_type)"""
-    return {"capacities": get_distinct_seating_capacities(vehicle_type, fuel_type, category)}
+    return {"capacities": await run_db(get_distinct_seating_capacities, vehicle_type, fuel_type, category)}
 
 @app.get("/api/ncb-slabs")
 async def get_ncb_slabs(vehicle_type: str = None, fuel_type: str = None):
     """Get all NCB slabs (optionally filtered by vehicle_type and fuel_type)"""
-    return {"ncb_slabs": get_distinct_ncb_slabs(vehicle_type, fuel_type)}
+    return {"ncb_slabs": await run_db(get_distinct_ncb_slabs, vehicle_type, fuel_type)}
 
 @app.get("/api/cpa-covers")
 async def get_cpa_covers(vehicle_type: str = None, fuel_type: str = None):
     """Get all CPA covers (optionally filtered by vehicle_type and fuel_type)"""
-    return {"cpa_covers": get_distinct_cpa_covers(vehicle_type, fuel_type)}
+    return {"cpa_covers": await run_db(get_distinct_cpa_covers, vehicle_type, fuel_type)}
 
 @app.get("/api/zero-depreciation")
 async def get_zero_depreciation(vehicle_type: str = None, fuel_type: str = None):
     """Get all zero depreciation options (optionally filtered by vehicle_type and fuel_type)"""
-    return {"options": get_distinct_zero_depreciation(vehicle_type, fuel_type)}
+    return {"options": await run_db(get_distinct_zero_depreciation, vehicle_type, fuel_type)}
 
 @app.get("/api/trailers")
-async def get_trailers(vehicle_type: str = None):
-    """Get all trailer options (optionally filtered by vehicle_type)"""
-    return {"trailers": get_distinct_trailers(vehicle_type)}
+async def get_trailers(vehicle_type: str = None, facets: bool = False):
+    """Get all trailer options (optionally filtered by vehicle_type; facets=true adds per-option counts)"""
+    body = {"trailers": await run_db(get_distinct_trailers, vehicle_type)}
+    return await _with_facets(body, "trailers", "trailer", facets, vehicle_type=vehicle_type)
 
 @app.get("/api/makes")
-async def get_makes(vehicle_type: str = None, category: str = None, fuel_type: str = None):
-    """Get all makes (optionally filtered by vehicle type)"""
-    makes = get_distinct_makes(vehicle_type, category, fuel_type)
-    return {"makes": makes}
+async def get_makes(vehicle_type: str = None, category: str = None, fuel_type: str = None, facets: bool = False):
+    """Get all makes (optionally filtered by vehicle type; facets=true adds per-option counts)"""
+    makes = await run_db(get_distinct_makes, vehicle_type, category, fuel_type)
+    return await _with_facets({"makes": makes}, "makes", "make", facets,
+                              vehicle_type=vehicle_type, vehicle_category=category, fuel_type=fuel_type)
 
 @app.get("/api/models")
-async def get_models(make: str = None, vehicle_type: str = None, category: str = None):
-    """Get models for a specific make (optionally filtered by vehicle_type)"""
-    models = get_distinct_models(make, vehicle_type, category)
-    return {"models": models}
+async def get_models(make: str = None, vehicle_type: str = None, category: str = None, facets: bool = False):
+    """Get models for a specific make (optionally filtered by vehicle_type; facets=true adds per-option counts)"""
+    models = await run_db(get_distinct_models, make, vehicle_type, category)
+    return await _with_facets({"models": models}, "models", "model", facets,
+                              make=make, vehicle_type=vehicle_type, vehicle_category=category)
+
+def _payout_error(message: str, rto_code: str = "") -> PayoutResponse:
+    return PayoutResponse(
+        status="error",
+        message=message,
+        rto_code=rto_code,
+        top_3_payouts=[],
+        top_5_payouts=[],
+        total_companies=0
+    )
+
+
+def _validate_payout_rules(query: PayoutQuery) -> Optional[PayoutResponse]:
+    """Cross-field form rules (age/business/policy/fuel). Returns an error response or None."""
+    age_value = (query.vehicle_age or "").strip()
+    age_is_new = age_value.lower() == "new"
+    age_for_query = "1" if age_is_new else age_value
+    policy_value = "".join((query.policy_type or "").strip().lower().split())
+    business_value = (query.business_type or "").strip().lower()
+    if business_value in ("renewal", "rollover"):
+        business_value = "old"
+    is_bundle_policy = policy_value in ("bundle(1+3)", "bundle(1+5)", "bundle(5+5)")
+    category_value = (query.vehicle_category or "").strip().lower()
+    fuel_value = (query.fuel_type or "").strip().lower()
+    if "two wheeler" in category_value and fuel_value and fuel_value not in ("petrol", "ev"):
+        return _payout_error("For Two Wheeler, Fuel Type must be Petrol or EV only.")
+    if age_is_new and business_value != "new":
+        return _payout_error("Business Type must be New when Vehicle Age is New Vehicle.")
+    if business_value == "new" and not age_is_new:
+        return _payout_error("Vehicle Age must be New Vehicle when Business Type is New.")
+    if not age_is_new and business_value != "old":
+        return _payout_error("When Vehicle Age is not New Vehicle, Business Type must be Old.")
+    if is_bundle_policy and (business_value != "new" or not age_is_new):
+        return _payout_error("For Bundle policy, Business Type must be New and Vehicle Age must be New Vehicle.")
+    if not age_is_new:
+        try:
+            age_num = int(age_for_query)
+        except Exception:
+            age_num = None
+        if age_num is not None and age_num >= 16 and policy_value != "satp":
+            return _payout_error("For vehicle age 16 years and above, Policy Type must be SATP only.")
+    return None
+
+
+def _resolve_rto(query: PayoutQuery) -> Tuple[str, str, str]:
+    """Return (state_code, rto_code for the query, rto_code for display)."""
+    # Convert display name to state code if needed
+    state_code = STATE_CODE_MAP.get(query.state, query.state)
+    rto_number = query.rto_number
+
+    # RTO code for display (combined format)
+    rto_code_display = f"{state_code}{rto_number}" if state_code and rto_number else "N/A"
+    # RTO code for query (just the number as stored in DB)
+    # Strip state prefix if present (e.g., 'PY-02' → '02', '01' stays '01')
+    rto_code = rto_number
+    if rto_code and '-' in rto_code:
+        rto_code = rto_code.split('-', 1)[1]  # Extract everything after the first hyphen
+    if not rto_code or rto_code.strip() == '':
+        rto_code = "N/A"
+    return state_code, rto_code, rto_code_display
+
+
+def _build_payout_filters(query: PayoutQuery, state_code: str, rto_code: str, rto_code_display: str):
+    """Return (error_response, get_top_5_payouts kwargs); exactly one of them is None."""
+    # GVW input validation: allow decimals, enforce supported range.
+    gvw_value = query.gvw_value
+    if gvw_value is not None and str(gvw_value).strip() != "":
+        try:
+            gvw_num = float(gvw_value)
+        except ValueError:
+            return _payout_error("GVW Slab (Ton) must be a valid number.", rto_code_display), None
+        if gvw_num < 0 or gvw_num > 50:
+            return _payout_error("GVW highest is 50. If more than 50, enter 50.", rto_code_display), None
+    return None, query.payout_filters(state_code, rto_code)
+
+
+def _parse_batch_item(item: Any) -> Tuple[Optional[PayoutQuery], Optional[PayoutResponse]]:
+    """Return (query, error_response) for one batch item; exactly one of them is None."""
+    if not isinstance(item, dict):
+        return None, _payout_error("Each item must be a JSON object of check-payout fields.")
+    try:
+        return PayoutQuery.model_validate(item), None
+    except ValidationError as e:
+        fields = sorted({str(err['loc'][0]) for err in e.errors() if err.get('loc')})
+        return None, _payout_error(f"Missing or invalid field(s): {', '.join(fields)}.")
+
+
+def _ui_only_response(rto_code: str) -> PayoutResponse:
+    return PayoutResponse(
+        status="ui_only",
+        message="Database connection is disabled. Import cleaned Excel data and enable DB to get payout results.",
+        rto_code=rto_code,
+        top_3_payouts=[],
+        top_5_payouts=[],
+        total_companies=0
+    )
+
+
+def _payout_response(payouts: List[dict], rto_code_display: str, offset: int = 0) -> PayoutResponse:
+    if payouts:
+        if offset:
+            message = f"Found {len(payouts)} payout(s) - insurers ranked {offset + 1}-{payouts[-1]['rank']} by commission"
+        else:
+            message = f"Found {len(payouts)} payout(s) - Top {len(payouts)} insurers by commission"
+        return PayoutResponse(
+            status="success",
+            message=message,
+            rto_code=rto_code_display,
+            top_3_payouts=[CompanyPayout(**p) for p in payouts],
+            top_5_payouts=[CompanyPayout(**p) for p in payouts],
+            total_companies=len(payouts)
+        )
+    return PayoutResponse(
+        status="no_data",
+        message="No matching payout data found for this combination. Database may be empty.",
+        rto_code=rto_code_display,
+        top_3_payouts=[],
+        top_5_payouts=[],
+        total_companies=0
+    )
+
+
+def _payout_v2(response: PayoutResponse) -> PayoutResponseV2:
+    return PayoutResponseV2(
+        status=response.status,
+        message=response.message,
+        rto_code=response.rto_code,
+        payouts=response.top_5_payouts,
+        total_companies=response.total_companies,
+    )
+
+
+def _versioned(response: PayoutResponse, v: int):
+    """?v=2: the list once and no null fields, rendered directly; otherwise the v1 PayoutResponse."""
+    if v == 2:
+        return JSON_RESPONSE(content=_payout_v2(response).model_dump(exclude_none=True))
+    return response
+
+
+def _versioned_batch(response: BatchPayoutResponse, v: int):
+    if v == 2:
+        compact = BatchPayoutResponseV2(
+            status=response.status,
+            message=response.message,
+            total=response.total,
+            results=[_payout_v2(r) for r in response.results],
+        )
+        return JSON_RESPONSE(content=compact.model_dump(exclude_none=True))
+    return response
+
+
+def _db_auto_connect() -> bool:
+    return os.getenv("DB_AUTO_CONNECT", "true").lower() in ("1", "true", "yes")
+
 
 @app.post("/check-payout")
 async def check_payout(
@@ -247,81 +600,30 @@ async def check_payout(
     trailer: str = Form(None),
     make: str = Form(None),
     model: str = Form(None),
+    top_n: int = Form(PAYOUT_TOP_N_DEFAULT),  # insurers per page
+    offset: int = Form(0),  # insurers to skip (paging through the full ranked list)
+    v: int = 1,  # response shape: 1 (top_3_payouts + top_5_payouts) or 2 (PayoutResponseV2)
 ):
     """
     Check payout for given parameters using ALL parameters to match database records
     """
     try:
-        age_value = (vehicle_age or "").strip()
-        age_is_new = age_value.lower() == "new"
-        age_for_query = "1" if age_is_new else age_value
-        policy_value = "".join((policy_type or "").strip().lower().split())
-        business_value = (business_type or "").strip().lower()
-        if business_value in ("renewal", "rollover"):
-            business_type = "Old"
-            business_value = "old"
-        is_bundle_policy = policy_value in ("bundle(1+3)", "bundle(1+5)", "bundle(5+5)")
-        category_value = (vehicle_category or "").strip().lower()
-        fuel_value = (fuel_type or "").strip().lower()
-        if "two wheeler" in category_value and fuel_value and fuel_value not in ("petrol", "ev"):
-            return PayoutResponse(
-                status="error",
-                message="For Two Wheeler, Fuel Type must be Petrol or EV only.",
-                rto_code="",
-                top_3_payouts=[],
-                top_5_payouts=[],
-                total_companies=0
-            )
-        if age_is_new and business_value != "new":
-            return PayoutResponse(
-                status="error",
-                message="Business Type must be New when Vehicle Age is New Vehicle.",
-                rto_code="",
-                top_3_payouts=[],
-                top_5_payouts=[],
-                total_companies=0
-            )
-        if business_value == "new" and not age_is_new:
-            return PayoutResponse(
-                status="error",
-                message="Vehicle Age must be New Vehicle when Business Type is New.",
-                rto_code="",
-                top_3_payouts=[],
-                top_5_payouts=[],
-                total_companies=0
-            )
-        if not age_is_new and business_value != "old":
-            return PayoutResponse(
-                status="error",
-                message="When Vehicle Age is not New Vehicle, Business Type must be Old.",
-                rto_code="",
-                top_3_payouts=[],
-                top_5_payouts=[],
-                total_companies=0
-            )
-        if is_bundle_policy and (business_value != "new" or not age_is_new):
-            return PayoutResponse(
-                status="error",
-                message="For Bundle policy, Business Type must be New and Vehicle Age must be New Vehicle.",
-                rto_code="",
-                top_3_payouts=[],
-                top_5_payouts=[],
-                total_companies=0
-            )
-        if not age_is_new:
-            try:
-                age_num = int(age_for_query)
-            except Exception:
-                age_num = None
-            if age_num is not None and age_num >= 16 and policy_value != "satp":
-                return PayoutResponse(
-                    status="error",
-                    message="For vehicle age 16 years and above, Policy Type must be SATP only.",
-                    rto_code="",
-                    top_3_payouts=[],
-                    top_5_payouts=[],
-                    total_companies=0
-                )
+        if not 1 <= top_n <= PAYOUT_TOP_N_MAX:
+            return _versioned(_payout_error(f"top_n must be between 1 and {PAYOUT_TOP_N_MAX}."), v)
+        if offset < 0:
+            return _versioned(_payout_error("offset must be 0 or more."), v)
+
+        query = PayoutQuery(
+            state=state, rto_number=rto_number, vehicle_category=vehicle_category,
+            vehicle_type=vehicle_type, fuel_type=fuel_type, cc_slab=cc_slab,
+            seating_capacity=seating_capacity, gvw_slab=gvw_slab, gvw_value=gvw_value,
+            watt_slab=watt_slab, vehicle_age=vehicle_age, policy_type=policy_type,
+            business_type=business_type, ncb_slab=ncb_slab, cpa_cover=cpa_cover,
+            zero_dep=zero_dep, trailer=trailer, make=make, model=model,
+        )
+        error = _validate_payout_rules(query)
+        if error:
+            return _versioned(error, v)
 
         logger.debug(
             "Payout check request received: state=%s rto_number=%s vehicle_category=%s vehicle_type=%s fuel_type=%s policy_type=%s business_type=%s",
@@ -333,19 +635,8 @@ async def check_payout(
             policy_type,
             business_type,
         )
-        
-        # Convert display name to state code if needed
-        state_code = STATE_CODE_MAP.get(state, state)
-        
-        # RTO code for display (combined format)
-        rto_code_display = f"{state_code}{rto_number}" if state_code and rto_number else "N/A"
-        # RTO code for query (just the number as stored in DB)
-        # Strip state prefix if present (e.g., 'PY-02' → '02', '01' stays '01')
-        rto_code = rto_number
-        if rto_code and '-' in rto_code:
-            rto_code = rto_code.split('-', 1)[1]  # Extract everything after the first hyphen
-        if not rto_code or rto_code.strip() == '':
-            rto_code = "N/A"
+
+        state_code, rto_code, rto_code_display = _resolve_rto(query)
 
         logger.info(
             "Payout check request - State: %s (%s), RTO: %s, Vehicle: %s, Fuel: %s",
@@ -356,103 +647,97 @@ async def check_payout(
             fuel_type,
         )
 
-        auto_connect = os.getenv("DB_AUTO_CONNECT", "true").lower() in ("1", "true", "yes")
-
         # If DB auto-connect is disabled, do not call database. Serve UI-only response.
-        if not auto_connect:
+        if not _db_auto_connect():
             logger.info("DB disabled - returning UI-only response")
-            return PayoutResponse(
-                status="ui_only",
-                message="Database connection is disabled. Import cleaned Excel data and enable DB to get payout results.",
-                rto_code=rto_code,
-                top_3_payouts=[],
-                top_5_payouts=[],
-                total_companies=0
-            )
+            return _versioned(_ui_only_response(rto_code), v)
 
-        # Map vehicle category display name to code if needed (DB may store code)
-        vehicle_category_code = VEHICLE_CATEGORY_MAP.get(vehicle_category, vehicle_category)
-
-        # GVW input validation: allow decimals, enforce supported range.
-        if gvw_value is not None and str(gvw_value).strip() != "":
-            try:
-                gvw_num = float(gvw_value)
-            except ValueError:
-                return PayoutResponse(
-                    status="error",
-                    message="GVW Slab (Ton) must be a valid number.",
-                    rto_code=rto_code_display,
-                    top_3_payouts=[],
-                    top_5_payouts=[],
-                    total_companies=0
-                )
-            if gvw_num < 0 or gvw_num > 50:
-                return PayoutResponse(
-                    status="error",
-                    message="GVW highest is 50. If more than 50, enter 50.",
-                    rto_code=rto_code_display,
-                    top_3_payouts=[],
-                    top_5_payouts=[],
-                    total_companies=0
-                )
-
-        # Query database using all parameters
-        payouts = get_top_5_payouts(
-            state=state_code,
-            rto_code=rto_code,
-            vehicle_type=vehicle_type,
-            fuel_type=fuel_type if fuel_type and fuel_type.lower() != 'others' else None,  # 'Others' → None (no filter)
-            policy_type=policy_type,
-            vehicle_age=age_for_query,
-            business_type=business_type,
-            vehicle_category=vehicle_category_code,
-            cc_slab=cc_slab if cc_slab and cc_slab.lower() != 'others' else None,  # 'Others' → None (no filter)
-            gvw_slab=gvw_slab,
-            gvw_value=gvw_value,
-            watt_slab=watt_slab if watt_slab and watt_slab.lower() != 'others' else None,  # 'Others' → None (no filter)
-            seating_capacity=seating_capacity if seating_capacity and seating_capacity.lower() != 'others' else None,  # 'Others' → N/A (wildcard)
-            ncb_slab=ncb_slab,
-            cpa_cover=cpa_cover,
-            zero_depreciation=zero_dep,
-            trailer=trailer or None,
-            make=make if make and str(make).strip().lower() not in ('other', 'others', '') else None,
-            model=model if model and str(model).strip().lower() not in ('other', 'others', '') else None
-        )
+        error, filters = _build_payout_filters(query, state_code, rto_code, rto_code_display)
+        if error:
+            return _versioned(error, v)
 
-        # Log this query for analytics
-        log_query(state_code, rto_code, vehicle_type, fuel_type, policy_type, len(payouts))
+        # Query database using all parameters and log it for analytics (one pooled connection)
+        log_entry = (state_code, rto_code, vehicle_type, fuel_type, policy_type)
+        payouts = (await run_db(get_payouts_and_log, [filters], [log_entry], top_n=top_n, offset=offset))[0]
 
         # Prepare response
+        response = _payout_response(payouts, rto_code_display, offset)
         if payouts:
-            response = PayoutResponse(
-                status="success",
-                message=f"Found {len(payouts)} payout(s) - Top {len(payouts)} insurers by commission",
-                rto_code=rto_code_display,
-                top_3_payouts=[CompanyPayout(**p) for p in payouts],
-                top_5_payouts=[CompanyPayout(**p) for p in payouts],
-                total_companies=len(payouts)
-            )
             logger.info("Found %d payouts", len(payouts))
         else:
-            response = PayoutResponse(
-                status="no_data",
-                message="No matching payout data found for this combination. Database may be empty.",
-                rto_code=rto_code_display,
-                top_3_payouts=[],
-                top_5_payouts=[],
-                total_companies=0
-            )
             logger.info("No payouts found for this combination")
 
-        return response
+        return _versioned(response, v)
 
     except Exception as e:
         logger.exception("Error processing payout request")
-        return PayoutResponse(
+        return _versioned(_payout_error(f"Error processing request: {str(e)}"), v)
+
+
+@app.post("/api/check-payout/batch", response_model=BatchPayoutResponse)
+async def check_payout_batch(queries: List[Any], v: int = 1):
+    """Evaluate many quotes (JSON array of check-payout inputs) in one pass.
+
+    Each item is parsed on its own, so a missing or null field only fails that
+    item. Items get the same validation as /check-payout; valid items are evaluated
+    together against one import snapshot and their query_log rows queued together.
+    Results are returned in input order with a per-item status; ?v=2 returns them in the
+    PayoutResponseV2 shape.
+    """
+    if len(queries) > BATCH_MAX_ITEMS:
+        return _versioned_batch(BatchPayoutResponse(
             status="error",
-            message=f"Error processing request: {str(e)}",
-            rto_code="",
-            top_3_payouts=[],
-            top_5_payouts=[],
-            total_companies=0
-        )
+            message=f"Batch too large: {len(queries)} items (max {BATCH_MAX_ITEMS}).",
+            total=len(queries),
+            results=[],
+        ), v)
+
+    results: List[Optional[PayoutResponse]] = [None] * len(queries)
+    pending = []  # (position, filters, rto_code_display, log entry)
+    auto_connect = _db_auto_connect()
+    for pos, item in enumerate(queries):
+        query, error = _parse_batch_item(item)
+        if error:
+            results[pos] = error
+            continue
+        try:
+            error = _validate_payout_rules(query)
+            if error:
+                results[pos] = error
+                continue
+            state_code, rto_code, rto_code_display = _resolve_rto(query)
+            if not auto_connect:
+                results[pos] = _ui_only_response(rto_code)
+                continue
+            error, filters = _build_payout_filters(query, state_code, rto_code, rto_code_display)
+            if error:
+                results[pos] = error
+                continue
+            log_entry = (state_code, rto_code, query.vehicle_type, query.fuel_type, query.policy_type)
+            pending.append((pos, filters, rto_code_display, log_entry))
+        except Exception as e:
+            logger.exception("Error validating batch payout item %d", pos)
+            results[pos] = _payout_error(f"Error processing request: {str(e)}")
+
+    if pending:
+        try:
+            batch_payouts = await run_db(
+                get_payouts_and_log,
+                [filters for _, filters, _, _ in pending],
+                [log_entry for _, _, _, log_entry in pending],
+            )
+        except Exception as e:
+            logger.exception("Error processing payout batch")
+            for pos, _, _, _ in pending:
+                results[pos] = _payout_error(f"Error processing request: {str(e)}")
+        else:
+            for (pos, _, rto_code_display, _), payouts in zip(pending, batch_payouts):
+                results[pos] = _payout_response(payouts, rto_code_display)
+
+    logger.info("Batch payout check: %d item(s), %d evaluated", len(queries), len(pending))
+    return _versioned_batch(BatchPayoutResponse(
+        status="success",
+        message=f"Processed {len(queries)} quote(s)",
+        total=len(queries),
+        results=results,
+    ), v)
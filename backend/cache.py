@@ -0,0 +1,85 @@
+"""Small in-process LRU/TTL cache whose entries are tagged with the data version they were computed for.
+
+Used by `database.get_top_5_payouts` with the active import id as the tag: once a
+newer completed import appears every older entry is treated as stale and dropped.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class VersionedLRUCache:
+    """Thread-safe LRU cache with a per-entry TTL and a version tag.
+
+    max_size <= 0 disables caching (every lookup is a miss, nothing is stored).
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 300.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _sync_version(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = version
+
+    def get(self, version: Hashable, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            self._sync_version(version)
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, version: Hashable, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._sync_version(version)
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'version': self._version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
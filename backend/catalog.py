@@ -0,0 +1,101 @@
+"""Precomputed dropdown catalog for the form (`GET /api/catalog`).
+
+One payload holds every option list the form requests while it is filled in:
+
+    tree[category]['vehicle_types']
+    tree[category]['by_type'][vehicle_type]      fuels, trailers, models, models_by_make
+        ['by_fuel'][fuel_type]                   policies, business_types, cc_slabs, watt_slabs, makes
+
+'' stands for a parameter the form leaves empty (Private Car has no vehicle
+type; the Two Wheeler make fallback has none either). Every list comes from the
+same `database.get_distinct_*` call the matching /api endpoint makes, so the
+frontend can answer those requests locally. The payload is built once per data
+version (active import id + updated_at) and reused until that changes.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from . import database as db
+from .config import STATE_CODE_MAP
+
+
+def policy_options(vehicle_type: Optional[str], fuel_type: Optional[str], category: Optional[str]) -> List[str]:
+    """/api/policy-types list ('All' is a wildcard, not an option)."""
+    return [
+        p for p in db.get_distinct_policy_types(vehicle_type, fuel_type, category)
+        if str(p).strip().lower() != 'all'
+    ]
+
+
+def rto_payload(state: str) -> Dict[str, Any]:
+    """/api/rtos/{state} body ('Others' is added by the form itself), prebuilt in the compiled RTO master."""
+    return db.get_rto_payload(state)
+
+
+def _fuel_entry(vehicle_type: str, fuel: str, category: str) -> Dict[str, List[str]]:
+    return {
+        'policies': policy_options(vehicle_type, fuel, category),
+        'business_types': db.get_distinct_business_types(vehicle_type, fuel, category),
+        'cc_slabs': db.get_distinct_cc_slabs(vehicle_type, fuel, category),
+        'watt_slabs': db.get_distinct_watt_slabs(vehicle_type, fuel, category),
+        'makes': db.get_distinct_makes(vehicle_type, category, fuel),
+    }
+
+
+def _type_entry(vehicle_type: str, category: str, fuels: List[str]) -> Dict[str, Any]:
+    by_fuel = {fuel: _fuel_entry(vehicle_type, fuel, category) for fuel in ['', *fuels]}
+    makes = {make for entry in by_fuel.values() for make in entry['makes']}
+    return {
+        'fuels': db.get_distinct_fuel_types(vehicle_type, category),
+        'trailers': db.get_distinct_trailers(vehicle_type),
+        'models': db.get_distinct_models(None, vehicle_type, category),
+        'models_by_make': {make: db.get_distinct_models(make, vehicle_type, category) for make in sorted(makes)},
+        'by_fuel': by_fuel,
+    }
+
+
+def build_catalog() -> Dict[str, Any]:
+    """Full option tree for the active import (see module docstring)."""
+    import_id, updated_at = db.get_data_version()
+    tree: Dict[str, Any] = {}
+    for category in db.get_distinct_vehicle_categories():
+        vehicle_types = db.get_distinct_vehicle_types(category)
+        type_fuels = {vt: db.get_distinct_fuel_types(vt, category) for vt in ['', *vehicle_types]}
+        # The type-less entry also answers the Two Wheeler make fallback for any fuel of the category
+        all_fuels = sorted({fuel for fuels in type_fuels.values() for fuel in fuels})
+        tree[category] = {
+            'vehicle_types': vehicle_types,
+            'by_type': {
+                vt: _type_entry(vt, category, all_fuels if vt == '' else fuels)
+                for vt, fuels in type_fuels.items()
+            },
+        }
+    states = db.get_distinct_states()
+    return {
+        'version': f"{import_id}:{updated_at.isoformat() if updated_at else ''}",
+        'states': states,
+        'state_codes': {s: STATE_CODE_MAP.get(s, s) for s in states},
+        'rtos': {code: rto_payload(code) for code in sorted(db._RTO_STATES_WITH_CODES)},
+        'categories': list(tree),
+        'vehicle_ages': db.get_distinct_vehicle_ages(),
+        'tree': tree,
+    }
+
+
+_CATALOG: Optional[tuple] = None  # (data version, payload)
+_CATALOG_LOCK = threading.Lock()
+
+
+def get_catalog() -> Dict[str, Any]:
+    """Cached build_catalog(); rebuilt (once, under a lock) when the data version changes."""
+    global _CATALOG
+    version = db.get_data_version()
+    cached = _CATALOG
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _CATALOG_LOCK:
+        cached = _CATALOG
+        if cached is None or cached[0] != version:
+            cached = (version, build_catalog())
+            _CATALOG = cached
+    return cached[1]
@@ -74,5 +74,47 @@ VEHICLE_CATEGORY_DISPLAY = {
     'Misc': 'Miscellaneous',
 }
 
+# raw_json key -> typed `rates` column filled by the importer (indexed for filtering)
+RATE_ATTRIBUTE_COLUMNS = {
+    'State': 'state',
+    'Vehicle_Category': 'vehicle_category',
+    'Vehicle_Type': 'vehicle_type',
+    'Fuel_Type': 'fuel_type',
+    'Policy_Type': 'policy_type',
+    'Business_Type': 'business_type',
+    'CC_Slab': 'cc_slab',
+    'GVW_Slab': 'gvw_slab',
+    'Watt_Slab': 'watt_slab',
+    'Seating_Capacity': 'seating_capacity',
+    'NCB_Slab': 'ncb_slab',
+    'CPA_Cover': 'cpa_cover',
+    'Zero_Depreciation': 'zero_depreciation',
+    'Trailer': 'trailer',
+    'Make': 'make',
+    'Model': 'model',
+}
+
+# raw_json keys exploded into the rate_token side table (comma lists and Except/Declined cells)
+RATE_TOKEN_FIELDS = [
+    'State',
+    'Vehicle_Category',
+    'Vehicle_Type',
+    'Fuel_Type',
+    'Policy_Type',
+    'Business_Type',
+    'CC_Slab',
+    'NCB_Slab',
+    'CPA_Cover',
+    'Zero_Depreciation',
+    'Trailer',
+    'Make',
+    'Model',
+]
+# rate_token.token is VARCHAR(191): longer tokens are skipped (never matched), not truncated
+RATE_TOKEN_MAX_LEN = 191
+
+# Insurers ranked per /check-payout page unless the request sets top_n
+PAYOUT_TOP_N_DEFAULT = 5
+
 API_HOST = '0.0.0.0'
 API_PORT = 8000
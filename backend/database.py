@@ -3,29 +3,60 @@
 Implements minimal functions referenced by `app.py`:
 - init_connection_pool()
 - test_connection()
-- get_top_5_payouts(...)
-- get_distinct_* helpers
-- log_query()
+- get_top_5_payouts(...) / get_top_5_payouts_batch([...])
+- get_distinct_* helpers (memoized per active import, get_distinct_cache_stats())
+- log_query() / log_queries() (queued, written by a background thread)
+- get_query_log_summary() (rollups built by scripts/rollup_query_log.py)
+- preload_rule_cache() (optional in-memory engine + bitmap index, PAYOUT_ENGINE=memory|numpy)
+- get_payout_cache_stats() (result cache for get_top_5_payouts)
+- warm_payout_cache() (replays frequent query_log filter sets at startup / after an import)
+- get_rule_snapshot() / compute_payouts() (used by scripts/build_payout_cube.py)
 
 This module uses `mysql.connector` and expects DB creds in env:
 DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME
 """
 import os
+import json
 import logging
-import ast
+import functools
+import inspect
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import List, Any, Optional, Dict
+from typing import List, Any, Optional, Dict, Callable, Tuple
 import mysql.connector
 from mysql.connector import pooling, Error
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
 
+from .cache import VersionedLRUCache
+from .payout_cube import cube_key, is_valid_on, validity_window
+from .query_log import QueryLogWriter
+from .config import PAYOUT_TOP_N_DEFAULT, RATE_ATTRIBUTE_COLUMNS, RATE_TOKEN_FIELDS, RATE_TOKEN_MAX_LEN
+from .rule_index import RuleIndex, iter_bits
+from . import rto_master
+
+try:  # numpy is only needed for PAYOUT_ENGINE=numpy
+    from .vector_engine import VectorRuleTable
+except ImportError:  # pragma: no cover - depends on the deployment
+    VectorRuleTable = None
+
 # Load .env if present so DB credentials from workspace are picked up
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 _POOL: Optional[pooling.MySQLConnectionPool] = None
+# Checkout slots (one per pooled connection) so callers wait up to DB_POOL_TIMEOUT
+# instead of failing immediately when every connection is in use.
+_POOL_SLOTS: Optional[threading.BoundedSemaphore] = None
+_POOL_STATS_LOCK = threading.Lock()
+_POOL_STATS = {'checkouts': 0, 'in_use': 0, 'waits': 0, 'exhausted': 0, 'max_wait_seconds': 0.0}
 
 # Mapping of parameter names to correct JSON keys (handle special cases)
 _JSON_KEY_MAP = {
@@ -46,8 +77,15 @@ _JSON_KEY_MAP = {
     'model': 'Model',
 }
 
+# raw_json key -> typed rates column (see db/schema.sql); other keys fall back to JSON_EXTRACT
+_ATTR_COLUMNS = {**RATE_ATTRIBUTE_COLUMNS, 'Company': 'company', 'Conditions': 'condition_text'}
+
+# Fields that can be comma-separated: Petrol,Diesel means applicable for Petrol OR Diesel (whole-token match)
+# NOTE: cc_slab is here (not a simple slab filter) to support composite values like "150 to 350 CC, 75 to 150 CC"
+_COMMA_SEP_FIELDS = ['fuel_type', 'vehicle_type', 'vehicle_category', 'policy_type', 'ncb_slab', 'cpa_cover', 'zero_depreciation', 'trailer', 'cc_slab']
+
 _RTO_STATES_WITH_CODES = {'TN', 'KA', 'KL', 'AP', 'MH', 'TS', 'PY'}
-_RTO_MASTER_CACHE: Optional[dict] = None
+_RTO_MASTER_CACHE: Optional[dict] = None  # compiled RTO master (see _load_rto_master)
 _VEHICLE_TYPE_CANONICAL_MAP = {
     'digger & boring machine': 'Digger and Boring machine',
     'digger and boring machine': 'Digger and Boring machine',
@@ -65,6 +103,20 @@ _VEHICLE_TYPE_VARIANTS = {
 }
 
 
+def _json_key(name: str) -> str:
+    """Map a filter parameter name to its raw_json key."""
+    return _JSON_KEY_MAP.get(name, name.replace('_', ' ').title().replace(' ', '_'))
+
+
+def _attr_expr(key: str, alias: str = 'r') -> str:
+    """SQL expression for a rate attribute: its typed column, or a raw_json lookup for unmapped keys."""
+    prefix = f"{alias}." if alias else ""
+    column = _ATTR_COLUMNS.get(key)
+    if column:
+        return f"{prefix}{column}"
+    return f"JSON_UNQUOTE(JSON_EXTRACT({prefix}raw_json, '$.{key}'))"
+
+
 def _normalize_rto_code(code: Any) -> str:
     """Normalize raw RTO code to comparable dropdown code."""
     c = str(code).strip().upper()
@@ -104,87 +156,100 @@ def _expand_filter_values(filter_column: str, filter_value: str) -> List[str]:
     return variants
 
 
-def _load_rto_master() -> dict:
-    """Read RTO master mapping from data/extraction/district_rto file.
-
-    Returns:
-        {
-            "TN": {
-                "01": "CHENNAI CENTRAL RTO",
-                ...
-            },
-            ...
+def _clean_rto_master(parsed: dict) -> Dict[str, Dict[str, str]]:
+    """{state: {code: district}} for the states with RTO dropdowns, codes normalized."""
+    data: Dict[str, Dict[str, str]] = {}
+    for state, code_map in parsed.items():
+        if not isinstance(code_map, dict):
+            continue
+        sc = str(state).strip().upper()
+        if sc not in _RTO_STATES_WITH_CODES:
+            continue
+        cleaned_map: Dict[str, str] = {}
+        for code, district_name in code_map.items():
+            c = _normalize_rto_code(code)
+            if not c:
+                continue
+            name = str(district_name).strip() if district_name is not None else ""
+            # Keep the first non-empty district name if duplicates exist.
+            if c not in cleaned_map or (not cleaned_map[c] and name):
+                cleaned_map[c] = name
+        data[sc] = cleaned_map
+    return data
+
+
+def build_rto_master(source: Path = rto_master.SOURCE_PATH) -> dict:
+    """Parse district_rto into the compiled artifact (see backend/rto_master.py)."""
+    parsed = rto_master.parse_source(source)
+    states = {}
+    for state, state_map in sorted(_clean_rto_master(parsed).items()):
+        options = []
+        for rto_code in sorted(state_map.keys(), key=_rto_sort_key):
+            district = (state_map.get(rto_code) or "").strip()
+            options.append({
+                "code": rto_code,
+                "name": district,
+                "label": f"{rto_code} - {district}" if district else rto_code,
+            })
+        # 'Others' is added by the form itself
+        shown = [opt for opt in options if opt["code"].lower() != "others"]
+        states[state] = {
+            'options': options,
+            'payload': {"rtos": [opt["code"] for opt in shown], "rto_options": shown},
         }
+    return {
+        'format': rto_master.ARTIFACT_FORMAT,
+        'version': rto_master.source_version(source) or '',
+        'source': parsed,
+        'states': states,
+    }
+
+
+def _load_rto_master() -> dict:
+    """Compiled RTO master plus each state's /api/rtos body as JSON bytes, loaded once per process.
+
+    Read from data/extraction/rto_master.json; parses district_rto only when
+    that artifact is missing or stale.
     """
     global _RTO_MASTER_CACHE
     if _RTO_MASTER_CACHE is not None:
         return _RTO_MASTER_CACHE
+    master = rto_master.load_artifact()
+    if master is None:
+        logger.info("Compiling the RTO master from %s", rto_master.SOURCE_PATH)
+        master = build_rto_master()
+    master['payload_bytes'] = {
+        state: json.dumps(entry['payload'], separators=(',', ':')).encode('utf-8')
+        for state, entry in master['states'].items()
+    }
+    _RTO_MASTER_CACHE = master
+    return _RTO_MASTER_CACHE
 
-    path = Path(__file__).resolve().parents[1] / 'data' / 'extraction' / 'district_rto'
-    if not path.exists():
-        _RTO_MASTER_CACHE = {}
-        return _RTO_MASTER_CACHE
 
-    text = path.read_text(encoding='utf-8', errors='ignore')
-    marker = 'const rtoMasterData ='
-    start = text.find(marker)
-    if start < 0:
-        _RTO_MASTER_CACHE = {}
-        return _RTO_MASTER_CACHE
+def preload_rto_master() -> int:
+    """Load the compiled RTO master. Returns the number of states with RTO options."""
+    return len(_load_rto_master()['states'])
 
-    brace_start = text.find('{', start)
-    if brace_start < 0:
-        _RTO_MASTER_CACHE = {}
-        return _RTO_MASTER_CACHE
 
-    depth = 0
-    brace_end = -1
-    for i in range(brace_start, len(text)):
-        ch = text[i]
-        if ch == '{':
-            depth += 1
-        elif ch == '}':
-            depth -= 1
-            if depth == 0:
-                brace_end = i
-                break
-
-    if brace_end < 0:
-        _RTO_MASTER_CACHE = {}
-        return _RTO_MASTER_CACHE
+def get_rto_payload(state: str) -> dict:
+    """/api/rtos/{state} body: sorted codes and options without 'Others'."""
+    entry = _load_rto_master()['states'].get(str(state or '').strip().upper())
+    return entry['payload'] if entry else {"rtos": [], "rto_options": []}
 
-    obj_str = text[brace_start:brace_end + 1]
-    try:
-        parsed = ast.literal_eval(obj_str)
-    except Exception:
-        parsed = {}
 
-    data: Dict[str, Dict[str, str]] = {}
-    if isinstance(parsed, dict):
-        for state, code_map in parsed.items():
-            if not isinstance(code_map, dict):
-                continue
-            sc = str(state).strip().upper()
-            if sc not in _RTO_STATES_WITH_CODES:
-                continue
-            cleaned_map: Dict[str, str] = {}
-            for code, district_name in code_map.items():
-                c = _normalize_rto_code(code)
-                if not c:
-                    continue
-                name = str(district_name).strip() if district_name is not None else ""
-                # Keep the first non-empty district name if duplicates exist.
-                if c not in cleaned_map or (not cleaned_map[c] and name):
-                    cleaned_map[c] = name
-            data[sc] = cleaned_map
+def get_rto_payload_json(state: str) -> Tuple[str, bytes]:
+    """(RTO master version, prebuilt JSON bytes of get_rto_payload(state))."""
+    master = _load_rto_master()
+    body = master['payload_bytes'].get(str(state or '').strip().upper(), b'{"rtos":[],"rto_options":[]}')
+    return master['version'], body
 
-    _RTO_MASTER_CACHE = data
-    return _RTO_MASTER_CACHE
 
-def init_connection_pool(pool_name: str = 'posp_pool', pool_size: int = 5):
-    global _POOL
+def init_connection_pool(pool_name: str = 'posp_pool', pool_size: Optional[int] = None):
+    """Create the connection pool (size: pool_size, else DB_POOL_SIZE env, default 5)."""
+    global _POOL, _POOL_SLOTS
     if _POOL is not None:
         return
+    pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', '5'))
     # Support both DB_PASS and DB_PASSWORD environment variable names
     db_pass = os.getenv('DB_PASS') or os.getenv('DB_PASSWORD') or ''
     db_host = os.getenv('DB_HOST', '127.0.0.1')
@@ -213,47 +278,332 @@ def init_connection_pool(pool_name: str = 'posp_pool', pool_size: int = 5):
         'database': db_name,
     }
     _POOL = pooling.MySQLConnectionPool(pool_name=pool_name, pool_size=pool_size, **cfg)
+    _POOL_SLOTS = threading.BoundedSemaphore(pool_size)
+
+
+class _PooledConnection:
+    """A checked-out pool connection; close() returns it and frees its checkout slot."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            self._conn.close()
+        finally:
+            _release_pool_slot()
+
+
+def _release_pool_slot() -> None:
+    with _POOL_STATS_LOCK:
+        _POOL_STATS['in_use'] -= 1
+    _POOL_SLOTS.release()
 
 
 def get_conn():
+    """Check out a pooled connection, waiting up to DB_POOL_TIMEOUT seconds (default 10) when all are in use."""
     if _POOL is None:
         init_connection_pool()
-    return _POOL.get_connection()
+    started = time.monotonic()
+    if not _POOL_SLOTS.acquire(blocking=False):
+        timeout = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+        acquired = _POOL_SLOTS.acquire(timeout=timeout)
+        waited = time.monotonic() - started
+        with _POOL_STATS_LOCK:
+            _POOL_STATS['waits'] += 1
+            _POOL_STATS['max_wait_seconds'] = max(_POOL_STATS['max_wait_seconds'], waited)
+            if not acquired:
+                _POOL_STATS['exhausted'] += 1
+        if not acquired:
+            logger.warning("Connection pool exhausted: no connection free after %.1fs", waited)
+            raise PoolError(f"Connection pool exhausted (waited {waited:.1f}s)")
+    with _POOL_STATS_LOCK:
+        _POOL_STATS['checkouts'] += 1
+        _POOL_STATS['in_use'] += 1
+    try:
+        return _PooledConnection(_POOL.get_connection())
+    except Exception:
+        _release_pool_slot()
+        raise
 
 
-def test_connection() -> bool:
+@contextmanager
+def db_connection(conn=None):
+    """Yield conn when given, else a pooled connection that is returned afterwards.
+
+    Lets one request share a single checkout across several helpers.
+    """
+    if conn is not None:
+        yield conn
+        return
+    conn = get_conn()
     try:
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('SELECT 1')
-        cur.fetchall()
-        cur.close()
+        yield conn
+    finally:
         conn.close()
+
+
+def get_db_pool_stats() -> dict:
+    """Pool size/timeout plus checkout, wait and exhaustion counters."""
+    with _POOL_STATS_LOCK:
+        stats = dict(_POOL_STATS)
+    stats['max_wait_seconds'] = round(stats['max_wait_seconds'], 3)
+    stats['pool_size'] = _POOL.pool_size if _POOL is not None else int(os.getenv('DB_POOL_SIZE', '5'))
+    stats['timeout_seconds'] = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+    stats['active_import'] = _ACTIVE_IMPORT[1] if _ACTIVE_IMPORT else None
+    return stats
+
+
+def test_connection() -> bool:
+    try:
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchall()
+            cur.close()
         return True
     except Exception as e:
         logger.warning("DB connection test failed", exc_info=True)
         return False
 
 
-def _get_current_import_id(conn) -> Optional[int]:
+# (checked_at, import_id, updated_at) of the latest completed import, re-read at most
+# every ACTIVE_IMPORT_TTL seconds (default 5, 0 = every call)
+_ACTIVE_IMPORT: Optional[tuple] = None
+
+
+def _fresh_active_import() -> Optional[tuple]:
+    """Cached (import_id, updated_at) while younger than ACTIVE_IMPORT_TTL, else None."""
+    cached = _ACTIVE_IMPORT
+    if cached is not None and time.monotonic() - cached[0] < float(os.getenv('ACTIVE_IMPORT_TTL', '5')):
+        return cached[1], cached[2]
+    return None
+
+
+def _get_active_import(conn) -> tuple:
+    """Return (import_id, updated_at) of the active import.
+
+    updated_at changes on in-place payout updates of the same import, so
+    (import_id, updated_at) is the data version the in-process caches key on.
+    """
+    global _ACTIVE_IMPORT
+    fresh = _fresh_active_import()
+    if fresh is not None:
+        return fresh
     cur = conn.cursor()
-    cur.execute("SELECT id FROM imports WHERE status='completed' ORDER BY uploaded_at DESC LIMIT 1")
+    cur.execute("SELECT id, updated_at FROM imports WHERE status='completed' ORDER BY uploaded_at DESC LIMIT 1")
     r = cur.fetchone()
     cur.close()
-    return r[0] if r else None
+    import_id, updated_at = (r[0], r[1]) if r else (None, None)
+    _ACTIVE_IMPORT = (time.monotonic(), import_id, updated_at)
+    return import_id, updated_at
 
 
-def log_query(state, rto, vehicle_type, fuel_type, policy_type, count):
-    try:
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("CREATE TABLE IF NOT EXISTS query_log (id BIGINT AUTO_INCREMENT PRIMARY KEY, ts DATETIME DEFAULT CURRENT_TIMESTAMP, state VARCHAR(64), rto VARCHAR(64), vehicle_type VARCHAR(64), fuel_type VARCHAR(64), policy_type VARCHAR(64), result_count INT)")
-        cur.execute("INSERT INTO query_log (state, rto, vehicle_type, fuel_type, policy_type, result_count) VALUES (%s,%s,%s,%s,%s,%s)", (state, rto, vehicle_type, fuel_type, policy_type, count))
-        conn.commit()
+# Data version the caches were last warmed for (None until the first version is seen)
+_WARMED_VERSION: Optional[tuple] = None
+
+
+def _detect_import_change(version: tuple) -> None:
+    """Start a background re-warm when the served data version moves past the warmed one."""
+    global _WARMED_VERSION
+    previous = _WARMED_VERSION
+    if previous == version:
+        return
+    _WARMED_VERSION = version
+    if previous is not None:
+        logger.info("Active import changed: %s -> %s (updated_at=%s)", previous[0], version[0], version[1])
+        _warm_in_background()
+
+
+def _get_current_import_id(conn) -> Optional[int]:
+    return _get_active_import(conn)[0]
+
+
+def get_data_version() -> tuple:
+    """(import_id, updated_at) of the active import; changes whenever the served rules do."""
+    version = _fresh_active_import()
+    if version is None:
+        with db_connection() as conn:
+            version = _get_active_import(conn)
+    _detect_import_change(version)
+    return version
+
+
+_QUERY_LOG_DDL = (
+    "CREATE TABLE IF NOT EXISTS query_log (id BIGINT AUTO_INCREMENT PRIMARY KEY, ts DATETIME DEFAULT CURRENT_TIMESTAMP, "
+    "state VARCHAR(64), rto VARCHAR(64), vehicle_type VARCHAR(64), fuel_type VARCHAR(64), policy_type VARCHAR(64), result_count INT, "
+    "filters_json VARCHAR(1024), INDEX idx_query_log_ts (ts))"
+)
+# ts is the time the row was queued (NOW() only for rows spilled before ts was recorded)
+_QUERY_LOG_INSERT = (
+    "INSERT INTO query_log (state, rto, vehicle_type, fuel_type, policy_type, result_count, filters_json, ts) "
+    "VALUES (%s,%s,%s,%s,%s,%s,%s,COALESCE(%s, NOW()))"
+)
+
+
+def _prepare_query_log(cur) -> None:
+    """Create query_log, or add filters_json (replayed by warm_payout_cache) to an older table."""
+    cur.execute(_QUERY_LOG_DDL)
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'query_log' AND COLUMN_NAME = 'filters_json'"
+    )
+    if not int(cur.fetchone()[0]):
+        cur.execute("ALTER TABLE query_log ADD COLUMN filters_json VARCHAR(1024)")
+
+
+# A value too long for its column fails the whole multi-row INSERT under strict mode (DataError)
+_QUERY_LOG_WRITER = QueryLogWriter.from_env(
+    lambda: get_conn(), _prepare_query_log, _QUERY_LOG_INSERT, row_errors=(mysql.connector.errors.DataError,)
+)
+# Widths of state, rto, vehicle_type, fuel_type, policy_type: the narrower of _QUERY_LOG_DDL and db/schema.sql
+_QUERY_LOG_FIELD_WIDTHS = (64, 64, 64, 64, 64)
+
+
+def log_query(state, rto, vehicle_type, fuel_type, policy_type, count, filters: Optional[dict] = None):
+    log_queries([(state, rto, vehicle_type, fuel_type, policy_type, count, _filters_json(filters))])
+
+
+def _filters_json(filters: Optional[dict]) -> Optional[str]:
+    # Same text for the same cache key, so query_log can be grouped on it
+    if filters is None:
+        return None
+    text = json.dumps(dict(_payout_cache_key(filters)), sort_keys=True, separators=(',', ':'))
+    return text if len(text) <= 1024 else None
+
+
+def _clip(value: Any, limit: int) -> Any:
+    return value[:limit] if isinstance(value, str) else value
+
+
+def log_queries(entries: List[tuple]):
+    """Queue (state, rto, vehicle_type, fuel_type, policy_type, count, filters_json) rows for the background query_log writer.
+
+    Never blocks and never touches a connection in the caller; see backend/query_log.py.
+    Each row is stamped with the current time, so late flushes keep the request time.
+    The text fields (form input) are cut to their column width, like _filters_json caps its text.
+    """
+    if entries:
+        ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        width = len(_QUERY_LOG_FIELD_WIDTHS)
+        _QUERY_LOG_WRITER.enqueue([
+            (*(_clip(value, limit) for value, limit in zip(entry[:width], _QUERY_LOG_FIELD_WIDTHS)), *entry[width:], ts)
+            for entry in entries
+        ])
+
+
+def start_query_log() -> None:
+    """Start the query_log writer (replays rows spilled or left mid-replay by an earlier process)."""
+    _QUERY_LOG_WRITER.start()
+
+
+def flush_query_log(timeout: float = 5.0) -> None:
+    """Write out queued query_log rows and stop the writer thread (app shutdown)."""
+    _QUERY_LOG_WRITER.stop(timeout)
+
+
+def get_query_log_stats() -> dict:
+    return _QUERY_LOG_WRITER.stats()
+
+
+# Rollup tables filled by scripts/rollup_query_log.py: granularity -> (table, bucket column)
+QUERY_LOG_ROLLUPS = {'hourly': ('query_log_hourly', 'bucket_start'), 'daily': ('query_log_daily', 'bucket_date')}
+QUERY_LOG_DIMENSIONS = ('state', 'rto', 'vehicle_type', 'fuel_type', 'policy_type', 'result_bucket')
+
+
+def get_query_log_summary(
+    granularity: str = 'daily',
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    group_by: Optional[List[str]] = None,
+    filters: Optional[Dict[str, str]] = None,
+    limit: int = 100,
+) -> List[dict]:
+    """Query counts from the query_log rollups, most-queried first.
+
+    group_by: dimensions from QUERY_LOG_DIMENSIONS, plus 'bucket' for one row per
+    hour/day in time order (default: every dimension, summed over [since, until)).
+    filters: dimension -> exact value ('' matches rows logged without one).
+    """
+    table, bucket_col = QUERY_LOG_ROLLUPS[granularity]
+    group_by = list(group_by or QUERY_LOG_DIMENSIONS)
+    for col in [*group_by, *(filters or {})]:
+        if col not in QUERY_LOG_DIMENSIONS and col != 'bucket':
+            raise ValueError(f"Unknown query_log dimension: {col}")
+    columns = [f"{bucket_col} AS bucket" if col == 'bucket' else col for col in group_by]
+    where, params = [], []
+    if since:
+        where.append(f"{bucket_col} >= %s")
+        params.append(since)
+    if until:
+        where.append(f"{bucket_col} < %s")
+        params.append(until)
+    for col, value in (filters or {}).items():
+        where.append(f"{bucket_col if col == 'bucket' else col} = %s")
+        params.append(value)
+    sql = (
+        f"SELECT {', '.join(columns + ['SUM(queries) AS queries', 'SUM(results_total) AS results_total'])} "
+        f"FROM {table}"
+        + (f" WHERE {' AND '.join(where)}" if where else "")
+        + (f" GROUP BY {', '.join(group_by)}" if group_by else "")
+        + (" ORDER BY bucket, queries DESC" if 'bucket' in group_by else " ORDER BY queries DESC")
+        + " LIMIT %s"
+    )
+    params.append(int(limit))
+    with db_connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
         cur.close()
-        conn.close()
-    except Error as e:
-        logger.warning("log_query error", exc_info=True)
+    for row in rows:
+        row['queries'] = int(row['queries'] or 0)
+        row['results_total'] = int(row['results_total'] or 0)
+        if hasattr(row.get('bucket'), 'isoformat'):
+            row['bucket'] = row['bucket'].isoformat()
+    return rows
+
+
+# ==================== DROPDOWN VALUE CACHE ====================
+# get_distinct_* results keyed by (function, arguments), tagged with the active
+# import (id, updated_at) so a new import or payout update drops them all. Empty
+# arguments ('' / None) share an entry since the helpers treat them the same.
+# DISTINCT_CACHE_SIZE=0 disables it.
+
+_DISTINCT_CACHE = VersionedLRUCache(
+    max_size=int(os.getenv('DISTINCT_CACHE_SIZE', '4096')),
+    ttl_seconds=float(os.getenv('DISTINCT_CACHE_TTL', '3600')),
+)
+_DISTINCT_MISSING = object()
+
+
+def _memoize_distinct(func: Callable) -> Callable:
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__, tuple(value if value else None for value in bound.args))
+        version = get_data_version()
+        values = _DISTINCT_CACHE.get(version, key, _DISTINCT_MISSING)
+        if values is _DISTINCT_MISSING:
+            values = tuple(func(*args, **kwargs))
+            _DISTINCT_CACHE.put(version, key, values)
+        return list(values)
+
+    return wrapper
+
+
+def get_distinct_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the get_distinct_* cache."""
+    return _DISTINCT_CACHE.stats()
 
 
 def _distinct_from_raw(column_name: str, all_imports: bool = False) -> List[Any]:
@@ -261,18 +611,21 @@ def _distinct_from_raw(column_name: str, all_imports: bool = False) -> List[Any]
     
     By default, returns values from current import only.
     Set all_imports=True to get values from ALL imports (useful for dropdown lists).
+    With PAYOUT_ENGINE=memory the current import is read from the bitmap index instead.
     """
     conn = get_conn()
     try:
+        if _in_memory_engine() and not all_imports:
+            return _get_rule_index(conn).raw_values(column_name)
         import_id = _get_current_import_id(conn)
         cur = conn.cursor()
-        path = f"$.{column_name}"
+        col = _attr_expr(column_name, alias='')
         if import_id and not all_imports:
-            sql = "SELECT DISTINCT JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)) FROM rates WHERE import_id=%s AND JSON_EXTRACT(raw_json, %s) IS NOT NULL"
-            cur.execute(sql, (path, import_id, path))
+            sql = f"SELECT DISTINCT {col} FROM rates WHERE import_id=%s AND {col} IS NOT NULL"
+            cur.execute(sql, (import_id,))
         else:
-            sql = "SELECT DISTINCT JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)) FROM rates WHERE JSON_EXTRACT(raw_json, %s) IS NOT NULL"
-            cur.execute(sql, (path, path))
+            sql = f"SELECT DISTINCT {col} FROM rates WHERE {col} IS NOT NULL"
+            cur.execute(sql)
         # Filter out None and the string 'null' / 'none' (JSON null becomes string 'null' when unquoted)
         rows = [r[0] for r in cur.fetchall() if r[0] is not None and str(r[0]).lower() not in ('null', 'none')]
         cur.close()
@@ -305,6 +658,11 @@ def _distinct_single_values(column_name: str, exclude_tokens: Optional[List[str]
     exclude = set((exclude_tokens or []) + ['', 'all'])
     if exclude_na:
         exclude.add('n/a')
+    return _distinct_tokens(raw_list, exclude)
+
+
+def _distinct_tokens(raw_list: List[Any], exclude: set) -> List[str]:
+    """Split raw cells into sorted unique dropdown tokens, skipping Except/Declined cells and exclude (lowercase)."""
     seen = set()
     result = []
     for raw in raw_list:
@@ -319,6 +677,31 @@ def _distinct_single_values(column_name: str, exclude_tokens: Optional[List[str]
     return sorted(result, key=lambda x: (x.lower(), x))
 
 
+def _facet_match_condition(filter_column: str, values: List[str]) -> tuple:
+    """WHERE condition (alias-less rates) for one dropdown-cascade filter, as RuleIndex.facet_match.
+
+    A row is offered when its cell is 'All', lists one of values as a whole
+    token, or is an Except/Declined cell that names none of values (the
+    rate_token exclusion rule). Blank cells do not match. values are stripped.
+
+    Returns: (sql_condition_string, params_list)
+    """
+    values = [str(v).strip() for v in values]
+    filt = _attr_expr(filter_column, alias='')
+    cell = f"TRIM(COALESCE({filt}, ''))"
+    is_exclusion = f"(LOWER({cell}) LIKE 'except %' OR LOWER({cell}) LIKE 'declined %')"
+    norm = f"CONCAT(',', REPLACE(REPLACE({cell}, ', ', ','), ' ,', ','), ',')"
+    names = f"TRIM(SUBSTRING({cell}, LOCATE(' ', {cell}) + 1))"
+    names_norm = f"CONCAT(',', REPLACE(REPLACE({names}, ', ', ','), ' ,', ','), ',')"
+    listed = ' OR '.join(f"{filt} = %s OR {norm} LIKE CONCAT('%,', %s, ',%')" for _ in values)
+    named = ' OR '.join(f"{names_norm} LIKE CONCAT('%,', %s, ',%')" for _ in values)
+    params = [p for value in values for p in (value, value)] + list(values)
+    return (
+        f"((NOT {is_exclusion} AND ({listed})) OR ({is_exclusion} AND NOT ({named})) OR LOWER({cell}) = 'all')",
+        params,
+    )
+
+
 def _distinct_single_values_filtered(
     column_name: str,
     filter_column: str,
@@ -328,60 +711,41 @@ def _distinct_single_values_filtered(
 ) -> List[str]:
     """Like _distinct_single_values but only from rows where filter_column equals filter_value
     OR filter_column (comma-separated) contains filter_value as a whole token
-    OR filter_column = 'All' (wildcard: applies to all values).
+    OR filter_column = 'All' (wildcard: applies to all values)
+    OR filter_column is an Except/Declined list without filter_value.
     
     By default (all_imports=False), queries current import only.
     Set all_imports=True to show values from all imports.
     """
+    if _in_memory_engine() and not all_imports:
+        return _distinct_with_filters(
+            column_name, [(filter_column, filter_value)],
+            exclude_tokens=list(exclude_tokens or []) + ['n/a', 'no'],
+        )
     conn = get_conn()
     try:
         import_id = _get_current_import_id(conn) if not all_imports else None
         cur = conn.cursor()
-        path_col = f"$.{column_name}"
-        path_filt = f"$.{filter_column}"
-        filter_values = _expand_filter_values(filter_column, filter_value)
-        norm = (
-            f"CONCAT(',', REPLACE(REPLACE(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_filt}')), '')), ', ', ','), ' ,', ','), ',')"
+        col = _attr_expr(column_name, alias='')
+        match_clause, params = _facet_match_condition(
+            filter_column, _expand_filter_values(filter_column, filter_value)
         )
-        token_checks = []
-        params: List[str] = []
-        for value in filter_values:
-            token_checks.append(
-                f"(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_filt}')) = %s OR {norm} LIKE CONCAT('%,', %s, ',%'))"
-            )
-            params.extend([value, value])
-        token_checks.append(
-            f"LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_filt}')), ''))) = 'all'"
-        )
-        match_clause = f"({' OR '.join(token_checks)})"
 
         if import_id:
             sql = (
-                f"SELECT DISTINCT JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_col}')) FROM rates "
-                f"WHERE import_id = %s AND JSON_EXTRACT(raw_json, '{path_col}') IS NOT NULL AND {match_clause}"
+                f"SELECT DISTINCT {col} FROM rates "
+                f"WHERE import_id = %s AND {col} IS NOT NULL AND {match_clause}"
             )
             cur.execute(sql, [import_id, *params])
         else:
             sql = (
-                f"SELECT DISTINCT JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_col}')) FROM rates "
-                f"WHERE JSON_EXTRACT(raw_json, '{path_col}') IS NOT NULL AND {match_clause}"
+                f"SELECT DISTINCT {col} FROM rates "
+                f"WHERE {col} IS NOT NULL AND {match_clause}"
             )
             cur.execute(sql, params)
         raw_list = [r[0] for r in cur.fetchall() if r[0] is not None and str(r[0]).lower() not in ('null', 'none')]
         cur.close()
-        exclude = set((exclude_tokens or []) + ['', 'all', 'n/a', 'no'])
-        seen = set()
-        result = []
-        for raw in raw_list:
-            for token in _split_comma_cell(raw):
-                key = token.lower()
-                if key.startswith('except ') or key.startswith('declined '):
-                    continue
-                if key in exclude or key in seen:
-                    continue
-                seen.add(key)
-                result.append(token)
-        return sorted(result, key=lambda x: (x.lower(), x))
+        return _distinct_tokens(raw_list, set((exclude_tokens or []) + ['', 'all', 'n/a', 'no']))
     finally:
         conn.close()
 
@@ -397,17 +761,28 @@ def _distinct_with_filters(
     Each filter is checked with: 
     - filter_column = filter_value OR 
     - filter_column (comma-separated) contains filter_value OR
-    - filter_column = 'All' (wildcard: applies to all values)
+    - filter_column = 'All' (wildcard: applies to all values) OR
+    - filter_column is an Except/Declined list that does not name filter_value
     By default excludes 'N/A', but set exclude_na=False to keep it (e.g., for seating capacity).
     
     By default (all_imports=False), queries current import only.
     Set all_imports=True to show values from all imports.
+    With PAYOUT_ENGINE=memory the current import is answered from the bitmap index.
     """
+    exclude = set((exclude_tokens or []) + ['', 'all'])
+    if exclude_na:
+        exclude.add('n/a')
+    if _in_memory_engine() and not all_imports:
+        index = _get_rule_index()
+        bits = index.all
+        for filter_column, filter_value in filters:
+            bits &= index.facet_match(filter_column, _expand_filter_values(filter_column, filter_value))
+        return _distinct_tokens(index.raw_values(column_name, bits), exclude)
     conn = get_conn()
     try:
         import_id = _get_current_import_id(conn) if not all_imports else None
         cur = conn.cursor()
-        path_col = f"$.{column_name}"
+        col = _attr_expr(column_name, alias='')
         
         # Build WHERE clause for each filter
         where_conditions = []
@@ -417,49 +792,26 @@ def _distinct_with_filters(
             where_conditions.append("import_id = %s")
             params.append(import_id)
         
-        where_conditions.append(f"JSON_EXTRACT(raw_json, '{path_col}') IS NOT NULL")
+        where_conditions.append(f"{col} IS NOT NULL")
         
         for filter_column, filter_value in filters:
-            path_filt = f"$.{filter_column}"
-            values = _expand_filter_values(filter_column, filter_value)
-            norm = (
-                f"CONCAT(',', REPLACE(REPLACE(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_filt}')), '')), ', ', ','), ' ,', ','), ',')"
-            )
-            checks = []
-            for value in values:
-                checks.append(
-                    f"(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_filt}')) = %s OR {norm} LIKE CONCAT('%,', %s, ',%'))"
-                )
-                params.extend([value, value])
-            checks.append(
-                f"LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_filt}')), ''))) = 'all'"
+            condition, condition_params = _facet_match_condition(
+                filter_column, _expand_filter_values(filter_column, filter_value)
             )
-            where_conditions.append(f"({' OR '.join(checks)})")
+            where_conditions.append(condition)
+            params.extend(condition_params)
         
-        sql = f"SELECT DISTINCT JSON_UNQUOTE(JSON_EXTRACT(raw_json, '{path_col}')) FROM rates WHERE {' AND '.join(where_conditions)}"
+        sql = f"SELECT DISTINCT {col} FROM rates WHERE {' AND '.join(where_conditions)}"
         cur.execute(sql, params)
         # Filter out None and JSON-unquoted 'null'/'none' strings
         raw_list = [r[0] for r in cur.fetchall() if r[0] is not None and str(r[0]).lower() not in ('null', 'none')]
         cur.close()
-        exclude = set((exclude_tokens or []) + ['', 'all'])
-        if exclude_na:
-            exclude.add('n/a')
-        seen = set()
-        result = []
-        for raw in raw_list:
-            for token in _split_comma_cell(raw):
-                key = token.lower()
-                if key.startswith('except ') or key.startswith('declined '):
-                    continue
-                if key in exclude or key in seen:
-                    continue
-                seen.add(key)
-                result.append(token)
-        return sorted(result, key=lambda x: (x.lower(), x))
+        return _distinct_tokens(raw_list, exclude)
     finally:
         conn.close()
 
 
+@_memoize_distinct
 def get_distinct_states() -> List[str]:
     """Return clean state options derived from data (single tokens only)."""
     from .config import STATE_DISPLAY_MAP
@@ -506,8 +858,8 @@ def get_distinct_rtos(state: str = None) -> List[str]:
     if code not in _RTO_STATES_WITH_CODES:
         return []
 
-    master = _load_rto_master()
-    return sorted(list(master.get(code, {}).keys()), key=_rto_sort_key)
+    entry = _load_rto_master()['states'].get(code)
+    return [opt["code"] for opt in entry['options']] if entry else []
 
 
 def get_distinct_rto_options(state: str = None) -> List[dict]:
@@ -519,26 +871,17 @@ def get_distinct_rto_options(state: str = None) -> List[dict]:
     if code not in _RTO_STATES_WITH_CODES:
         return []
 
-    master = _load_rto_master()
-    state_map = master.get(code, {})
-    options: List[dict] = []
-
-    for rto_code in sorted(state_map.keys(), key=_rto_sort_key):
-        district = (state_map.get(rto_code) or "").strip()
-        label = f"{rto_code} - {district}" if district else rto_code
-        options.append({
-            "code": rto_code,
-            "name": district,
-            "label": label,
-        })
-    return options
+    entry = _load_rto_master()['states'].get(code)
+    return [dict(opt) for opt in entry['options']] if entry else []
 
 
+@_memoize_distinct
 def get_distinct_vehicle_categories() -> List[str]:
     """Single values only: 'GCV' and 'PCV' as separate options, not 'GCV,PCV'."""
     return _distinct_single_values('Vehicle_Category')
 
 
+@_memoize_distinct
 def get_distinct_vehicle_types(category: str = None) -> List[str]:
     """Single values only; when category given, only types for that category (comma-sep match)."""
     if not category:
@@ -556,56 +899,64 @@ def get_distinct_vehicle_types(category: str = None) -> List[str]:
         seen.add(key)
         normalized.append(n)
     return normalized
+
+
+# Per active import: vehicle_type (lower-cased) -> {'standalone': fuels, 'all_slab': fuels}
+_FUEL_AVAILABILITY: Optional[tuple] = None  # ((import_id, updated_at), map)
+
+
+def _fuel_availability() -> Dict[str, Dict[str, set]]:
+    """Which fuels each vehicle type of the active import really offers, built with one query per import.
+
+    'standalone': fuel_type cells that are exactly that fuel. 'all_slab': fuels
+    listed in a (possibly composite, e.g. 'Petrol,EV') fuel_type cell of a row
+    whose CC_Slab or Watt_Slab is 'All', i.e. a row that applies to each fuel.
+    """
+    global _FUEL_AVAILABILITY
+    version = get_data_version()
+    cached = _FUEL_AVAILABILITY
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    availability: Dict[str, Dict[str, set]] = {}
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT DISTINCT vehicle_type, fuel_type, "
+            "(LOWER(TRIM(COALESCE(cc_slab, ''))) = 'all' OR LOWER(TRIM(COALESCE(watt_slab, ''))) = 'all') "
+            "FROM rates WHERE import_id = %s AND vehicle_type IS NOT NULL AND fuel_type IS NOT NULL",
+            (version[0],),
+        )
+        for vehicle_type, fuel_type, all_slab in cur.fetchall():
+            entry = availability.setdefault(str(vehicle_type).strip().lower(), {'standalone': set(), 'all_slab': set()})
+            entry['standalone'].add(str(fuel_type).strip().lower())
+            if all_slab:
+                entry['all_slab'].update(t.lower() for t in _split_comma_cell(fuel_type))
+        cur.close()
+    _FUEL_AVAILABILITY = (version, availability)
+    return availability
+
+
 def _fuel_tokens_exist_for_vehicle_type(tokens: List[str], vehicle_type: str) -> List[str]:
     """Validate that fuel type tokens exist as standalone values (not just in combinations).
     
     For Two-Wheeler Scooter: 'Petrol,EV' records exist, but if pure 'EV' Scooter records
     don't exist, don't show 'EV' as a selectable option.
     Returns only tokens that have actual records for the given vehicle type.
+    Answered from _fuel_availability (no query once the active import's map is built).
     """
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        validated = []
-
-        for token in tokens:
-            token_stripped = str(token).strip()
-            # 1) Check if this token exists as standalone Fuel_Type for vehicle_type
-            cur.execute("""
-                SELECT COUNT(*) FROM rates
-                WHERE JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.Vehicle_Type')) = %s
-                AND JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.Fuel_Type')) = %s
-            """, (vehicle_type, token_stripped))
-            count = cur.fetchone()[0]
-            if count > 0:
-                validated.append(token)
-                continue
-
-            # 2) If not standalone, check composite records (e.g. 'Petrol,EV') that include this token
-            #    and have CC_Slab='All' or Watt_Slab='All' — these indicate applicability to both fuels.
-            cur.execute("""
-                SELECT COUNT(*) FROM rates
-                WHERE JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.Vehicle_Type')) = %s
-                  AND (
-                    JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.Fuel_Type')) = %s OR
-                    CONCAT(',', REPLACE(REPLACE(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.Fuel_Type')), '')), ', ', ','), ' ,', ','), ',') LIKE CONCAT('%,', %s, ',%')
-                  )
-                  AND (
-                    LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.CC_Slab')), ''))) = 'all' OR
-                    LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.Watt_Slab')), ''))) = 'all'
-                  )
-            """, (vehicle_type, token_stripped, token_stripped))
-            comp_count = cur.fetchone()[0]
-            if comp_count > 0:
-                validated.append(token)
-
-        cur.close()
-        return validated
-    finally:
-        conn.close()
-
+    entry = _fuel_availability().get(str(vehicle_type).strip().lower())
+    if entry is None:
+        return []
+    validated = []
+    for token in tokens:
+        token_key = str(token).strip().lower()
+        # Standalone Fuel_Type rows, else composite rows (e.g. 'Petrol,EV') with CC_Slab/Watt_Slab 'All'
+        if token_key in entry['standalone'] or token_key in entry['all_slab']:
+            validated.append(token)
+    return validated
 
 
+@_memoize_distinct
 def get_distinct_fuel_types(vehicle_type: str = None, category: str = None) -> List[str]:
     """Single values only: 'Petrol', 'Diesel' as separate options, not 'Petrol,Diesel'.
     When vehicle_type is provided, return only fuels for that vehicle type.
@@ -654,6 +1005,7 @@ def get_distinct_fuel_types(vehicle_type: str = None, category: str = None) -> L
     return fuels
 
 
+@_memoize_distinct
 def get_distinct_policy_types(vehicle_type: str = None, fuel_type: str = None, category: str = None) -> List[str]:
     """Single values only.
     When vehicle_type and/or fuel_type provided, return only policy types for that combination.
@@ -670,6 +1022,7 @@ def get_distinct_policy_types(vehicle_type: str = None, fuel_type: str = None, c
     return _distinct_with_filters('Policy_Type', filters)
 
 
+@_memoize_distinct
 def get_distinct_business_types(vehicle_type: str = None, fuel_type: str = None, category: str = None) -> List[str]:
     """Single values only.
     When vehicle_type and/or fuel_type provided, return only business types for that combination.
@@ -732,6 +1085,7 @@ def get_distinct_vehicle_ages() -> List[str]:
     return ['New'] + [str(i) for i in range(1, 51)]
 
 
+@_memoize_distinct
 def get_distinct_cc_slabs(vehicle_type: str = None, fuel_type: str = None, category: str = None) -> List[str]:
     """Single values only; exclude No/N/A from dropdown.
     When vehicle_type and/or fuel_type provided, return only CC slabs for that combination.
@@ -805,6 +1159,7 @@ def get_distinct_cc_slabs(vehicle_type: str = None, fuel_type: str = None, categ
     return slabs
 
 
+@_memoize_distinct
 def get_distinct_gvw_slabs(vehicle_type: str = None) -> List[str]:
     """Single values only; exclude No/N/A.
     When vehicle_type provided, return only GVW slabs for that vehicle type."""
@@ -813,6 +1168,7 @@ def get_distinct_gvw_slabs(vehicle_type: str = None) -> List[str]:
     return _distinct_single_values_filtered('GVW_Slab', 'Vehicle_Type', vehicle_type, exclude_tokens=['no'])
 
 
+@_memoize_distinct
 def get_distinct_watt_slabs(vehicle_type: str = None, fuel_type: str = None, category: str = None) -> List[str]:
     """Single values only; exclude No/N/A.
     When vehicle_type and/or fuel_type provided, return only watt slabs for that combination.
@@ -833,6 +1189,7 @@ def get_distinct_watt_slabs(vehicle_type: str = None, fuel_type: str = None, cat
     return slabs
 
 
+@_memoize_distinct
 def get_distinct_seating_capacities(vehicle_type: str = None, fuel_type: str = None, category: str = None) -> List[str]:
     """Single values only; exclude No/N/A.
     When vehicle_type and/or fuel_type provided, return only capacities for that combination.
@@ -858,6 +1215,7 @@ def get_distinct_seating_capacities(vehicle_type: str = None, fuel_type: str = N
     return capacities
 
 
+@_memoize_distinct
 def get_distinct_ncb_slabs(vehicle_type: str = None, fuel_type: str = None) -> List[str]:
     """Single values only (e.g. Yes, No as separate options).
     When vehicle_type and/or fuel_type provided, return only NCB slabs for that combination.
@@ -876,6 +1234,7 @@ def get_distinct_ncb_slabs(vehicle_type: str = None, fuel_type: str = None) -> L
     return slabs
 
 
+@_memoize_distinct
 def get_distinct_cpa_covers(vehicle_type: str = None, fuel_type: str = None) -> List[str]:
     """Single values only.
     When vehicle_type and/or fuel_type provided, return only covers for that combination.
@@ -894,6 +1253,7 @@ def get_distinct_cpa_covers(vehicle_type: str = None, fuel_type: str = None) ->
     return covers
 
 
+@_memoize_distinct
 def get_distinct_zero_depreciation(vehicle_type: str = None, fuel_type: str = None) -> List[str]:
     """Single values only.
     When vehicle_type and/or fuel_type provided, return only options for that combination.
@@ -912,6 +1272,7 @@ def get_distinct_zero_depreciation(vehicle_type: str = None, fuel_type: str = No
     return options
 
 
+@_memoize_distinct
 def get_distinct_trailers(vehicle_type: str = None) -> List[str]:
     """Single values only (e.g. Yes, No as separate options if both appear in data).
     When vehicle_type provided, return only trailers for that vehicle type.
@@ -937,27 +1298,27 @@ def _get_except_patterns(field_name: str) -> List[str]:
     try:
         import_id = _get_current_import_id(conn)
         cur = conn.cursor()
-        path = f"$.{field_name}"
+        col = _attr_expr(field_name, alias='')
         
         if import_id:
             sql = f"""
                 SELECT DISTINCT 
-                    TRIM(SUBSTR(JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)), 8)) as excepted
+                    TRIM(SUBSTR({col}, 8)) as excepted
                 FROM rates 
                 WHERE import_id = %s 
-                AND (JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)) LIKE 'Except %%'
-                     OR JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)) LIKE 'except %%')
+                AND ({col} LIKE 'Except %%'
+                     OR {col} LIKE 'except %%')
             """
-            cur.execute(sql, (path, import_id, path, path))
+            cur.execute(sql, (import_id,))
         else:
             sql = f"""
                 SELECT DISTINCT 
-                    TRIM(SUBSTR(JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)), 8)) as excepted
+                    TRIM(SUBSTR({col}, 8)) as excepted
                 FROM rates 
-                WHERE (JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)) LIKE 'Except %%'
-                       OR JSON_UNQUOTE(JSON_EXTRACT(raw_json, %s)) LIKE 'except %%')
+                WHERE ({col} LIKE 'Except %%'
+                       OR {col} LIKE 'except %%')
             """
-            cur.execute(sql, (path, path, path))
+            cur.execute(sql)
         
         results = [r[0] for r in cur.fetchall() if r[0]]
         cur.close()
@@ -969,63 +1330,61 @@ def _get_except_patterns(field_name: str) -> List[str]:
         conn.close()
 
 
+def _token_match_condition(
+    key: str,
+    values: List[str],
+    wildcards: tuple = ('', '*'),
+    allow_exclusion: bool = True,
+) -> tuple:
+    """Build an indexed rate_token condition for one comma/exclusion-aware field.
+
+    The importer explodes each cell into rate_token rows: one per comma token,
+    '' for a blank cell, '*' for an All/All make/N/A cell, and for Except/Declined
+    cells a '*' marker plus one row per excluded name (all with is_exclusion=1).
+    A rate matches when it lists one of `values` or a wildcard token, or when it
+    is an exclusion row that does not name any of `values`.
+
+    Returns: (sql_condition_string, params_list)
+    """
+    value_marks = ', '.join(['%s'] * len(values))
+    wildcard_marks = ', '.join(['%s'] * len(wildcards))
+    include = (
+        "r.id IN (SELECT t.rate_id FROM rate_token t "
+        f"WHERE t.field = %s AND t.is_exclusion = 0 AND t.token IN ({', '.join(filter(None, [value_marks, wildcard_marks]))}))"
+    )
+    params: List[Any] = [key, *values, *wildcards]
+    if not allow_exclusion:
+        return f"({include})", params
+
+    exclusion = (
+        "(r.id IN (SELECT t.rate_id FROM rate_token t "
+        "WHERE t.field = %s AND t.is_exclusion = 1 AND t.token = '*') "
+        "AND r.id NOT IN (SELECT t.rate_id FROM rate_token t "
+        f"WHERE t.field = %s AND t.is_exclusion = 1 AND t.token IN ({value_marks})))"
+    )
+    params.extend([key, key, *values])
+    return f"({include} OR {exclusion})", params
+
+
 def _build_except_match_condition(json_key: str, user_val: str) -> tuple:
     """Build SQL condition that handles "except" patterns in Make/Model fields.
     
     For a user input (e.g., user_val='Mahindra'), this creates a condition that:
     1. Matches exact values: Make = 'Mahindra'
-    2. Matches comma-separated values: Make LIKE '%,Mahindra,%'
+    2. Matches comma-separated values: Make = 'Hero,Mahindra'
     3. Matches except patterns (inversely):
        - If database has Make = "Except TVS"
        - And user selects Mahindra
        - Then we MATCH this record (because Mahindra ≠ TVS)
        - But if user selects TVS, we DON'T match (because TVS is excepted)
+    4. Treats NULL/blank/'All'/'All make'/'N/A' as wildcard (applies to all makes)
     
     Returns: (sql_condition_string, params_list)
     """
-    key = _JSON_KEY_MAP.get(json_key, json_key.replace('_', ' ').title().replace(' ', '_'))
-    user_val_stripped = str(user_val).strip()
-    
-    # Condition: treat NULL/blank/'All' as wildcard (applies to all makes)
-    # Match exact value, comma-separated inclusion, OR inverse-except patterns.
-    # Examples:
-    #  - Make = 'Honda' matches when user selects Honda
-    #  - Make = 'Hero,Honda' matches when user selects Honda
-    #  - Make = 'Except TVS' matches when user selects any make except TVS
-    #  - Make = NULL / '' / 'All' matches any user selection (wildcard)
-
-    # Exact match or wildcard (NULL/blank)
-    exact_match = (
-        f"(JSON_EXTRACT(r.raw_json, '$.{key}') IS NULL "
-        f"OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')) = '' "
-        f"OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), ''))) IN ('null', 'none') "
-        f"OR JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) = %s)"
-    )
-
-    # Comma-separated match (e.g., "Petrol,Diesel")
-    comma_match = (
-        f"CONCAT(',', REPLACE(REPLACE(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')), ', ', ','), ' ,', ','), ',') "
-        f"LIKE CONCAT('%,', TRIM(%s), ',%')"
-    )
-
-    # Exclusion pattern match (inverse): "Except X"/"Declined X" matches when user selection != X
-    except_match = (
-        f"((JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) LIKE 'Except %%' "
-        f"OR JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) LIKE 'except %%' "
-        f"OR JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) LIKE 'Declined %%' "
-        f"OR JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) LIKE 'declined %%') "
-        f"AND JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) NOT LIKE CONCAT('%%', %s, '%%'))"
-    )
-
-    # Also accept explicit 'all'/'all make'/'n/a' tokens as wildcards
-    all_tokens_cond = f"LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), ''))) IN ('all', 'all make', 'n/a')"
-
-    condition = f"({exact_match} OR {comma_match} OR {except_match} OR {all_tokens_cond})"
-    params = [user_val_stripped, user_val_stripped, user_val_stripped]
-    
-    return condition, params
+    return _token_match_condition(_json_key(json_key), [str(user_val).strip()])
 
 
+@_memoize_distinct
 def get_distinct_makes(vehicle_type: str = None, category: str = None, fuel_type: str = None) -> List[str]:
     """Single values only: each make as separate option; exclude 'All', 'All make', 'N/A', and except patterns from display.
     When vehicle_type provided, return only makes for that vehicle type.
@@ -1064,6 +1423,7 @@ def get_distinct_makes(vehicle_type: str = None, category: str = None, fuel_type
     return unique
 
 
+@_memoize_distinct
 def get_distinct_models(make: str = None, vehicle_type: str = None, category: str = None) -> List[str]:
     """Single values only; when make and/or vehicle_type given, filter accordingly.
     If both provided, returns models for that make AND vehicle_type combination.
@@ -1123,15 +1483,16 @@ def get_distinct_models(make: str = None, vehicle_type: str = None, category: st
     return filtered
 
 
-def get_top_5_payouts(**filters) -> List[dict]:
-    """Return top payouts matching given filters. Uses current import batch.
+def _sql_payout_rows(conn, import_id: Optional[int], filters: dict, top_n: Optional[int] = None, offset: int = 0) -> List[dict]:
+    """Run the matching query in MySQL.
 
-    This implements basic matching: rto included/excluded logic, slab numeric checks (if provided), and flexible matching for other fields using JSON values.
-    Handles comma-separated values and 'All' wildcards.
+    Returns best payout per (condition_group, company_name), ordered by
+    condition_group then final_payout DESC. With top_n, insurers are ranked in
+    the query with window functions and only the rows _rank_payout_rows needs
+    for ranks offset+1 .. offset+top_n are returned (each insurer's best row
+    plus its best Commission on OD / TP rows).
     """
-    conn = get_conn()
     cur = conn.cursor(dictionary=True)
-    import_id = _get_current_import_id(conn)
 
     # build base
     params = []
@@ -1149,11 +1510,8 @@ def get_top_5_payouts(**filters) -> List[dict]:
             # Match blank/null states and generic exclusion-style states (Except/Declined ...),
             # but do not match specific explicit states like 'TN' or 'AP,TS'.
             where_clauses.append(
-                "(JSON_EXTRACT(r.raw_json, '$.State') IS NULL "
-                "OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.State')), '')) = '' "
-                "OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.State')), ''))) IN ('null', 'none') "
-                "OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.State')), ''))) LIKE 'except %' "
-                "OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.State')), ''))) LIKE 'declined %')"
+                "r.id IN (SELECT t.rate_id FROM rate_token t WHERE t.field = 'State' "
+                "AND ((t.is_exclusion = 0 AND t.token = '') OR (t.is_exclusion = 1 AND t.token = '*')))"
             )
         else:
             # Use except/multi-value aware matching for State (supports 'Except X' patterns and comma-separated lists)
@@ -1175,52 +1533,19 @@ def get_top_5_payouts(**filters) -> List[dict]:
             params.extend([rto, rto])
 
     # Helper: comma-separated match — row matches if user value is one of the comma-separated tokens (whole-token, not substring)
+    # Exclusion rows work here too: Vehicle_Type='Except Ambulance' matches all values except Ambulance.
     def _comma_sep_match(json_key: str, user_val: str, allow_all: bool = False) -> None:
-        # Use mapping if available, otherwise use title case conversion
-        key = _JSON_KEY_MAP.get(json_key, json_key.replace('_', ' ').title().replace(' ', '_'))
-        raw_expr = f"JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}'))"
-        norm = f"CONCAT(',', REPLACE(REPLACE(TRIM(COALESCE({raw_expr}, '')), ', ', ','), ' ,', ','), ',')"
+        key = _json_key(json_key)
         values = _expand_filter_values(key, user_val) if key == 'Vehicle_Type' else [user_val]
-        value_checks = []
-        for v in values:
-            value_checks.append(
-                f"({raw_expr} = %s OR {norm} LIKE CONCAT('%,', TRIM(%s), ',%'))"
-            )
-            params.extend([v.strip(), v.strip()])
-        value_match = " OR ".join(value_checks)
-
-        # Support exclusion patterns in comma-sep fields too:
-        # Example: Vehicle_Type='Except Ambulance' should match all values except Ambulance.
-        exclusion_checks = [f"{raw_expr} NOT LIKE CONCAT('%%', %s, '%%')" for _ in values]
-        exclusion_match = " AND ".join(exclusion_checks) if exclusion_checks else "1=1"
-        except_match = (
-            f"(({raw_expr} LIKE 'Except %%' "
-            f"OR {raw_expr} LIKE 'except %%' "
-            f"OR {raw_expr} LIKE 'Declined %%' "
-            f"OR {raw_expr} LIKE 'declined %%') "
-            f"AND {exclusion_match})"
-        )
-        for v in values:
-            params.append(v.strip())
-
-        # Match: exact, comma-separated, NULL/blank (blank = wildcard), or 'all'/'n/a'
-        cond = (
-            f"(JSON_EXTRACT(r.raw_json, '$.{key}') IS NULL "
-            f"OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')) = '' "
-            f"OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), ''))) IN ('null', 'none') "
-            f"OR {value_match} "
-            f"OR {except_match}"
+        cond, parms = _token_match_condition(
+            key, [v.strip() for v in values], wildcards=('', '*') if allow_all else ('',)
         )
-        if allow_all:
-            cond += f" OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), ''))) IN ('all', 'all make', 'n/a')"
-        cond += ")"
         where_clauses.append(cond)
+        params.extend(parms)
 
-    # Fields that can be comma-separated: Petrol,Diesel means applicable for Petrol OR Diesel (whole-token match)
+    # Comma-separated fields (see _COMMA_SEP_FIELDS).
     # Also: Field='All' means applicable to ALL values for that field (wildcard matching)
-    # NOTE: cc_slab moved from simple_json_filters to here to support composite values like "150 to 350 CC, 75 to 150 CC"
-    comma_sep_fields = ['fuel_type', 'vehicle_type', 'vehicle_category', 'policy_type', 'ncb_slab', 'cpa_cover', 'zero_depreciation', 'trailer', 'cc_slab']
-    for jf in comma_sep_fields:
+    for jf in _COMMA_SEP_FIELDS:
         val = filters.get(jf)
         if val and str(val).strip():
             # Enable allow_all for all comma-separated fields (so rows with field='All' will match any user selection)
@@ -1237,28 +1562,15 @@ def get_top_5_payouts(**filters) -> List[dict]:
         if selected_low in ('renewal', 'rollover'):
             selected = 'Old'
             selected_low = 'old'
-        key = _JSON_KEY_MAP['business_type']
-        norm = f"CONCAT(',', REPLACE(REPLACE(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')), ', ', ','), ' ,', ','), ',')"
-
-        common_part = (
-            f"(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) = %s "
-            f"OR {norm} LIKE CONCAT('%,', TRIM(%s), ',%') "
-            f"OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), ''))) IN ('all', 'n/a'))"
+        # For Old, blank business rows ('' token) are also applicable; for New they are not.
+        cond, parms = _token_match_condition(
+            _JSON_KEY_MAP['business_type'],
+            [selected],
+            wildcards=('', '*') if selected_low == 'old' else ('*',),
+            allow_exclusion=False,
         )
-        params.extend([selected, selected])
-
-        if selected_low == 'old':
-            # For these values, blank business rows are also applicable.
-            cond = (
-                f"(JSON_EXTRACT(r.raw_json, '$.{key}') IS NULL "
-                f"OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')) = '' "
-                f"OR LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), ''))) IN ('null', 'none') "
-                f"OR {common_part})"
-            )
-        else:
-            # For New, blank should NOT match.
-            cond = common_part
         where_clauses.append(cond)
+        params.extend(parms)
 
     # Make: handle comma-separated values AND "except" patterns
     # Uses new _build_except_match_condition to properly match "Except TVS" etc.
@@ -1296,7 +1608,7 @@ def get_top_5_payouts(**filters) -> List[dict]:
             # Special handling: "Other" in UI represents "N/A" in database for seating_capacity
             if jf == 'seating_capacity' and str(val).strip().lower() == 'other':
                 val = 'N/A'
-            key = _JSON_KEY_MAP.get(jf, jf.replace('_', ' ').title().replace(' ', '_'))
+            col = _attr_expr(_json_key(jf))
 
             # For seating_capacity: treat 'N/A' (and No) as wildcard ONLY for PCV (Passenger Commercial Vehicles)
             # and NOT for vehicle_type 'Auto'. For other categories, do not treat 'N/A' as wildcard.
@@ -1308,20 +1620,20 @@ def get_top_5_payouts(**filters) -> List[dict]:
 
                 if is_pcv and not is_auto:
                     where_clauses.append(
-                        f"(JSON_EXTRACT(r.raw_json, '$.{key}') IS NULL OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')) = '' "
-                        f"OR LOWER(TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')))) IN ('no', 'n/a', 'all', 'null', 'none') OR JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) = %s)"
+                        f"({col} IS NULL OR TRIM(COALESCE({col}, '')) = '' "
+                        f"OR LOWER(TRIM({col})) IN ('no', 'n/a', 'all', 'null', 'none') OR {col} = %s)"
                     )
                 else:
                     where_clauses.append(
-                        f"(JSON_EXTRACT(r.raw_json, '$.{key}') IS NULL OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')) = '' "
-                        f"OR LOWER(TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')))) IN ('null', 'none') "
-                        f"OR JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) = %s)"
+                        f"({col} IS NULL OR TRIM(COALESCE({col}, '')) = '' "
+                        f"OR LOWER(TRIM({col})) IN ('null', 'none') "
+                        f"OR {col} = %s)"
                     )
                 params.append(val)
             else:
                 where_clauses.append(
-                    f"(JSON_EXTRACT(r.raw_json, '$.{key}') IS NULL OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')), '')) = '' "
-                    f"OR LOWER(TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')))) IN ('no', 'n/a', 'all', 'null', 'none') OR JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.{key}')) = %s)"
+                    f"({col} IS NULL OR TRIM(COALESCE({col}, '')) = '' "
+                    f"OR LOWER(TRIM({col})) IN ('no', 'n/a', 'all', 'null', 'none') OR {col} = %s)"
                 )
                 params.append(val)
 
@@ -1392,16 +1704,12 @@ def get_top_5_payouts(**filters) -> List[dict]:
         except Exception:
             pass
 
-    # date validity: ensure system/server date within date range if date fields present
-    # If dates are null/empty, applicable to all dates. If dates have values, check if today is within range.
-    # Note: JSON null when unquoted becomes the string 'null', so we must check for that
-    # Also: dates may be stored with timestamp (2026-01-15T00:00:00), so extract date part with DATE() or SUBSTRING()
-    from datetime import date
+    # date validity: today must fall inside [date_from, date_till]. The importer stores
+    # Date_from/Date_till as DATE columns (blank = open-ended, unparseable = never valid),
+    # so this is a plain range check on idx_rates_validity.
     today_str = date.today().isoformat()
-    where_clauses.append("(JSON_EXTRACT(r.raw_json, '$.Date_from') IS NULL OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Date_from')), '')) = '' OR LOWER(TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Date_from')))) = 'null' OR CAST(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Date_from')) AS DATE) <= %s)")
-    params.append(today_str)
-    where_clauses.append("(JSON_EXTRACT(r.raw_json, '$.Date_till') IS NULL OR TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Date_till')), '')) = '' OR LOWER(TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Date_till')))) = 'null' OR CAST(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Date_till')) AS DATE) >= %s)")
-    params.append(today_str)
+    where_clauses.append("r.date_from <= %s AND r.date_till >= %s")
+    params.extend([today_str, today_str])
 
     # assemble
     where_sql = ' AND '.join(where_clauses) if where_clauses else '1'
@@ -1416,32 +1724,32 @@ def get_top_5_payouts(**filters) -> List[dict]:
 
     if is_pcv_request:
         seating_present = (
-            "LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Seating_Capacity')), ''))) "
+            "LOWER(TRIM(COALESCE(r.seating_capacity, ''))) "
             "NOT IN ('', 'no', 'n/a', 'all', 'null')"
         )
         conditions_present = (
-            "LOWER(TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Conditions')), ''))) "
+            "LOWER(TRIM(COALESCE(r.condition_text, ''))) "
             "NOT IN ('', 'no', 'n/a', 'all', 'null')"
         )
         seating_text = (
             "CASE WHEN "
             + seating_present
-            + " THEN CONCAT(TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Seating_Capacity'))), ' seating') ELSE '' END"
+            + " THEN CONCAT(TRIM(r.seating_capacity), ' seating') ELSE '' END"
         )
         conditions_text = (
             "CASE WHEN "
             + conditions_present
             + " THEN CONCAT(CASE WHEN "
             + seating_present
-            + " THEN ', ' ELSE '' END, TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Conditions')))) ELSE '' END"
+            + " THEN ', ' ELSE '' END, TRIM(r.condition_text)) ELSE '' END"
         )
         combined_condition = f"TRIM(CONCAT({seating_text}, {conditions_text}))"
         condition_group_expr = f"CASE WHEN {combined_condition} = '' THEN 'General' ELSE {combined_condition} END"
     else:
         condition_group_expr = (
             "CASE "
-            "WHEN TRIM(COALESCE(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Conditions')), '')) IN ('', 'No', 'N/A', 'null') THEN 'General' "
-            "ELSE TRIM(JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Conditions'))) "
+            "WHEN TRIM(COALESCE(r.condition_text, '')) IN ('', 'No', 'N/A', 'null') THEN 'General' "
+            "ELSE TRIM(r.condition_text) "
             "END"
         )
 
@@ -1450,87 +1758,105 @@ def get_top_5_payouts(**filters) -> List[dict]:
     sql = (
         f"SELECT "
         f"  {condition_group_expr} AS condition_group, "
-        f"  JSON_UNQUOTE(JSON_EXTRACT(r.raw_json, '$.Company')) AS company_name, "
+        f"  r.company AS company_name, "
         f"  MAX(r.final_payout) AS final_payout "
         f"FROM rates r "
         f"WHERE {where_sql} "
         f"GROUP BY condition_group, company_name "
         f"ORDER BY condition_group, final_payout DESC"
     )
+    if top_n is not None:
+        sql = (
+            f"WITH agg AS ({sql}), "
+            f"typed AS ("
+            # Rank on the percentage _rank_payout_rows shows (fractions such as 0.3 are 30%)
+            f"  SELECT agg.*, TRIM(COALESCE(company_name, 'Unknown')) AS company_key, "
+            f"    CASE WHEN final_payout > 0 AND final_payout < 1 THEN final_payout * 100 "
+            f"         ELSE COALESCE(final_payout, 0) END AS payout_pct, "
+            f"    CASE WHEN LOWER(condition_group) LIKE '%commission on od%' THEN 'od' "
+            f"         WHEN LOWER(condition_group) LIKE '%commission on tp%' THEN 'tp' ELSE '' END AS condition_type "
+            f"  FROM agg), "
+            f"ranked AS ("
+            f"  SELECT typed.*, "
+            f"    ROW_NUMBER() OVER (PARTITION BY company_key ORDER BY payout_pct DESC, condition_group) AS company_row, "
+            f"    ROW_NUMBER() OVER (PARTITION BY company_key, condition_type ORDER BY payout_pct DESC, condition_group) AS type_row, "
+            f"    MAX(payout_pct) OVER (PARTITION BY company_key) AS company_best "
+            f"  FROM typed), "
+            f"companies AS ("
+            f"  SELECT ranked.*, DENSE_RANK() OVER (ORDER BY company_best DESC, company_key) AS company_rank "
+            f"  FROM ranked) "
+            f"SELECT condition_group, company_name, final_payout FROM companies "
+            f"WHERE company_rank > %s AND company_rank <= %s "
+            f"  AND (company_row = 1 OR (type_row = 1 AND condition_type <> '')) "
+            f"ORDER BY condition_group, final_payout DESC"
+        )
+        params.extend([offset, offset + top_n])
 
     cur.execute(sql, tuple(params))
     rows = cur.fetchall()
-    
-    # Format results: group by condition
-    results_by_condition = {}
+    cur.close()
+    return rows
+
+
+_PAN_INDIA_INSURERS = {
+    'national insurance',
+    'new india',
+    'oriental insurance',
+    'united india',
+}
+
+
+def _condition_type(text: str) -> str:
+    t = (text or '').strip().lower()
+    if 'commission on od' in t:
+        return 'od'
+    if 'commission on tp' in t:
+        return 'tp'
+    return ''
+
+
+def _rank_payout_rows(rows: List[dict], top_n: int = PAYOUT_TOP_N_DEFAULT, offset: int = 0) -> List[dict]:
+    """Turn (condition_group, company_name, final_payout) aggregates into ranked rows.
+
+    Insurers are ranked by their best payout; ranks offset+1 .. offset+top_n are returned.
+    """
+    # Flatten all and sort globally by payout (highest first), then by company name for tie-breaking
+    all_results = []
     for row in rows:
         condition = row.get('condition_group') or 'General'
         company = row.get('company_name') or 'Unknown'
         payout_raw = float(row.get('final_payout') or 0.0)
         payout = payout_raw * 100 if 0 < payout_raw < 1 else payout_raw
-        
-        if condition not in results_by_condition:
-            results_by_condition[condition] = []
-        results_by_condition[condition].append({
-            'company': company,
-            'payout': payout
+        all_results.append({
+            'conditions': condition if condition != 'General' else '',
+            'company_name': company,
+            'payout_percentage': payout
         })
-    
-    # Build final results: flatten all and sort globally by payout
-    all_results = []
-    for condition in results_by_condition.keys():
-        for company_data in results_by_condition[condition]:
-            all_results.append({
-                'conditions': condition if condition != 'General' else '',
-                'company_name': company_data['company'],
-                'payout_percentage': company_data['payout']
-            })
-    
-    # Sort globally by payout (highest first), then by company name for tie-breaking
     all_results.sort(key=lambda x: (-x['payout_percentage'], x['company_name']))
 
-    # Top-5 insurer grouping logic:
+    # Insurer grouping logic:
     # - rank by unique insurer (best payout per insurer)
     # - for pan-India insurers, if both Commission on OD and Commission on TP exist
     #   in matched rows, include both rows with SAME rank number
-    pan_india_insurers = {
-        'national insurance',
-        'new india',
-        'oriental insurance',
-        'united india',
-    }
-
     company_best = []
     seen_companies = set()
+    rows_by_company: Dict[str, List[dict]] = {}
     for row in all_results:
         cname = (row.get('company_name') or '').strip()
+        rows_by_company.setdefault(cname, []).append(row)
         ckey = cname.lower()
         if not ckey or ckey in seen_companies:
             continue
         seen_companies.add(ckey)
         company_best.append(cname)
-        if len(company_best) >= 5:
-            break
-
-    def _condition_type(text: str) -> str:
-        t = (text or '').strip().lower()
-        if 'commission on od' in t:
-            return 'od'
-        if 'commission on tp' in t:
-            return 'tp'
-        return ''
 
     results = []
-    for rank, company_name in enumerate(company_best, start=1):
-        company_rows = [r for r in all_results if (r.get('company_name') or '').strip() == company_name]
-        if not company_rows:
-            continue
-
-        company_key = company_name.strip().lower()
+    for rank, company_name in enumerate(company_best[offset:offset + top_n], start=offset + 1):
+        company_rows = rows_by_company[company_name]
         od_rows = [r for r in company_rows if _condition_type(r.get('conditions', '')) == 'od']
         tp_rows = [r for r in company_rows if _condition_type(r.get('conditions', '')) == 'tp']
 
-        if company_key in pan_india_insurers and od_rows and tp_rows:
+        if company_name.strip().lower() in _PAN_INDIA_INSURERS and od_rows and tp_rows:
             best_od = sorted(od_rows, key=lambda x: (-x['payout_percentage'], x.get('conditions', '')))[0]
             best_tp = sorted(tp_rows, key=lambda x: (-x['payout_percentage'], x.get('conditions', '')))[0]
             pair_rows = sorted([best_od, best_tp], key=lambda x: -x['payout_percentage'])
@@ -1550,6 +1876,944 @@ def get_top_5_payouts(**filters) -> List[dict]:
                 'payout_percentage': best_row['payout_percentage']
             })
 
+    return results
+
+
+# ==================== IN-MEMORY MATCHING ENGINE ====================
+# Optional replacement for _sql_payout_rows, enabled with PAYOUT_ENGINE=memory.
+# The active import's rates are loaded once and every raw_json cell is parsed
+# up front, so a payout check is answered without a SQL round-trip. Each check
+# below mirrors one WHERE clause built in _sql_payout_rows. A RuleIndex
+# (backend/rule_index.py) narrows the candidate rows with bitmaps first and
+# also answers the dropdown facet helpers.
+
+_EXCLUSION_PREFIXES = ('except ', 'declined ')
+_WILDCARD_CELLS = ('all', 'all make', 'n/a')
+_RULE_CACHE: Optional[dict] = None
+_RULE_CACHE_LOCK = threading.Lock()
+
+
+def _payout_engine() -> str:
+    """Matching engine selected via PAYOUT_ENGINE env (sql|memory|numpy). Default: sql.
+
+    numpy falls back to memory when numpy is not installed.
+    """
+    engine = os.getenv('PAYOUT_ENGINE', 'sql').strip().lower()
+    if engine == 'numpy' and VectorRuleTable is None:
+        logger.warning("PAYOUT_ENGINE=numpy but numpy is not installed; using the memory engine")
+        return 'memory'
+    return engine
+
+
+def _in_memory_engine() -> bool:
+    """True when payouts and dropdown facets are answered from the cached rule snapshot."""
+    return _payout_engine() in ('memory', 'numpy')
+
+
+@dataclass(frozen=True)
+class _RuleCell:
+    """One raw_json attribute of a rate row, pre-parsed for matching."""
+    raw: Optional[str]
+    blank: bool          # NULL / '' / 'null' / 'none' (wildcard)
+    low: str             # LOWER(TRIM(raw))
+    tokens: frozenset    # comma tokens (empty for exclusion cells), as stored in rate_token
+    exclusion: bool      # 'Except ...' / 'Declined ...'
+    excluded: frozenset  # names listed after Except/Declined
+
+
+_BLANK_CELL = _RuleCell(raw=None, blank=True, low='', tokens=frozenset(), exclusion=False, excluded=frozenset())
+
+
+@dataclass(frozen=True)
+class _CompiledRule:
+    rate_id: int
+    company: Optional[str]
+    final_payout: Optional[float]
+    age_min: Optional[int]
+    age_max: Optional[int]
+    gvw_min: Optional[float]
+    gvw_max: Optional[float]
+    applies_all_rto: bool
+    included_rtos: frozenset
+    excluded_rtos: frozenset
+    date_from: date
+    date_till: date
+    condition_group: str
+    pcv_condition_group: str
+    cells: Dict[str, _RuleCell]
+
+    def cell(self, key: str) -> _RuleCell:
+        return self.cells.get(key, _BLANK_CELL)
+
+
+def _compile_cell(value: Any, token_limit: Optional[int] = None) -> _RuleCell:
+    """Parse a cell the same way the importer explodes it into rate_token rows.
+
+    With token_limit (rate_token fields), tokens longer than the limit are dropped
+    like the importer drops them, so they never match.
+    """
+    if value is None:
+        return _BLANK_CELL
+
+    def kept(tokens: List[str]) -> frozenset:
+        return frozenset(t for t in tokens if token_limit is None or len(t) <= token_limit)
+
+    raw = str(value)
+    stripped = raw.strip()
+    low = stripped.lower()
+    if low.startswith(_EXCLUSION_PREFIXES):
+        names = stripped.split(' ', 1)[1]
+        return _RuleCell(
+            raw=raw, blank=False, low=low, tokens=frozenset(), exclusion=True,
+            excluded=kept(_split_comma_cell(names)),
+        )
+    tokens = _split_comma_cell(stripped)
+    return _RuleCell(
+        raw=raw,
+        blank=(not tokens or low in ('null', 'none')),
+        low=low,
+        tokens=kept(tokens),
+        exclusion=False,
+        excluded=frozenset(),
+    )
+
+
+def _compile_condition_groups(conditions: _RuleCell, seating: _RuleCell) -> tuple:
+    """Return (default, pcv) condition_group labels as built by the SQL CASE expressions."""
+    cond = (conditions.raw or '').strip()
+    default = 'General' if cond in ('', 'No', 'N/A', 'null') else cond
+
+    empty_values = ('', 'no', 'n/a', 'all', 'null')
+    seating_present = seating.low not in empty_values
+    conditions_present = conditions.low not in empty_values
+    seating_text = f"{(seating.raw or '').strip()} seating" if seating_present else ''
+    conditions_text = ((', ' if seating_present else '') + cond) if conditions_present else ''
+    pcv = (seating_text + conditions_text).strip() or 'General'
+    return default, pcv
+
+
+def _parse_raw_json(value: Any) -> dict:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    try:
+        parsed = json.loads(value) if value else {}
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _as_optional_float(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _load_compiled_rules(conn, import_id: Optional[int]) -> List[_CompiledRule]:
+    """Read rates (and their RTO include/exclude links) for one import and pre-parse them."""
+    scope = "WHERE r.import_id = %s" if import_id else ""
+    args = (import_id,) if import_id else ()
+    cur = conn.cursor()
+
+    rto_links: Dict[str, Dict[int, set]] = {'rate_included_rto': {}, 'rate_excluded_rto': {}}
+    for table, links in rto_links.items():
+        cur.execute(
+            f"SELECT l.rate_id, t.code FROM {table} l "
+            f"JOIN rto t ON t.id = l.rto_id JOIN rates r ON r.id = l.rate_id {scope}",
+            args,
+        )
+        for rate_id, code in cur.fetchall():
+            links.setdefault(int(rate_id), set()).add(str(code))
+
+    cur.execute(
+        "SELECT r.id, r.final_payout, r.age_min, r.age_max, r.gvw_min, r.gvw_max, r.applies_all_rto, "
+        f"r.date_from, r.date_till, r.raw_json FROM rates r {scope}",
+        args,
+    )
+    rules: List[_CompiledRule] = []
+    for (rate_id, final_payout, age_min, age_max, gvw_min, gvw_max, applies_all_rto,
+         date_from, date_till, raw_json) in cur.fetchall():
+        raw = _parse_raw_json(raw_json)
+        cells = {
+            str(k): _compile_cell(v, RATE_TOKEN_MAX_LEN if k in RATE_TOKEN_FIELDS else None)
+            for k, v in raw.items()
+        }
+        condition_group, pcv_condition_group = _compile_condition_groups(
+            cells.get('Conditions', _BLANK_CELL), cells.get('Seating_Capacity', _BLANK_CELL)
+        )
+        company = raw.get('Company')
+        rules.append(_CompiledRule(
+            rate_id=int(rate_id),
+            company=str(company) if company is not None else None,
+            final_payout=_as_optional_float(final_payout),
+            age_min=age_min,
+            age_max=age_max,
+            gvw_min=_as_optional_float(gvw_min),
+            gvw_max=_as_optional_float(gvw_max),
+            applies_all_rto=bool(applies_all_rto),
+            included_rtos=frozenset(rto_links['rate_included_rto'].get(int(rate_id), ())),
+            excluded_rtos=frozenset(rto_links['rate_excluded_rto'].get(int(rate_id), ())),
+            date_from=date_from,
+            date_till=date_till,
+            condition_group=condition_group,
+            pcv_condition_group=pcv_condition_group,
+            cells=cells,
+        ))
     cur.close()
-    conn.close()
+    return rules
+
+
+def _get_rule_snapshot(conn, import_id: Optional[int], updated_at: Any = None) -> dict:
+    """Return {'import_id', 'updated_at', 'rules', 'index', 'vector', 'active'} for import_id.
+
+    Reloads only when the active import or its imports.updated_at (in-place payout updates) changes.
+
+    'vector' is the NumPy column table (PAYOUT_ENGINE=numpy only, else None);
+    'active' is today's active rule set (see _active_rule_set).
+    """
+    global _RULE_CACHE
+    cached = _RULE_CACHE
+    if cached is not None and (cached['import_id'], cached['updated_at']) == (import_id, updated_at):
+        return cached
+    with _RULE_CACHE_LOCK:
+        cached = _RULE_CACHE
+        if cached is not None and (cached['import_id'], cached['updated_at']) == (import_id, updated_at):
+            return cached
+        rules = _load_compiled_rules(conn, import_id)
+        vector = VectorRuleTable(rules) if _payout_engine() == 'numpy' else None
+        _RULE_CACHE = {
+            'import_id': import_id,
+            'updated_at': updated_at,
+            'rules': rules,
+            'index': RuleIndex(rules, RATE_TOKEN_FIELDS),
+            'vector': vector,
+        }
+        logger.info("Loaded %d rate rules into memory (import_id=%s)", len(rules), import_id)
+        _active_rule_set(_RULE_CACHE, date.today())
+        return _RULE_CACHE
+
+
+def _get_rule_index(conn=None) -> RuleIndex:
+    """Bitmap index for the active import (opens a connection when none is passed)."""
+    with db_connection(conn) as conn:
+        return _get_rule_snapshot(conn, *_get_active_import(conn))['index']
+
+
+def get_rule_snapshot(import_id: Optional[int] = None) -> dict:
+    """Compiled rules + bitmap index of import_id (default: the active import)."""
+    with db_connection() as conn:
+        active_id, updated_at = _get_active_import(conn)
+        if import_id is not None and import_id != active_id:
+            updated_at = None
+        return _get_rule_snapshot(conn, import_id if import_id is not None else active_id, updated_at)
+
+
+def compute_payouts(snapshot: dict, filters: dict) -> List[dict]:
+    """Ranked payouts for filters evaluated against a rule snapshot (no DB access, no caches)."""
+    return _rank_payout_rows(_snapshot_payout_rows(snapshot, filters))
+
+
+def preload_rule_cache() -> int:
+    """Load the active import into the in-memory engine and build its indexes. Returns the number of rules."""
+    return len(_get_rule_index().rules)
+
+
+def _active_rule_set(snapshot: dict, today: date) -> dict:
+    """Rules of the snapshot whose Date_from/Date_till window contains today.
+
+    Returns {'valid_from', 'valid_until', 'bits', 'mask', 'count'}: a RuleIndex
+    bitmap (and a NumPy mask with PAYOUT_ENGINE=numpy) of the active rows. It is
+    cached on the snapshot and only recomputed once today leaves the window in
+    which no rule's validity opens or closes, so requests never re-check dates.
+    """
+    active = snapshot.get('active')
+    if active is not None and is_valid_on(active, today):
+        return active
+    rules = snapshot['rules']
+    valid_from, valid_until = validity_window(((r.date_from, r.date_till) for r in rules), today)
+    bits = 0
+    for pos, rule in enumerate(rules):
+        if rule.date_from <= today <= rule.date_till:
+            bits |= 1 << pos
+    vector = snapshot.get('vector')
+    active = {
+        'valid_from': valid_from,
+        'valid_until': valid_until,
+        'bits': bits,
+        'mask': vector.active_on(today) if vector is not None else None,
+        'count': bin(bits).count('1'),
+    }
+    snapshot['active'] = active
+    logger.info("Active rule set: %d of %d rules (until %s)", active['count'], len(rules), valid_until or 'open')
+    return active
+
+
+def _cell_token_match(cell: _RuleCell, values: List[str], allow_all: bool = True) -> bool:
+    """In-memory form of _token_match_condition (used by _comma_sep_match / _build_except_match_condition)."""
+    if cell.blank:
+        return True
+    stripped = [v.strip() for v in values]
+    if cell.exclusion:
+        return not any(v in cell.excluded for v in stripped)
+    if any(v in cell.tokens for v in stripped):
+        return True
+    return allow_all and cell.low in _WILDCARD_CELLS
+
+
+def _compile_payout_checks(filters: dict, today: Optional[date]) -> List[Callable[[_CompiledRule], bool]]:
+    """Build one predicate per WHERE clause that _sql_payout_rows would emit for these filters.
+
+    today=None leaves out the date check (the caller already restricted the rules to the active set).
+    """
+    checks: List[Callable[[_CompiledRule], bool]] = []
+
+    state = filters.get('state')
+    if state and state != 'N/A':
+        if state.lower() == 'others':
+            checks.append(lambda r: r.cell('State').blank or r.cell('State').exclusion)
+        else:
+            checks.append(lambda r, values=[state]: _cell_token_match(r.cell('State'), values))
+
+    rto = filters.get('rto_code')
+    if rto and rto != 'N/A':
+        if rto.lower() == 'others':
+            checks.append(lambda r: r.applies_all_rto and not r.excluded_rtos)
+        else:
+            checks.append(lambda r: rto in r.included_rtos or (r.applies_all_rto and rto not in r.excluded_rtos))
+
+    for jf in _COMMA_SEP_FIELDS:
+        val = filters.get(jf)
+        if val and str(val).strip():
+            key = _json_key(jf)
+            user_val = str(val).strip()
+            values = _expand_filter_values(key, user_val) if key == 'Vehicle_Type' else [user_val]
+            checks.append(lambda r, key=key, values=values: _cell_token_match(r.cell(key), values))
+
+    business_val = filters.get('business_type')
+    if business_val and str(business_val).strip():
+        selected = str(business_val).strip()
+        if selected.lower() in ('renewal', 'rollover'):
+            selected = 'Old'
+        blank_matches = selected.lower() == 'old'
+
+        def _business_match(r, selected=selected, blank_matches=blank_matches):
+            cell = r.cell('Business_Type')
+            if cell.blank:
+                return blank_matches
+            return selected in cell.tokens or cell.low in _WILDCARD_CELLS
+        checks.append(_business_match)
+
+    make_val = filters.get('make')
+    if make_val and str(make_val).strip() and str(make_val).strip().lower() not in ('all', 'all make', 'n/a'):
+        checks.append(lambda r, values=[make_val.strip()]: _cell_token_match(r.cell('Make'), values))
+
+    model_val = filters.get('model')
+    if model_val and str(model_val).strip() and str(model_val).strip().lower() not in ('all', 'n/a', 'other'):
+        checks.append(lambda r, values=[model_val.strip()]: _cell_token_match(r.cell('Model'), values))
+
+    for jf in ('watt_slab', 'seating_capacity'):
+        val = filters.get(jf)
+        if not (val and str(val).strip()):
+            continue
+        if jf == 'seating_capacity' and str(val).strip().lower() == 'other':
+            val = 'N/A'
+        wildcards = ('no', 'n/a', 'all')
+        if jf == 'seating_capacity':
+            vcat = str(filters.get('vehicle_category') or '').lower()
+            vtype = str(filters.get('vehicle_type') or '').lower()
+            is_pcv = ('pcv' in vcat) or ('passenger' in vcat)
+            if not is_pcv or vtype == 'auto':
+                wildcards = ()
+        key = _json_key(jf)
+        checks.append(
+            lambda r, key=key, val=val, wildcards=wildcards:
+                r.cell(key).blank or r.cell(key).low in wildcards or r.cell(key).raw == val
+        )
+
+    vage = filters.get('vehicle_age')
+    if vage:
+        try:
+            age_num = int(vage)
+            checks.append(
+                lambda r: (r.age_min is None or r.age_min <= age_num) and (r.age_max is None or r.age_max >= age_num)
+            )
+        except Exception:
+            pass
+
+    gvw_slab = filters.get('gvw_slab')
+    if gvw_slab and str(gvw_slab).strip():
+        try:
+            parts = [p.strip() for p in str(gvw_slab).strip().split('|')]
+            if len(parts) == 2:
+                slab_min = float(parts[0])
+                slab_max = None if parts[1].upper() == 'MAX' else float(parts[1])
+                checks.append(
+                    lambda r: r.gvw_min is not None
+                    and (slab_max is None or r.gvw_min <= slab_max)
+                    and (r.gvw_max is None or r.gvw_max >= slab_min)
+                )
+        except Exception:
+            pass
+
+    gvw = filters.get('gvw_value')
+    if gvw and not (gvw_slab and str(gvw_slab).strip()):
+        try:
+            gvw_num = float(gvw)
+            vehicle_category_val = str(filters.get('vehicle_category') or '').strip().lower()
+            vehicle_type_val = str(filters.get('vehicle_type') or '').strip().lower()
+            strict = 'gcv' in vehicle_category_val and '4 wheeler' in vehicle_type_val
+
+            def _gvw_match(r, strict=strict):
+                if r.gvw_min is None and r.gvw_max is None:
+                    return not strict
+                return r.gvw_min is not None and r.gvw_max is not None and r.gvw_min <= gvw_num <= r.gvw_max
+            checks.append(_gvw_match)
+        except Exception:
+            pass
+
+    if today is not None:
+        checks.append(lambda r: r.date_from <= today <= r.date_till)
+    return checks
+
+
+def _index_candidates(index: RuleIndex, filters: dict) -> int:
+    """Bitmap of rows that can pass the token checks of _compile_payout_checks.
+
+    Covers State, the comma-separated fields, Business_Type and Make/Model; every
+    candidate is still verified against the full predicate list.
+    """
+    bits = index.all
+
+    state = filters.get('state')
+    if state and state != 'N/A':
+        if state.lower() == 'others':
+            field = index.field('State')
+            bits &= field.blank | field.exclusion
+        else:
+            bits &= index.token_match('State', [state], _WILDCARD_CELLS)
+
+    for jf in _COMMA_SEP_FIELDS:
+        val = filters.get(jf)
+        if val and str(val).strip():
+            key = _json_key(jf)
+            user_val = str(val).strip()
+            values = _expand_filter_values(key, user_val) if key == 'Vehicle_Type' else [user_val]
+            bits &= index.token_match(key, values, _WILDCARD_CELLS)
+
+    business_val = filters.get('business_type')
+    if business_val and str(business_val).strip():
+        selected = str(business_val).strip()
+        if selected.lower() in ('renewal', 'rollover'):
+            selected = 'Old'
+        field = index.field('Business_Type')
+        match = field.any_of([selected]) | field.low_in(_WILDCARD_CELLS)
+        if selected.lower() == 'old':
+            match |= field.blank
+        bits &= match
+
+    make_val = filters.get('make')
+    if make_val and str(make_val).strip() and str(make_val).strip().lower() not in ('all', 'all make', 'n/a'):
+        bits &= index.token_match('Make', [make_val.strip()], _WILDCARD_CELLS)
+
+    model_val = filters.get('model')
+    if model_val and str(model_val).strip() and str(model_val).strip().lower() not in ('all', 'n/a', 'other'):
+        bits &= index.token_match('Model', [model_val.strip()], _WILDCARD_CELLS)
+
+    return bits
+
+
+def _memory_payout_rows(
+    rules: List[_CompiledRule],
+    filters: dict,
+    index: Optional[RuleIndex] = None,
+    active: Optional[dict] = None,
+) -> List[dict]:
+    """Same result shape and ordering as _sql_payout_rows, evaluated against compiled rules.
+
+    With an index, active (see _active_rule_set) replaces the per-rule date check.
+    """
+    use_active = index is not None and active is not None
+    checks = _compile_payout_checks(filters, None if use_active else date.today())
+    vehicle_category_val = str(filters.get('vehicle_category') or '').strip().lower()
+    is_pcv_request = ('pcv' in vehicle_category_val) or ('passenger' in vehicle_category_val)
+
+    if index is not None:
+        bits = _index_candidates(index, filters)
+        if use_active:
+            bits &= active['bits']
+        rules = [index.rules[pos] for pos in iter_bits(bits)]
+
+    best: Dict[tuple, Optional[float]] = {}
+    for rule in rules:
+        if not all(check(rule) for check in checks):
+            continue
+        group = rule.pcv_condition_group if is_pcv_request else rule.condition_group
+        key = (group, rule.company)
+        current = best.get(key)
+        if key not in best or (rule.final_payout is not None and (current is None or rule.final_payout > current)):
+            best[key] = rule.final_payout
+
+    rows = [
+        {'condition_group': group, 'company_name': company, 'final_payout': payout}
+        for (group, company), payout in best.items()
+    ]
+    rows.sort(key=lambda row: (row['condition_group'], -(row['final_payout'] or 0.0)))
+    return rows
+
+
+# Payout filter keys a dropdown can count (the token fields _index_candidates covers, plus watt_slab)
+FACET_FIELDS = (*_COMMA_SEP_FIELDS, 'business_type', 'make', 'model', 'watt_slab')
+
+
+def _company_bits(snapshot: dict) -> Dict[str, int]:
+    """company -> bitmap of its rules, cached on the snapshot."""
+    companies = snapshot.get('companies')
+    if companies is None:
+        companies = {}
+        for pos, rule in enumerate(snapshot['rules']):
+            companies[rule.company] = companies.get(rule.company, 0) | (1 << pos)
+        snapshot['companies'] = companies
+    return companies
+
+
+def get_facet_counts(field: str, options: List[str], filters: Optional[dict] = None) -> Dict[str, dict]:
+    """Per dropdown option: {'insurers': distinct companies, 'rules': active rules} a quote could match.
+
+    field is a payout filter key (see FACET_FIELDS); filters holds the upstream
+    selections (vehicle_category, vehicle_type, fuel_type, make, ...). Counted
+    from the active import's bitmap index with the same token rules as the
+    payout match; state, RTO and vehicle age are not known yet, so a count is
+    an upper bound and 0 means the option cannot return any payout.
+    """
+    if field not in FACET_FIELDS:
+        raise ValueError(f"Unsupported facet field: {field}")
+    with db_connection() as conn:
+        snapshot = _get_rule_snapshot(conn, *_get_active_import(conn))
+    index = snapshot['index']
+    base = _index_candidates(index, filters or {}) & _active_rule_set(snapshot, date.today())['bits']
+    companies = _company_bits(snapshot)
+    counts = {}
+    for option in options:
+        if field == 'watt_slab':
+            # Whole-cell match, as in the watt_slab payout check
+            watt = index.field('Watt_Slab')
+            bits = base & (watt.blank | watt.low_in(('no', 'n/a', 'all', str(option).strip().lower())))
+        else:
+            bits = base & _index_candidates(index, {field: option})
+        counts[option] = {
+            'insurers': sum(1 for company_bits in companies.values() if company_bits & bits),
+            'rules': bin(bits).count('1'),
+        }
+    return counts
+
+
+# ==================== NUMPY MATCHING ENGINE ====================
+# PAYOUT_ENGINE=numpy: the same checks as _compile_payout_checks, evaluated as
+# boolean masks over the snapshot's VectorRuleTable (backend/vector_engine.py),
+# followed by a vectorized MAX(final_payout) per (condition_group, company).
+# Masks are memoized per clause, so a batch that repeats e.g. the same state
+# or vehicle type computes that mask once.
+
+def _vector_payout_mask(table, filters: dict, active_mask, memo: Optional[dict] = None):
+    """AND of active_mask and the masks for every other WHERE clause _sql_payout_rows would emit."""
+    memo = {} if memo is None else memo
+
+    def clause(key: tuple, build: Callable):
+        mask = memo.get(key)
+        if mask is None:
+            mask = build()
+            memo[key] = mask
+        return mask
+
+    mask = active_mask.copy()
+
+    state = filters.get('state')
+    if state and state != 'N/A':
+        if state.lower() == 'others':
+            col = table.column('State')
+            mask &= clause(('state_others',), lambda: col.blank | col.exclusion)
+        else:
+            mask &= clause(('token', 'State', (state,)), lambda: table.column('State').token_match([state], _WILDCARD_CELLS))
+
+    rto = filters.get('rto_code')
+    if rto and rto != 'N/A':
+        if rto.lower() == 'others':
+            mask &= clause(('rto_others',), lambda: table.applies_all_rto & ~table.has_rto_exclusions)
+        else:
+            mask &= clause(('rto', rto), lambda: table.included_rtos.any_of([rto])
+                           | (table.applies_all_rto & ~table.excluded_rtos.any_of([rto])))
+
+    for jf in _COMMA_SEP_FIELDS:
+        val = filters.get(jf)
+        if val and str(val).strip():
+            key = _json_key(jf)
+            user_val = str(val).strip()
+            values = tuple(_expand_filter_values(key, user_val) if key == 'Vehicle_Type' else [user_val])
+            mask &= clause(('token', key, values),
+                           lambda key=key, values=values: table.column(key).token_match(values, _WILDCARD_CELLS))
+
+    business_val = filters.get('business_type')
+    if business_val and str(business_val).strip():
+        selected = str(business_val).strip()
+        if selected.lower() in ('renewal', 'rollover'):
+            selected = 'Old'
+
+        def _business_mask():
+            col = table.column('Business_Type')
+            match = ~col.blank & (col.tokens.any_of([selected]) | col.low_in(_WILDCARD_CELLS))
+            return match | col.blank if selected.lower() == 'old' else match
+        mask &= clause(('business', selected), _business_mask)
+
+    make_val = filters.get('make')
+    if make_val and str(make_val).strip() and str(make_val).strip().lower() not in ('all', 'all make', 'n/a'):
+        make = make_val.strip()
+        mask &= clause(('token', 'Make', (make,)), lambda: table.column('Make').token_match([make], _WILDCARD_CELLS))
+
+    model_val = filters.get('model')
+    if model_val and str(model_val).strip() and str(model_val).strip().lower() not in ('all', 'n/a', 'other'):
+        model = model_val.strip()
+        mask &= clause(('token', 'Model', (model,)), lambda: table.column('Model').token_match([model], _WILDCARD_CELLS))
+
+    for jf in ('watt_slab', 'seating_capacity'):
+        val = filters.get(jf)
+        if not (val and str(val).strip()):
+            continue
+        if jf == 'seating_capacity' and str(val).strip().lower() == 'other':
+            val = 'N/A'
+        wildcards = ('no', 'n/a', 'all')
+        if jf == 'seating_capacity':
+            vcat = str(filters.get('vehicle_category') or '').lower()
+            vtype = str(filters.get('vehicle_type') or '').lower()
+            is_pcv = ('pcv' in vcat) or ('passenger' in vcat)
+            if not is_pcv or vtype == 'auto':
+                wildcards = ()
+        key = _json_key(jf)
+
+        def _exact_mask(key=key, val=val, wildcards=wildcards):
+            col = table.column(key)
+            return col.blank | col.low_in(wildcards) | col.raw_eq(val)
+        mask &= clause(('exact', key, val, wildcards), _exact_mask)
+
+    vage = filters.get('vehicle_age')
+    if vage:
+        try:
+            age_num = int(vage)
+            mask &= clause(('age', age_num), lambda: table.age_match(age_num))
+        except Exception:
+            pass
+
+    gvw_slab = filters.get('gvw_slab')
+    if gvw_slab and str(gvw_slab).strip():
+        try:
+            parts = [p.strip() for p in str(gvw_slab).strip().split('|')]
+            if len(parts) == 2:
+                slab_min = float(parts[0])
+                slab_max = None if parts[1].upper() == 'MAX' else float(parts[1])
+                mask &= clause(('gvw_slab', slab_min, slab_max), lambda: table.gvw_slab_match(slab_min, slab_max))
+        except Exception:
+            pass
+
+    gvw = filters.get('gvw_value')
+    if gvw and not (gvw_slab and str(gvw_slab).strip()):
+        try:
+            gvw_num = float(gvw)
+            vehicle_category_val = str(filters.get('vehicle_category') or '').strip().lower()
+            vehicle_type_val = str(filters.get('vehicle_type') or '').strip().lower()
+            strict = 'gcv' in vehicle_category_val and '4 wheeler' in vehicle_type_val
+            mask &= clause(('gvw', gvw_num, strict), lambda: table.gvw_value_match(gvw_num, strict))
+        except Exception:
+            pass
+
+    return mask
+
+
+def _vector_payout_rows(table, filters: dict, active_mask, memo: Optional[dict] = None) -> List[dict]:
+    """Same result shape and ordering as _memory_payout_rows, evaluated with NumPy masks."""
+    vehicle_category_val = str(filters.get('vehicle_category') or '').strip().lower()
+    is_pcv_request = ('pcv' in vehicle_category_val) or ('passenger' in vehicle_category_val)
+    rows = table.best_by_group(_vector_payout_mask(table, filters, active_mask, memo), is_pcv_request)
+    rows.sort(key=lambda row: (row['condition_group'], -(row['final_payout'] or 0.0)))
+    return rows
+
+
+def _snapshot_payout_rows(snapshot: dict, filters: dict, memo: Optional[dict] = None) -> List[dict]:
+    """Unranked payout rows from a rule snapshot, through the NumPy table when the snapshot has one."""
+    active = _active_rule_set(snapshot, date.today())
+    if snapshot.get('vector') is not None:
+        return _vector_payout_rows(snapshot['vector'], filters, active['mask'], memo)
+    return _memory_payout_rows(snapshot['rules'], filters, snapshot['index'], active)
+
+
+# ==================== PAYOUT RESULT CACHE ====================
+# Ranked results keyed by the requested page (top_n, offset) and the normalized
+# filters from check_payout, tagged with (import_id, updated_at, today): a newer
+# completed import, an in-place payout update or a date change (Date_from /
+# Date_till validity) drops every cached entry.
+# PAYOUT_CACHE_SIZE=0 disables it.
+
+_PAYOUT_CACHE = VersionedLRUCache(
+    max_size=int(os.getenv('PAYOUT_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.getenv('PAYOUT_CACHE_TTL', '300')),
+)
+
+
+def _payout_cache_key(filters: dict) -> tuple:
+    return tuple(sorted((k, None if v is None else str(v)) for k, v in filters.items()))
+
+
+def get_payout_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the get_top_5_payouts result cache."""
+    return _PAYOUT_CACHE.stats()
+
+
+# ==================== PRECOMPUTED PAYOUT CUBE ====================
+# Built by scripts/build_payout_cube.py. When payout_cube_meta has a row for the
+# active import that is valid today, a payout check is one primary-key lookup;
+# any miss falls back to live matching. PAYOUT_CUBE=false turns lookups off.
+
+_CUBE_META_CACHE: Dict[tuple, tuple] = {}  # (import_id, updated_at) -> (checked_at, meta)
+_CUBE_META_RECHECK_SECONDS = 60.0
+
+
+def _cube_enabled() -> bool:
+    return os.getenv('PAYOUT_CUBE', 'true').strip().lower() in ('1', 'true', 'yes')
+
+
+def _load_cube_meta(conn, import_id: int, updated_at) -> Optional[dict]:
+    cur = conn.cursor()
+    try:
+        # Only a cube built for exactly this data version: one built before the
+        # import's rows were updated in place (older updated_at) is stale
+        cur.execute(
+            "SELECT classes, valid_from, valid_until FROM payout_cube_meta "
+            "WHERE import_id = %s AND import_updated_at <=> %s",
+            (import_id, updated_at),
+        )
+        row = cur.fetchone()
+    except Error:
+        # Cube tables not created yet (build script never ran)
+        return None
+    finally:
+        cur.close()
+    if not row:
+        return None
+    classes, valid_from, valid_until = row
+    return {
+        'classes': json.loads(classes),
+        'valid_from': valid_from,
+        'valid_until': valid_until,
+    }
+
+
+def _get_cube_meta(conn, import_id: Optional[int], updated_at) -> Optional[dict]:
+    """payout_cube_meta for the data version (import_id, updated_at), re-read at most every
+    _CUBE_META_RECHECK_SECONDS (a new version is always read at once)."""
+    if not import_id:
+        return None
+    version = (import_id, updated_at)
+    cached = _CUBE_META_CACHE.get(version)
+    now = time.monotonic()
+    if cached is not None and now - cached[0] < _CUBE_META_RECHECK_SECONDS:
+        return cached[1]
+    meta = _load_cube_meta(conn, import_id, updated_at)
+    _CUBE_META_CACHE.clear()
+    _CUBE_META_CACHE[version] = (now, meta)
+    return meta
+
+
+def _cube_lookup(conn, import_id: Optional[int], updated_at, filters: dict) -> Optional[List[dict]]:
+    """Ranked payouts from payout_cube, or None when the combination is not precomputed."""
+    if not _cube_enabled():
+        return None
+    meta = _get_cube_meta(conn, import_id, updated_at)
+    if meta is None or not is_valid_on(meta, date.today()):
+        return None
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT p.payload FROM payout_cube c "
+            "JOIN payout_cube_payload p ON p.import_id = c.import_id AND p.payload_hash = c.payload_hash "
+            "WHERE c.import_id = %s AND c.combo_key = %s",
+            (import_id, cube_key(filters, meta['classes'])),
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    return json.loads(row[0]) if row else None
+
+
+def get_top_5_payouts(top_n: int = PAYOUT_TOP_N_DEFAULT, offset: int = 0, **filters) -> List[dict]:
+    """Return top payouts matching given filters. Uses current import batch.
+
+    top_n / offset page through the full ranked insurer list (ranks offset+1 .. offset+top_n).
+
+    This implements basic matching: rto included/excluded logic, slab numeric checks (if provided), and flexible matching for other fields using JSON values.
+    Handles comma-separated values and 'All' wildcards.
+    With PAYOUT_ENGINE=memory the same predicates run against the in-memory rule cache instead of MySQL;
+    PAYOUT_ENGINE=numpy evaluates them as vectorized masks over the same cache.
+    Results are served from _PAYOUT_CACHE while the active import is unchanged, then from the
+    precomputed payout cube when one was built for the active import.
+    """
+    return get_top_5_payouts_batch([filters], top_n=top_n, offset=offset)[0]
+
+
+def get_top_5_payouts_batch(
+    filters_list: List[dict], top_n: int = PAYOUT_TOP_N_DEFAULT, offset: int = 0, conn=None
+) -> List[List[dict]]:
+    """get_top_5_payouts for many filter sets, in order, against one import snapshot.
+
+    Uses a single connection (conn when given) and import-id lookup for the whole
+    batch; identical filter sets within the batch are evaluated once.
+    """
+    results: List[Optional[List[dict]]] = [None] * len(filters_list)
+    with db_connection(conn) as conn:
+        import_id, updated_at = _get_active_import(conn)
+        _detect_import_change((import_id, updated_at))
+        version = (import_id, updated_at, date.today())
+        computed: Dict[tuple, tuple] = {}
+        snapshot = None
+        masks: dict = {}  # NumPy clause masks shared by the batch (PAYOUT_ENGINE=numpy)
+        default_page = top_n == PAYOUT_TOP_N_DEFAULT and offset == 0
+        for pos, filters in enumerate(filters_list):
+            key = (top_n, offset, _payout_cache_key(filters))
+            payouts = computed.get(key)
+            if payouts is None:
+                payouts = _PAYOUT_CACHE.get(version, key)
+            if payouts is None:
+                # The cube only holds the default first page
+                ranked = _cube_lookup(conn, import_id, updated_at, filters) if default_page else None
+                if ranked is None:
+                    if _in_memory_engine():
+                        snapshot = snapshot or _get_rule_snapshot(conn, import_id, updated_at)
+                        rows = _snapshot_payout_rows(snapshot, filters, masks)
+                        ranked = _rank_payout_rows(rows, top_n, offset)
+                    else:
+                        # Rows are already limited to this page's insurers; only renumber the ranks
+                        rows = _sql_payout_rows(conn, import_id, filters, top_n, offset)
+                        ranked = _rank_payout_rows(rows, top_n)
+                        for row in ranked:
+                            row['rank'] += offset
+                payouts = tuple(dict(p) for p in ranked)
+                _PAYOUT_CACHE.put(version, key, payouts)
+            computed[key] = payouts
+            results[pos] = [dict(p) for p in payouts]
     return results
+
+
+def get_payouts_and_log(
+    filters_list: List[dict], log_entries: List[tuple], top_n: int = PAYOUT_TOP_N_DEFAULT, offset: int = 0
+) -> List[List[dict]]:
+    """get_top_5_payouts_batch on one pooled connection, then queue the matching query_log rows.
+
+    log_entries are (state, rto, vehicle_type, fuel_type, policy_type) per filter set;
+    the result count and the filters (for warm_payout_cache) are appended.
+    """
+    results = get_top_5_payouts_batch(filters_list, top_n=top_n, offset=offset)
+    log_queries([
+        (*entry, len(payouts), _filters_json(filters))
+        for entry, filters, payouts in zip(log_entries, filters_list, results)
+    ])
+    return results
+
+
+# ==================== CACHE WARM-UP ====================
+# Fills the dropdown caches (get_distinct_* lists and the /api/catalog payload) and
+# replays the most frequent recent filter sets from query_log so the first requests
+# after a restart or a new import are cache hits. Budget: PAYOUT_WARMUP_TOP_K
+# combinations (0 disables the payout replay), PAYOUT_WARMUP_SECONDS,
+# PAYOUT_WARMUP_WORKERS threads, combinations seen in the last PAYOUT_WARMUP_DAYS days.
+
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_CHUNK = 25
+_LAST_WARMUP: Dict[str, Any] = {}
+
+
+def _top_logged_filters(top_k: int, days: int) -> List[dict]:
+    since = datetime.now() - timedelta(days=days)
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT filters_json, COUNT(*) AS hits FROM query_log "
+            "WHERE ts >= %s AND filters_json IS NOT NULL "
+            "GROUP BY filters_json ORDER BY hits DESC LIMIT %s",
+            (since, top_k),
+        )
+        rows = cur.fetchall()
+        cur.close()
+    return [json.loads(r[0]) for r in rows]
+
+
+def _warm_dropdowns() -> int:
+    """Build the form catalog, which goes through every get_distinct_* list; returns the cached list count."""
+    from .catalog import get_catalog  # catalog imports this module
+
+    get_catalog()
+    return _DISTINCT_CACHE.stats()['size']
+
+
+def warm_payout_cache(top_k: Optional[int] = None, max_seconds: Optional[float] = None, workers: Optional[int] = None) -> dict:
+    """Fill the rule, dropdown and result caches for the active import.
+
+    The dropdown catalog build and chunks of the most frequent logged filter
+    sets (one connection each) run on a thread pool, catalog first; whatever is
+    not done after max_seconds is skipped (a catalog build already running
+    finishes in the background). Returns counters of the run.
+    """
+    top_k = int(os.getenv('PAYOUT_WARMUP_TOP_K', '500')) if top_k is None else top_k
+    max_seconds = float(os.getenv('PAYOUT_WARMUP_SECONDS', '30')) if max_seconds is None else max_seconds
+    default_workers = max(1, int(os.getenv('DB_POOL_SIZE', '5')) // 2)
+    workers = int(os.getenv('PAYOUT_WARMUP_WORKERS', str(default_workers))) if workers is None else workers
+    stats = {'dropdowns': 0, 'combos': 0, 'warmed': 0, 'timed_out': False, 'seconds': 0.0}
+    if not _WARMUP_LOCK.acquire(blocking=False):
+        return stats
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='payout-warmup')
+    try:
+        if _in_memory_engine():
+            preload_rule_cache()
+        # None marks the catalog future, ints the number of combinations in a chunk
+        futures: Dict[Any, Optional[int]] = {pool.submit(_warm_dropdowns): None}
+        combos: List[dict] = []
+        if top_k > 0:
+            try:
+                combos = _top_logged_filters(top_k, int(os.getenv('PAYOUT_WARMUP_DAYS', '7')))
+            except Error as e:
+                logger.warning("Payout warm-up skipped, query_log not readable: %s", e)
+        stats['combos'] = len(combos)
+        for i in range(0, len(combos), _WARMUP_CHUNK):
+            chunk = combos[i:i + _WARMUP_CHUNK]
+            futures[pool.submit(get_top_5_payouts_batch, chunk)] = len(chunk)
+        try:
+            for future in as_completed(futures, timeout=max(0.0, max_seconds - (time.monotonic() - started))):
+                try:
+                    result = future.result()
+                except Exception:
+                    logger.warning("%s warm-up failed", "Dropdown" if futures[future] is None else "Payout chunk", exc_info=True)
+                    continue
+                if futures[future] is None:
+                    stats['dropdowns'] = result
+                else:
+                    stats['warmed'] += futures[future]
+        except FuturesTimeout:
+            stats['timed_out'] = True
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        stats['seconds'] = round(time.monotonic() - started, 3)
+        _LAST_WARMUP.clear()
+        _LAST_WARMUP.update(stats)
+        _WARMUP_LOCK.release()
+    logger.info(
+        "Cache warm-up: %d dropdown list(s), %d/%d payout combination(s) in %.1fs%s",
+        stats['dropdowns'], stats['warmed'], stats['combos'], stats['seconds'],
+        " (time budget reached)" if stats['timed_out'] else "",
+    )
+    return stats
+
+
+def _warm_in_background() -> None:
+    if not _WARMUP_LOCK.locked():
+        threading.Thread(target=warm_payout_cache, name='payout-warmup', daemon=True).start()
+
+
+def get_warmup_stats() -> dict:
+    """Counters of the last warm_payout_cache run (empty before the first one)."""
+    return dict(_LAST_WARMUP, running=_WARMUP_LOCK.locked())
@@ -0,0 +1,48 @@
+"""Async bridge for the blocking database layer used by the FastAPI handlers.
+
+`mysql.connector` (and the in-memory engines' first load) block the calling
+thread. Handlers `await run_db(func, *args)` instead of calling `database`
+functions directly: the call runs in a worker thread and the event loop keeps
+serving other requests meanwhile.
+
+At most DB_MAX_CONCURRENCY calls (default: DB_POOL_SIZE, else 5) run at once;
+further callers wait on the limiter without holding a thread or a pooled
+connection.
+"""
+import functools
+import os
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+from anyio import to_thread
+
+_LIMITER: Optional[anyio.CapacityLimiter] = None
+
+
+def _max_concurrency() -> int:
+    return max(1, int(os.getenv('DB_MAX_CONCURRENCY') or os.getenv('DB_POOL_SIZE') or 5))
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    # Created lazily: a CapacityLimiter has to be created inside the running event loop
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = anyio.CapacityLimiter(_max_concurrency())
+    return _LIMITER
+
+
+async def run_db(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking database call in a worker thread, bounded by DB_MAX_CONCURRENCY."""
+    return await to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_get_limiter())
+
+
+def get_db_executor_stats() -> Dict[str, Any]:
+    """Current limiter usage: configured max, calls running and calls waiting."""
+    if _LIMITER is None:
+        return {'max_concurrency': _max_concurrency(), 'running': 0, 'waiting': 0}
+    stats = _LIMITER.statistics()
+    return {
+        'max_concurrency': int(_LIMITER.total_tokens),
+        'running': stats.borrowed_tokens,
+        'waiting': stats.tasks_waiting,
+    }
@@ -0,0 +1,96 @@
+"""Key helpers for the precomputed payout cube (see scripts/build_payout_cube.py).
+
+The cube stores the ranked get_top_5_payouts result for every reachable form
+combination of one import. Inputs that can never change the answer are folded
+into one class before hashing, which keeps the cube small. The classes are
+computed per vehicle category by the build script and stored with the cube
+(payout_cube_meta.classes):
+
+- age_breaks[category]: ages between two consecutive rule bounds (age_min,
+  age_max + 1) match the same rows, so the age is replaced by its lower breakpoint.
+- rto["category|state"]: RTO codes included/excluded by exactly the same rules of
+  that category and state map to one representative code.
+- blank values and 'N/A' state/RTO are filters that are not applied at all.
+"""
+import bisect
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+
+def age_breaks_from_bounds(bounds: Iterable[tuple]) -> List[int]:
+    """Sorted ages at which the set of matching (age_min, age_max) rows can change."""
+    breaks = set()
+    for age_min, age_max in bounds:
+        if age_min is not None:
+            breaks.add(int(age_min))
+        if age_max is not None:
+            breaks.add(int(age_max) + 1)
+    return sorted(breaks)
+
+
+def age_class(value: Any, age_breaks: Sequence[int]) -> str:
+    try:
+        age = int(value)
+    except (TypeError, ValueError):
+        return str(value)
+    pos = bisect.bisect_right(age_breaks, age)
+    return f"~{age_breaks[pos - 1]}" if pos else "~lt"
+
+
+def rto_class_key(category: Any, state: Any) -> str:
+    return f"{category}|{state}"
+
+
+def canonical_filters(filters: Dict[str, Any], classes: Dict[str, Any]) -> Dict[str, str]:
+    """Filters as get_top_5_payouts sees them, with equivalent inputs folded together."""
+    items = {k: str(v) for k, v in filters.items() if v is not None and str(v).strip() != ''}
+    if items.get('state') == 'N/A':
+        del items['state']
+    if items.get('rto_code') == 'N/A':
+        del items['rto_code']
+    category = items.get('vehicle_category')
+    rto = items.get('rto_code')
+    if rto is not None:
+        rto_map = classes.get('rto', {}).get(rto_class_key(category, items.get('state')), {})
+        items['rto_code'] = rto_map.get(rto, rto)
+    if 'vehicle_age' in items:
+        items['vehicle_age'] = age_class(items['vehicle_age'], classes.get('age_breaks', {}).get(category, []))
+    return items
+
+
+def cube_key(filters: Dict[str, Any], classes: Dict[str, Any]) -> str:
+    """Primary key (sha1 hex) of a payout_cube row."""
+    canonical = canonical_filters(filters, classes)
+    payload = json.dumps(sorted(canonical.items()), ensure_ascii=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def payload_hash(payload: str) -> str:
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def validity_window(date_ranges: Iterable[tuple], today: date) -> tuple:
+    """(valid_from, valid_until) during which no rule's Date_from/Date_till flips.
+
+    valid_until is exclusive; None means open-ended.
+    """
+    valid_from, valid_until = date.min, None
+    for date_from, date_till in date_ranges:
+        for start in (date_from, date_till + timedelta(days=1) if date_till < date.max else None):
+            if start is None or start == date.min:
+                continue
+            if start <= today:
+                valid_from = max(valid_from, start)
+            elif valid_until is None or start < valid_until:
+                valid_until = start
+    return valid_from, valid_until
+
+
+def is_valid_on(meta: Dict[str, Any], today: date) -> bool:
+    valid_from: Optional[date] = meta.get('valid_from')
+    valid_until: Optional[date] = meta.get('valid_until')
+    if valid_from is not None and today < valid_from:
+        return False
+    return valid_until is None or today < valid_until
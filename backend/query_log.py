@@ -0,0 +1,248 @@
+"""Background writer for query_log rows.
+
+Request handlers only append to a bounded in-process queue; a daemon thread
+flushes it with one multi-row INSERT every QUERY_LOG_BATCH_SIZE rows or
+QUERY_LOG_FLUSH_MS milliseconds, on its own pooled connection. When the queue
+is full (or a flush fails) rows are appended to QUERY_LOG_SPILL_PATH as JSON
+lines and re-inserted once the database keeps up again; without a spill path
+they are dropped and counted. Logging therefore never blocks a quote.
+
+A batch rejected for its own data (row_errors, e.g. a value too long for its
+column under strict mode) is retried row by row; only the rows that still fail
+are dropped, and they are never spilled, so one bad row cannot hold up a
+replay.
+
+Rows carry their own timestamp (taken when they are queued), so rows written
+late by a flush or a spill replay still land in the right rollup bucket. A
+`.replay` file left behind by a process that stopped mid-replay is picked up
+again when the writer starts.
+"""
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLogWriter:
+    """Bounded queue + flusher thread for query_log rows (tuples in insert_sql column order)."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        prepare: Callable[[Any], None],
+        insert_sql: str,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_ms: int = 1000,
+        spill_path: Optional[str] = None,
+        row_errors: Tuple[type, ...] = (),
+    ):
+        self._connect = connect
+        self._row_errors = row_errors
+        self._prepare = prepare
+        self._insert_sql = insert_sql
+        self._width = insert_sql.count('%s')
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = max(flush_ms, 1) / 1000.0
+        self.spill_path = Path(spill_path) if spill_path else None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._table_ready = False
+        self._replay_after = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.flushes = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        connect: Callable[[], Any],
+        prepare: Callable[[Any], None],
+        insert_sql: str,
+        row_errors: Tuple[type, ...] = (),
+    ) -> "QueryLogWriter":
+        return cls(
+            connect,
+            prepare,
+            insert_sql,
+            max_queue=int(os.getenv('QUERY_LOG_QUEUE_SIZE', '10000')),
+            batch_size=int(os.getenv('QUERY_LOG_BATCH_SIZE', '200')),
+            flush_ms=int(os.getenv('QUERY_LOG_FLUSH_MS', '1000')),
+            spill_path=os.getenv('QUERY_LOG_SPILL_PATH') or None,
+            row_errors=row_errors,
+        )
+
+    def start(self) -> None:
+        """Start the flusher thread now (it replays leftover spill files first)."""
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='query-log-writer', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, entries: List[tuple]) -> None:
+        """Queue rows without blocking; overflow goes to the spill file (or is dropped)."""
+        self._ensure_started()
+        overflow = []
+        for entry in entries:
+            try:
+                self._queue.put_nowait(tuple(entry))
+            except queue.Full:
+                overflow.append(tuple(entry))
+        if overflow:
+            self._spill(overflow)
+
+    def _spill(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        if self.spill_path is None:
+            with self._lock:
+                self.dropped += len(rows)
+            return
+        try:
+            with self._lock, self.spill_path.open('a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(list(row)) + '\n')
+                self.spilled += len(rows)
+        except OSError:
+            logger.warning("query_log spill to %s failed", self.spill_path, exc_info=True)
+            with self._lock:
+                self.dropped += len(rows)
+
+    def _write(self, rows: List[tuple]) -> None:
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            if not self._table_ready:
+                self._prepare(cur)  # create / migrate the table once per process
+                self._table_ready = True
+            cur.executemany(self._insert_sql, rows)
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+    def _flush(self, rows: List[tuple]) -> bool:
+        """Insert rows. Returns False when the database failed and the rows went to the spill file.
+
+        Rows rejected for their own data are retried one at a time and dropped when they still fail.
+        """
+        try:
+            self._write(rows)
+        except self._row_errors:
+            if len(rows) > 1:
+                for pos, row in enumerate(rows):
+                    if not self._flush([row]):
+                        self._spill(rows[pos + 1:])
+                        return False
+                return True
+            logger.warning("query_log row dropped, rejected by the database: %r", rows[0], exc_info=True)
+            with self._lock:
+                self.errors += 1
+                self.dropped += 1
+            return True
+        except Exception:
+            logger.warning("query_log flush of %d row(s) failed", len(rows), exc_info=True)
+            with self._lock:
+                self.errors += 1
+            # Back off before replaying spilled rows into a database that just failed
+            self._replay_after = time.monotonic() + max(self.flush_seconds, 5.0)
+            self._spill(rows)
+            return False
+        with self._lock:
+            self.written += len(rows)
+            self.flushes += 1
+        return True
+
+    def _replay_spill(self) -> None:
+        """Re-insert spilled rows once the queue has drained."""
+        if self.spill_path is None or time.monotonic() < self._replay_after:
+            return
+        replaying = self.spill_path.with_name(self.spill_path.name + '.replay')
+        if not self.spill_path.exists() and not replaying.exists():
+            return
+        try:
+            with self._lock:
+                if self.spill_path.exists():
+                    if replaying.exists():
+                        # Left behind by a process that stopped mid-replay: keep its rows too
+                        with replaying.open('a', encoding='utf-8') as out, self.spill_path.open(encoding='utf-8') as src:
+                            shutil.copyfileobj(src, out)
+                        self.spill_path.unlink()
+                    else:
+                        self.spill_path.replace(replaying)
+            with replaying.open(encoding='utf-8') as f:
+                # Rows spilled by an older version may lack trailing columns (e.g. ts): NULL-pad them
+                rows = [tuple(row) + (None,) * (self._width - len(row))
+                        for row in (json.loads(line) for line in f if line.strip())]
+        except (OSError, ValueError):
+            logger.warning("query_log spill replay from %s failed", self.spill_path, exc_info=True)
+            return
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            if not self._flush(chunk):
+                # The failed chunk is spilled again by _flush; keep the rest for the next attempt
+                self._spill(rows[start + self.batch_size:])
+                break
+            with self._lock:
+                self.replayed += len(chunk)
+        replaying.unlink(missing_ok=True)
+
+    def _run(self) -> None:
+        self._replay_spill()
+        while True:
+            batch: List[tuple] = []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+            elif self._stopping.is_set():
+                return
+            else:
+                self._replay_spill()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush what is queued and stop the flusher thread (app shutdown)."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'max_queue': self._queue.maxsize,
+                'batch_size': self.batch_size,
+                'flush_ms': int(self.flush_seconds * 1000),
+                'written': self.written,
+                'flushes': self.flushes,
+                'errors': self.errors,
+                'spilled': self.spilled,
+                'replayed': self.replayed,
+                'dropped': self.dropped,
+            }
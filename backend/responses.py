@@ -0,0 +1,50 @@
+"""Response encoding options for the API (opt-in via environment).
+
+- API_FAST_JSON: FastJSONResponse becomes the default response class. It
+  renders with orjson when that package is installed (optional dependency),
+  else with the standard library's json and compact separators.
+- API_COMPRESSION (off|gzip|br) and API_COMPRESSION_MIN_SIZE: compress
+  responses of at least that many bytes when the client accepts it. 'br' needs
+  the optional brotli-asgi package (it falls back to gzip for clients without
+  brotli support); without it 'gzip' is used.
+"""
+import json
+import logging
+from typing import Any
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+
+try:  # orjson is optional (API_FAST_JSON)
+    import orjson
+except ImportError:  # pragma: no cover - depends on the deployment
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (or compact json when orjson is missing)."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def add_compression(app: Any, mode: str, minimum_size: int) -> str:
+    """Install the compression middleware for mode ('gzip', 'br' or 'off'). Returns the mode in effect."""
+    mode = (mode or 'off').strip().lower()
+    if mode == 'br':
+        try:
+            from brotli_asgi import BrotliMiddleware
+        except ImportError:
+            logger.warning("API_COMPRESSION=br needs the brotli-asgi package; using gzip")
+            mode = 'gzip'
+        else:
+            app.add_middleware(BrotliMiddleware, minimum_size=minimum_size, gzip_fallback=True)
+            return 'br'
+    if mode == 'gzip':
+        app.add_middleware(GZipMiddleware, minimum_size=minimum_size)
+        return 'gzip'
+    return 'off'
@@ -0,0 +1,110 @@
+"""Compiled RTO master (`data/extraction/rto_master.json`).
+
+`data/extraction/district_rto` holds the RTO master as a JS object literal
+(`const rtoMasterData = {...}`). `scripts/build_rto_master.py` parses it once
+and writes a JSON artifact:
+
+    {
+        "format": 1,
+        "version": "<sha1 of district_rto>",
+        "source": {state: {code: name}},          as written in district_rto
+        "states": {
+            "TN": {
+                "options": [{"code", "name", "label"}, ...],   sorted, all codes
+                "payload": {"rtos": [...], "rto_options": [...]}   /api/rtos/TN body
+            },
+            ...
+        }
+    }
+
+The artifact is only used while its version matches the source file; a
+missing or stale artifact falls back to parsing district_rto.
+"""
+import ast
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_DIR = Path(__file__).resolve().parents[1] / 'data' / 'extraction'
+SOURCE_PATH = EXTRACTION_DIR / 'district_rto'
+ARTIFACT_PATH = EXTRACTION_DIR / 'rto_master.json'
+ARTIFACT_FORMAT = 1
+
+
+def source_version(source: Path = SOURCE_PATH) -> Optional[str]:
+    """SHA-1 of the source file (None when it does not exist)."""
+    try:
+        return hashlib.sha1(source.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def parse_source(source: Path = SOURCE_PATH) -> Dict[str, Any]:
+    """Parse the `rtoMasterData` object literal of district_rto ({} when missing or unreadable)."""
+    if not source.exists():
+        return {}
+    text = source.read_text(encoding='utf-8', errors='ignore')
+    start = text.find('const rtoMasterData =')
+    if start < 0:
+        return {}
+    brace_start = text.find('{', start)
+    if brace_start < 0:
+        return {}
+
+    depth = 0
+    brace_end = -1
+    for i in range(brace_start, len(text)):
+        ch = text[i]
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                brace_end = i
+                break
+    if brace_end < 0:
+        return {}
+
+    try:
+        parsed = ast.literal_eval(text[brace_start:brace_end + 1])
+    except Exception:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def load_artifact(path: Path = ARTIFACT_PATH, source: Path = SOURCE_PATH) -> Optional[Dict[str, Any]]:
+    """The compiled artifact, or None when it is missing, unreadable or older than the source."""
+    try:
+        with path.open(encoding='utf-8') as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(artifact, dict) or artifact.get('format') != ARTIFACT_FORMAT:
+        return None
+    version = source_version(source)
+    if version is not None and artifact.get('version') != version:
+        logger.warning("%s is stale (district_rto changed); run scripts/build_rto_master.py", path.name)
+        return None
+    return artifact
+
+
+def write_artifact(artifact: Dict[str, Any], path: Path = ARTIFACT_PATH) -> None:
+    """Write the artifact atomically (readers never see a partial file)."""
+    tmp = path.with_name(path.name + '.tmp')
+    with tmp.open('w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False, indent=1)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def load_source_map(source: Path = SOURCE_PATH) -> Dict[str, Any]:
+    """{state: {code: name}} as written in district_rto, from the artifact when it is current."""
+    artifact = load_artifact(source=source)
+    if artifact is not None:
+        return artifact.get('source') or {}
+    return parse_source(source)
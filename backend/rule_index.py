@@ -0,0 +1,107 @@
+"""Bitmap inverted index over the active import's rate rules.
+
+Each rule gets a position (its index in the compiled rule list) and every
+attribute key maps its values to a bitmap of positions, stored as a plain
+Python int. A filter then becomes a few bitwise ANDs/ORs instead of a scan:
+
+- tokens[value]    rows whose comma list contains value
+- excluded[value]  'Except ...' / 'Declined ...' rows that list value
+- exclusion        every Except/Declined row
+- blank            NULL / '' / 'null' / 'none' rows (wildcard)
+- by_low[text]     rows whose whole cell equals text (lowercased), e.g. 'all', 'n/a'
+
+Rules only need a `cells` mapping of pre-parsed cells with the attributes
+blank, low, tokens, exclusion, excluded and raw (see database._RuleCell).
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Yield set bit positions of bits in ascending order."""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class FieldBitmaps:
+    """Bitmaps for one attribute key."""
+
+    __slots__ = ('tokens', 'excluded', 'exclusion', 'blank', 'by_low')
+
+    def __init__(self) -> None:
+        self.tokens: Dict[str, int] = {}
+        self.excluded: Dict[str, int] = {}
+        self.exclusion = 0
+        self.blank = 0
+        self.by_low: Dict[str, int] = {}
+
+    def add(self, pos: int, cell: Any) -> None:
+        bit = 1 << pos
+        if cell.blank:
+            self.blank |= bit
+        if cell.exclusion:
+            self.exclusion |= bit
+            for name in cell.excluded:
+                self.excluded[name] = self.excluded.get(name, 0) | bit
+        for token in cell.tokens:
+            self.tokens[token] = self.tokens.get(token, 0) | bit
+        self.by_low[cell.low] = self.by_low.get(cell.low, 0) | bit
+
+    def any_of(self, values: Iterable[str], table: Optional[Dict[str, int]] = None) -> int:
+        table = self.tokens if table is None else table
+        bits = 0
+        for value in values:
+            bits |= table.get(value, 0)
+        return bits
+
+    def low_in(self, lows: Iterable[str]) -> int:
+        return self.any_of(lows, self.by_low)
+
+
+class RuleIndex:
+    """Inverted index over one list of compiled rules (positions = list indexes)."""
+
+    def __init__(self, rules: Sequence[Any], keys: Iterable[str]):
+        self.rules = rules
+        self.all = (1 << len(rules)) - 1
+        self.fields: Dict[str, FieldBitmaps] = {key: FieldBitmaps() for key in keys}
+        for pos, rule in enumerate(rules):
+            for key, field in self.fields.items():
+                field.add(pos, rule.cell(key))
+
+    def field(self, key: str) -> FieldBitmaps:
+        field = self.fields.get(key)
+        if field is None:
+            # Unindexed key: build it on first use (cells are immutable per import)
+            field = FieldBitmaps()
+            for pos, rule in enumerate(self.rules):
+                field.add(pos, rule.cell(key))
+            self.fields[key] = field
+        return field
+
+    def token_match(self, key: str, values: Sequence[str], wildcards: Sequence[str] = ()) -> int:
+        """Rows matching any of values: blank, listed token, Except-row not excluding them, or wildcard cell."""
+        field = self.field(key)
+        stripped = [v.strip() for v in values]
+        kept_exclusions = field.exclusion & ~field.any_of(stripped, field.excluded)
+        return field.blank | kept_exclusions | field.any_of(stripped) | field.low_in(wildcards)
+
+    def facet_match(self, key: str, values: Sequence[str]) -> int:
+        """Rows offered by the dropdown cascade: token hit, Except-row not excluding the values,
+        or an 'All' cell (blanks do not match). Same rules as database._facet_match_condition."""
+        field = self.field(key)
+        stripped = [v.strip() for v in values]
+        kept_exclusions = field.exclusion & ~field.any_of(stripped, field.excluded)
+        return field.any_of(stripped) | kept_exclusions | field.by_low.get('all', 0)
+
+    def raw_values(self, key: str, bits: Optional[int] = None) -> List[str]:
+        """Distinct non-null raw cell values of key among rows in bits (default: all rows)."""
+        seen: Dict[str, None] = {}
+        positions = range(len(self.rules)) if bits is None else iter_bits(bits)
+        for pos in positions:
+            cell = self.rules[pos].cell(key)
+            if cell.raw is None or cell.low in ('null', 'none'):
+                continue
+            seen.setdefault(cell.raw, None)
+        return list(seen)
@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional, Any
 
+from .config import VEHICLE_CATEGORY_MAP
+
 
 class CompanyPayout(BaseModel):
     company_name: Optional[str] = None
@@ -29,3 +31,93 @@ class PayoutResponse(BaseModel):
     top_3_payouts: List[CompanyPayout] = []
     top_5_payouts: List[CompanyPayout] = []
     total_companies: int = 0
+
+
+class PayoutResponseV2(BaseModel):
+    """PayoutResponse with the ranked list once (?v=2); empty fields are left out of the JSON."""
+    status: str
+    message: Optional[str] = None
+    rto_code: Optional[str] = None
+    payouts: List[CompanyPayout] = []
+    total_companies: int = 0
+
+
+class PayoutQuery(BaseModel):
+    """One quote input; same fields as the /check-payout form."""
+    state: str
+    rto_number: Optional[str] = None
+    vehicle_category: str
+    vehicle_type: Optional[str] = None
+    fuel_type: Optional[str] = None
+    cc_slab: Optional[str] = None
+    seating_capacity: Optional[str] = None
+    gvw_slab: Optional[str] = None
+    gvw_value: Optional[str] = None
+    watt_slab: Optional[str] = None
+    vehicle_age: Optional[str] = None
+    policy_type: str
+    business_type: str
+    ncb_slab: Optional[str] = None
+    cpa_cover: Optional[str] = None
+    zero_dep: Optional[str] = None
+    trailer: Optional[str] = None
+    make: Optional[str] = None
+    model: Optional[str] = None
+
+    @field_validator('*', mode='before')
+    @classmethod
+    def _numbers_as_text(cls, value: Any) -> Any:
+        # JSON clients may send ages / RTO numbers / GVW as numbers; form posts always send text
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return value
+
+    def payout_filters(self, state_code: str, rto_code: str) -> dict:
+        """get_top_5_payouts kwargs for this quote (state/RTO already resolved by the caller)."""
+        # Map vehicle category display name to code if needed (DB may store code)
+        vehicle_category_code = VEHICLE_CATEGORY_MAP.get(self.vehicle_category, self.vehicle_category)
+        age_value = (self.vehicle_age or "").strip()
+        business_type = self.business_type
+        if (business_type or "").strip().lower() in ("renewal", "rollover"):
+            business_type = "Old"
+        fuel_type = self.fuel_type
+        cc_slab = self.cc_slab
+        watt_slab = self.watt_slab
+        seating_capacity = self.seating_capacity
+        make = self.make
+        model = self.model
+        return dict(
+            state=state_code,
+            rto_code=rto_code,
+            vehicle_type=self.vehicle_type,
+            fuel_type=fuel_type if fuel_type and fuel_type.lower() != 'others' else None,  # 'Others' → None (no filter)
+            policy_type=self.policy_type,
+            vehicle_age="1" if age_value.lower() == "new" else age_value,
+            business_type=business_type,
+            vehicle_category=vehicle_category_code,
+            cc_slab=cc_slab if cc_slab and cc_slab.lower() != 'others' else None,  # 'Others' → None (no filter)
+            gvw_slab=self.gvw_slab,
+            gvw_value=self.gvw_value,
+            watt_slab=watt_slab if watt_slab and watt_slab.lower() != 'others' else None,  # 'Others' → None (no filter)
+            seating_capacity=seating_capacity if seating_capacity and seating_capacity.lower() != 'others' else None,  # 'Others' → N/A (wildcard)
+            ncb_slab=self.ncb_slab,
+            cpa_cover=self.cpa_cover,
+            zero_depreciation=self.zero_dep,
+            trailer=self.trailer or None,
+            make=make if make and str(make).strip().lower() not in ('other', 'others', '') else None,
+            model=model if model and str(model).strip().lower() not in ('other', 'others', '') else None
+        )
+
+
+class BatchPayoutResponse(BaseModel):
+    status: str
+    message: Optional[str] = None
+    total: int = 0
+    results: List[PayoutResponse] = []
+
+
+class BatchPayoutResponseV2(BaseModel):
+    status: str
+    message: Optional[str] = None
+    total: int = 0
+    results: List[PayoutResponseV2] = []
@@ -0,0 +1,77 @@
+"""In-memory cache for the HTML pages served by backend/app.py.
+
+Each page is read from disk once and split around its `__NAME__` placeholders.
+Its rendering with every placeholder empty (the common case) is kept as bytes
+together with a strong ETag and a gzip-compressed copy. With
+TEMPLATE_RELOAD=true (development) the file's mtime is checked on every request
+and a changed file is re-read; otherwise pages stay cached until restart.
+"""
+import gzip
+import hashlib
+import html
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Tuple
+
+_PLACEHOLDER = re.compile(r'__([A-Z][A-Z_]*)__')
+
+
+@dataclass(frozen=True)
+class PageTemplate:
+    mtime_ns: int
+    parts: Tuple[str, ...]  # literal text and placeholder names alternate: text, name, text, ...
+    body: bytes  # rendering with every placeholder empty
+    etag: str
+    gzip_body: bytes
+
+    def render(self, **values: str) -> bytes:
+        """Page with the placeholders filled in (values are HTML-escaped)."""
+        if not any(values.values()):
+            return self.body
+        return ''.join(
+            html.escape(values.get(part) or '') if i % 2 else part
+            for i, part in enumerate(self.parts)
+        ).encode('utf-8')
+
+
+def compile_page(text: str, mtime_ns: int = 0) -> PageTemplate:
+    parts = tuple(_PLACEHOLDER.split(text))
+    body = ''.join(parts[::2]).encode('utf-8')
+    return PageTemplate(
+        mtime_ns=mtime_ns,
+        parts=parts,
+        body=body,
+        etag='"%s"' % hashlib.sha1(body).hexdigest(),
+        gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+    )
+
+
+class TemplateCache:
+    """name -> PageTemplate for the files of one directory."""
+
+    def __init__(self, directory: Path, reload: bool = False):
+        self.directory = Path(directory)
+        self.reload = reload
+        self._pages: Dict[str, PageTemplate] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> PageTemplate:
+        page = self._pages.get(name)
+        if page is not None and not self.reload:
+            return page
+        path = self.directory / name
+        mtime_ns = path.stat().st_mtime_ns
+        if page is not None and page.mtime_ns == mtime_ns:
+            return page
+        with self._lock:
+            page = self._pages.get(name)
+            if page is None or page.mtime_ns != mtime_ns:
+                page = compile_page(path.read_text(encoding='utf-8'), mtime_ns)
+                self._pages[name] = page
+        return page
+
+    def preload(self, *names: str) -> None:
+        for name in names:
+            self.get(name)
@@ -0,0 +1,170 @@
+"""Columnar NumPy encoding of the active import's rate rules (PAYOUT_ENGINE=numpy).
+
+Every attribute is integer-coded: a cell's comma tokens become (row, code)
+pairs, Except/Declined names become a second pair list, and blank / exclusion
+rows are boolean masks. Age, GVW and payout are float arrays (NaN = empty),
+Date_from/Date_till are day ordinals. A filter is answered as a boolean mask
+over all rows; database._vector_payout_rows combines the masks the same way
+_compile_payout_checks combines its predicates.
+
+Rules only need the attributes of database._CompiledRule.
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+def _codes(vocab: Dict[Any, int], values: Iterable[Any]) -> List[int]:
+    return [vocab[v] for v in values if v in vocab]
+
+
+class _PairColumn:
+    """(row, code) pairs for a many-valued attribute (comma tokens, RTO lists)."""
+
+    def __init__(self, n_rows: int, rows_values: Iterable[Iterable[Any]], vocab: Optional[Dict[Any, int]] = None):
+        self.n_rows = n_rows
+        self.vocab: Dict[Any, int] = {} if vocab is None else vocab
+        rows: List[int] = []
+        codes: List[int] = []
+        for pos, values in enumerate(rows_values):
+            for value in values:
+                rows.append(pos)
+                codes.append(self.vocab.setdefault(value, len(self.vocab)))
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.codes = np.asarray(codes, dtype=np.int32)
+        # Row positions grouped by code: rows[starts[c]:starts[c + 1]] after a stable sort on code
+        order = np.argsort(self.codes, kind='stable')
+        self._sorted_rows = self.rows[order]
+        self._starts = np.searchsorted(self.codes[order], np.arange(len(self.vocab) + 1))
+
+    def any_of(self, values: Iterable[Any]) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for code in _codes(self.vocab, values):
+            if code < len(self._starts) - 1:
+                mask[self._sorted_rows[self._starts[code]:self._starts[code + 1]]] = True
+        return mask
+
+
+class TokenColumn:
+    """One raw_json attribute: comma tokens, Except/Declined names and whole-cell codes."""
+
+    def __init__(self, cells: Sequence[Any]):
+        n = len(cells)
+        self.tokens = _PairColumn(n, (c.tokens for c in cells))
+        self.excluded = _PairColumn(n, (c.excluded for c in cells))
+        self.blank = np.fromiter((c.blank for c in cells), dtype=bool, count=n)
+        self.exclusion = np.fromiter((c.exclusion for c in cells), dtype=bool, count=n)
+        self.low_vocab: Dict[str, int] = {}
+        self.low = np.fromiter((self.low_vocab.setdefault(c.low, len(self.low_vocab)) for c in cells), dtype=np.int32, count=n)
+        self.raw_vocab: Dict[Optional[str], int] = {}
+        self.raw = np.fromiter((self.raw_vocab.setdefault(c.raw, len(self.raw_vocab)) for c in cells), dtype=np.int32, count=n)
+
+    def low_in(self, lows: Iterable[str]) -> np.ndarray:
+        return np.isin(self.low, _codes(self.low_vocab, lows))
+
+    def raw_eq(self, value: str) -> np.ndarray:
+        code = self.raw_vocab.get(value)
+        return self.raw == code if code is not None else np.zeros(len(self.raw), dtype=bool)
+
+    def token_match(self, values: Sequence[str], wildcards: Sequence[str] = ()) -> np.ndarray:
+        """Blank, listed token, Except-row not excluding the values, or wildcard cell."""
+        stripped = [v.strip() for v in values]
+        kept_exclusions = self.exclusion & ~self.excluded.any_of(stripped)
+        return self.blank | kept_exclusions | self.tokens.any_of(stripped) | self.low_in(wildcards)
+
+
+def _float_column(values: Iterable[Optional[float]], n: int) -> np.ndarray:
+    return np.fromiter((np.nan if v is None else float(v) for v in values), dtype=np.float64, count=n)
+
+
+class VectorRuleTable:
+    """Columnar view over one list of compiled rules (row = list index)."""
+
+    def __init__(self, rules: Sequence[Any]):
+        n = len(rules)
+        self.rules = rules
+        self.n_rows = n
+        self._columns: Dict[str, TokenColumn] = {}
+        self.age_min = _float_column((r.age_min for r in rules), n)
+        self.age_max = _float_column((r.age_max for r in rules), n)
+        self.gvw_min = _float_column((r.gvw_min for r in rules), n)
+        self.gvw_max = _float_column((r.gvw_max for r in rules), n)
+        self.final_payout = _float_column((r.final_payout for r in rules), n)
+        self.date_from = np.fromiter((r.date_from.toordinal() for r in rules), dtype=np.int64, count=n)
+        self.date_till = np.fromiter((r.date_till.toordinal() for r in rules), dtype=np.int64, count=n)
+        self.applies_all_rto = np.fromiter((r.applies_all_rto for r in rules), dtype=bool, count=n)
+        self.has_rto_exclusions = np.fromiter((bool(r.excluded_rtos) for r in rules), dtype=bool, count=n)
+        rto_vocab: Dict[str, int] = {}
+        self.included_rtos = _PairColumn(n, (r.included_rtos for r in rules), rto_vocab)
+        self.excluded_rtos = _PairColumn(n, (r.excluded_rtos for r in rules), rto_vocab)
+
+        self.company_vocab: Dict[Optional[str], int] = {}
+        self.company = np.fromiter(
+            (self.company_vocab.setdefault(r.company, len(self.company_vocab)) for r in rules), dtype=np.int64, count=n
+        )
+        self.companies = list(self.company_vocab)
+        group_vocab: Dict[str, int] = {}
+        self.condition_group = np.fromiter(
+            (group_vocab.setdefault(r.condition_group, len(group_vocab)) for r in rules), dtype=np.int64, count=n
+        )
+        self.pcv_condition_group = np.fromiter(
+            (group_vocab.setdefault(r.pcv_condition_group, len(group_vocab)) for r in rules), dtype=np.int64, count=n
+        )
+        self.groups = list(group_vocab)
+
+    def column(self, key: str) -> TokenColumn:
+        col = self._columns.get(key)
+        if col is None:
+            col = TokenColumn([r.cell(key) for r in self.rules])
+            self._columns[key] = col
+        return col
+
+    def all_rows(self) -> np.ndarray:
+        return np.ones(self.n_rows, dtype=bool)
+
+    def active_on(self, today: date) -> np.ndarray:
+        day = today.toordinal()
+        return (self.date_from <= day) & (day <= self.date_till)
+
+    def age_match(self, age: int) -> np.ndarray:
+        return (np.isnan(self.age_min) | (self.age_min <= age)) & (np.isnan(self.age_max) | (self.age_max >= age))
+
+    def gvw_slab_match(self, slab_min: float, slab_max: Optional[float]) -> np.ndarray:
+        """Rows with a GVW range overlapping [slab_min, slab_max] (slab_max None = open)."""
+        match = ~np.isnan(self.gvw_min) & (np.isnan(self.gvw_max) | (self.gvw_max >= slab_min))
+        return match if slab_max is None else match & (self.gvw_min <= slab_max)
+
+    def gvw_value_match(self, value: float, strict: bool) -> np.ndarray:
+        """Rows whose GVW range contains value; rows without a range too unless strict."""
+        in_range = (self.gvw_min <= value) & (value <= self.gvw_max)  # NaN compares False
+        if strict:
+            return in_range
+        return in_range | (np.isnan(self.gvw_min) & np.isnan(self.gvw_max))
+
+    def best_by_group(self, mask: np.ndarray, pcv: bool) -> List[dict]:
+        """MAX(final_payout) per (condition_group, company) over masked rows, in first-seen row order."""
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return []
+        groups = (self.pcv_condition_group if pcv else self.condition_group)[rows]
+        keys = groups * len(self.companies) + self.company[rows]
+        payouts = self.final_payout[rows]
+        # Sort by key, then payout descending (NaN last), then row; first entry of each key is its best.
+        order = np.lexsort((rows, np.where(np.isnan(payouts), np.inf, -payouts), keys))
+        sorted_keys = keys[order]
+        first = np.ones(sorted_keys.size, dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        best_pos = order[first]
+        # Keys in order of their first matching row, like a dict filled in row order
+        _, first_seen = np.unique(keys, return_index=True)
+        key_first_row = dict(zip(keys[np.sort(first_seen)].tolist(), range(first_seen.size)))
+        results: List[Optional[dict]] = [None] * first_seen.size
+        for pos in best_pos.tolist():
+            payout = payouts[pos]
+            results[key_first_row[int(keys[pos])]] = {
+                'condition_group': self.groups[int(groups[pos])],
+                'company_name': self.companies[int(self.company[rows[pos]])],
+                'final_payout': None if np.isnan(payout) else float(payout),
+            }
+        return results
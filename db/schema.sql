@@ -5,10 +5,12 @@ CREATE TABLE IF NOT EXISTS imports (
   filename VARCHAR(255),
   uploaded_by VARCHAR(100),
   uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   effective_month DATE,
   status ENUM('pending','completed','failed') DEFAULT 'pending',
   row_count INT DEFAULT 0,
-  notes TEXT
+  notes TEXT,
+  INDEX idx_imports_active (status, uploaded_at)
 );
 
 CREATE TABLE IF NOT EXISTS rates (
@@ -28,11 +30,42 @@ CREATE TABLE IF NOT EXISTS rates (
   age_min INT NULL,
   age_max INT NULL,
   applies_all_rto BOOLEAN DEFAULT FALSE,
+  -- Date_from/Date_till validity: blank = open-ended (1000-01-01 / 9999-12-31),
+  -- unparseable = never valid (from 9999-12-31 / till 1000-01-01)
+  date_from DATE NOT NULL DEFAULT '1000-01-01',
+  date_till DATE NOT NULL DEFAULT '9999-12-31',
+  -- Typed copies of raw_json attributes (backend/config.py RATE_ATTRIBUTE_COLUMNS); utf8mb4_bin
+  -- compares case-sensitively like JSON_UNQUOTE(raw_json ...) and the in-memory engine
+  state VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  vehicle_category VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  vehicle_type VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  fuel_type VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  policy_type VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  business_type VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  cc_slab VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  gvw_slab VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  watt_slab VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  seating_capacity VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  ncb_slab VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  cpa_cover VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  zero_depreciation VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  trailer VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  make VARCHAR(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
+  model VARCHAR(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
   raw_json JSON,
+  -- SHA-1 of raw_json without "Final Payout" (scripts/import_data.py _row_hash): --update-payouts match key
+  row_hash CHAR(40) NULL,
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
   FOREIGN KEY (import_id) REFERENCES imports(id),
   INDEX idx_rates_import (import_id),
-  INDEX idx_rates_state_code (state_code)
+  INDEX idx_rates_state_code (state_code),
+  INDEX idx_rates_state (import_id, state),
+  INDEX idx_rates_category_type (import_id, vehicle_category, vehicle_type),
+  INDEX idx_rates_type_fuel (import_id, vehicle_type, fuel_type),
+  INDEX idx_rates_policy_business (import_id, policy_type, business_type),
+  INDEX idx_rates_make_model (import_id, make(191), model(191)),
+  INDEX idx_rates_validity (import_id, date_from, date_till),
+  INDEX idx_rates_row_hash (import_id, row_hash)
 );
 
 CREATE TABLE IF NOT EXISTS rto (
@@ -57,6 +90,53 @@ CREATE TABLE IF NOT EXISTS rate_excluded_rto (
   FOREIGN KEY (rto_id) REFERENCES rto(id) ON DELETE CASCADE
 );
 
+-- Comma/exclusion-aware cells exploded into one row per token (see scripts/import_data.py).
+-- token '' = blank cell, '*' = All/All make/N/A cell; Except/Declined cells store a '*'
+-- marker plus each excluded name with is_exclusion = 1. Tokens longer than 191 characters
+-- (backend/config.py RATE_TOKEN_MAX_LEN) are not stored, so they never match.
+CREATE TABLE IF NOT EXISTS rate_token (
+  rate_id BIGINT NOT NULL,
+  field VARCHAR(32) NOT NULL,
+  token VARCHAR(191) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+  is_exclusion BOOLEAN NOT NULL DEFAULT FALSE,
+  PRIMARY KEY (field, token, is_exclusion, rate_id),
+  INDEX idx_rate_token_rate (rate_id),
+  FOREIGN KEY (rate_id) REFERENCES rates(id) ON DELETE CASCADE
+);
+
+-- Precomputed ranked payouts per reachable form combination (scripts/build_payout_cube.py).
+-- combo_key = backend.payout_cube.cube_key(filters, classes); identical results share one payload row.
+CREATE TABLE IF NOT EXISTS payout_cube_payload (
+  import_id BIGINT NOT NULL,
+  payload_hash CHAR(40) NOT NULL,
+  payload JSON NOT NULL,
+  PRIMARY KEY (import_id, payload_hash),
+  FOREIGN KEY (import_id) REFERENCES imports(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS payout_cube (
+  import_id BIGINT NOT NULL,
+  combo_key CHAR(40) NOT NULL,
+  vehicle_category VARCHAR(255) NOT NULL,
+  payload_hash CHAR(40) NOT NULL,
+  PRIMARY KEY (import_id, combo_key),
+  INDEX idx_payout_cube_category (import_id, vehicle_category),
+  FOREIGN KEY (import_id) REFERENCES imports(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS payout_cube_meta (
+  import_id BIGINT PRIMARY KEY,
+  import_updated_at DATETIME,
+  signature CHAR(40) NOT NULL,
+  classes JSON NOT NULL,
+  category_fingerprints JSON NOT NULL,
+  valid_from DATE,
+  valid_until DATE,
+  combo_count INT DEFAULT 0,
+  built_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  FOREIGN KEY (import_id) REFERENCES imports(id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS query_log (
   id BIGINT AUTO_INCREMENT PRIMARY KEY,
   ts DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -65,5 +145,42 @@ CREATE TABLE IF NOT EXISTS query_log (
   vehicle_type VARCHAR(128),
   fuel_type VARCHAR(128),
   policy_type VARCHAR(128),
-  result_count INT
+  result_count INT,
+  filters_json VARCHAR(1024),
+  INDEX idx_query_log_ts (ts)
+);
+
+-- Rollups of query_log (scripts/rollup_query_log.py). Dimension columns use ''
+-- for missing values; result_bucket is '0', '1-4' or '5+' results.
+CREATE TABLE IF NOT EXISTS query_log_hourly (
+  bucket_start DATETIME NOT NULL,
+  state VARCHAR(64) NOT NULL,
+  rto VARCHAR(64) NOT NULL,
+  vehicle_type VARCHAR(128) NOT NULL,
+  fuel_type VARCHAR(128) NOT NULL,
+  policy_type VARCHAR(128) NOT NULL,
+  result_bucket VARCHAR(8) NOT NULL,
+  queries BIGINT NOT NULL DEFAULT 0,
+  results_total BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (bucket_start, state, rto, vehicle_type, fuel_type, policy_type, result_bucket)
+);
+
+CREATE TABLE IF NOT EXISTS query_log_daily (
+  bucket_date DATE NOT NULL,
+  state VARCHAR(64) NOT NULL,
+  rto VARCHAR(64) NOT NULL,
+  vehicle_type VARCHAR(128) NOT NULL,
+  fuel_type VARCHAR(128) NOT NULL,
+  policy_type VARCHAR(128) NOT NULL,
+  result_bucket VARCHAR(8) NOT NULL,
+  queries BIGINT NOT NULL DEFAULT 0,
+  results_total BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (bucket_date, state, rto, vehicle_type, fuel_type, policy_type, result_bucket)
+);
+
+-- Highest query_log.id already folded into the rollups
+CREATE TABLE IF NOT EXISTS query_log_rollup_state (
+  name VARCHAR(32) PRIMARY KEY,
+  last_id BIGINT NOT NULL DEFAULT 0,
+  rolled_up_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
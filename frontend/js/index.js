@@ -196,7 +196,86 @@ function applyVehicleDetailFieldOrder() {
   }
 }
 
+// Dropdown catalog (GET /api/catalog): answers the dropdown endpoints locally.
+// Anything it does not cover falls through to the network.
+let catalog = null;
+
+async function loadCatalog() {
+  try {
+    const res = await fetch("/api/catalog");
+    if (res.ok) catalog = await res.json();
+  } catch (err) {
+    catalog = null;
+  }
+}
+
+function catalogAnswer(url) {
+  if (!catalog || !catalog.tree) return null;
+  const u = new URL(url, window.location.origin);
+  const q = (key) => (u.searchParams.get(key) || "").trim();
+  const typeEntry = () => {
+    const category = catalog.tree[q("category")];
+    return category && category.by_type ? category.by_type[q("vehicle_type")] : undefined;
+  };
+  const fuelEntry = () => {
+    const entry = typeEntry();
+    return entry && entry.by_fuel ? entry.by_fuel[q("fuel_type")] : undefined;
+  };
+  const wrap = (key, value) => (Array.isArray(value) ? { [key]: value } : null);
+
+  if (u.pathname.startsWith("/api/state-code/")) {
+    const name = decodeURIComponent(u.pathname.slice("/api/state-code/".length));
+    const code = (catalog.state_codes || {})[name];
+    return code ? { code } : null;
+  }
+  if (u.pathname.startsWith("/api/rtos/")) {
+    const code = decodeURIComponent(u.pathname.slice("/api/rtos/".length));
+    return (catalog.rtos || {})[code] || null;
+  }
+  switch (u.pathname) {
+    case "/api/states":
+      return wrap("states", catalog.states);
+    case "/api/vehicle-categories":
+      return wrap("categories", catalog.categories);
+    case "/api/vehicle-ages":
+      return wrap("ages", catalog.vehicle_ages);
+    case "/api/vehicle-types": {
+      const category = catalog.tree[q("category")];
+      return category ? wrap("types", category.vehicle_types) : null;
+    }
+    case "/api/fuel-types":
+      return wrap("fuels", (typeEntry() || {}).fuels);
+    case "/api/trailers": {
+      // Trailers only depend on the vehicle type
+      for (const category of Object.values(catalog.tree)) {
+        const entry = (category.by_type || {})[q("vehicle_type")];
+        if (entry) return wrap("trailers", entry.trailers);
+      }
+      return null;
+    }
+    case "/api/models": {
+      const entry = typeEntry() || {};
+      if (!q("make")) return wrap("models", entry.models);
+      return wrap("models", (entry.models_by_make || {})[q("make")]);
+    }
+    case "/api/policy-types":
+      return wrap("policies", (fuelEntry() || {}).policies);
+    case "/api/business-types":
+      return wrap("business_types", (fuelEntry() || {}).business_types);
+    case "/api/cc-slabs":
+      return wrap("cc_slabs", (fuelEntry() || {}).cc_slabs);
+    case "/api/watt-slabs":
+      return wrap("watt_slabs", (fuelEntry() || {}).watt_slabs);
+    case "/api/makes":
+      return wrap("makes", (fuelEntry() || {}).makes);
+    default:
+      return null;
+  }
+}
+
 async function fetchJSON(url) {
+  const local = catalogAnswer(url);
+  if (local) return local;
   const res = await fetch(url);
   if (!res.ok) throw new Error(`${res.status} ${res.statusText}`);
   return await res.json();
@@ -1161,10 +1240,11 @@ async function onSubmit(event) {
   submitButton.textContent = "Calculating...";
   try {
     const formData = new FormData(form);
-    const response = await fetch("/check-payout", { method: "POST", body: formData });
+    // v=2: the ranked list once, without empty fields
+    const response = await fetch("/check-payout?v=2", { method: "POST", body: formData });
     if (!response.ok) throw new Error(`HTTP ${response.status}`);
     const data = await response.json();
-    const payouts = data.top_5_payouts || data.top_3_payouts || [];
+    const payouts = data.payouts || data.top_5_payouts || data.top_3_payouts || [];
     if (data.status === "success" && payouts.length > 0) {
       showRows(payouts);
       results.section.scrollIntoView({ behavior: "smooth", block: "start" });
@@ -1193,6 +1273,7 @@ async function init() {
   setGroupVisible(group.business, false);
   setGroupVisible(group.policy, false);
 
+  await loadCatalog();
   await Promise.all([populateStates(), populateCategories(), populateVehicleAges()]);
 
   el.state.addEventListener("change", async () => {
@@ -0,0 +1,498 @@
+"""Precompute ranked payouts for every reachable form combination of the active import.
+
+Combinations are enumerated with the same dropdown dependency rules the UI uses
+(category -> vehicle type -> fuel -> CC/watt slab -> policy/business -> make ->
+model, plus the per-category visibility of fuel/slab/make/model/GVW/trailer, and
+PCV seating capacities for API callers). Each one is turned into filters by
+PayoutQuery.payout_filters, like a /check-payout request, and evaluated
+with the in-memory engine and stored in `payout_cube`, keyed by
+`backend.payout_cube.cube_key`, so `get_top_5_payouts` can answer it with one
+primary-key lookup. Combinations that are not in the cube fall back to live
+matching.
+
+Incremental: per-category fingerprints are stored in `payout_cube_meta`. A
+category whose rules did not change since the last build (of this import or of
+the previous one) is kept/copied instead of recomputed.
+
+Usage:
+    python scripts/build_payout_cube.py
+    python scripts/build_payout_cube.py --workers 8
+    python scripts/build_payout_cube.py --categories PCV,GCV   # force these
+    python scripts/build_payout_cube.py --full                 # rebuild everything
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Dropdown helpers answer from the bitmap index instead of MySQL while enumerating.
+os.environ.setdefault("PAYOUT_ENGINE", "memory")
+
+from backend import database as db  # noqa: E402
+from backend.config import STATE_CODE_MAP, VEHICLE_CATEGORY_MAP  # noqa: E402
+from backend.rule_index import iter_bits  # noqa: E402
+from backend.schemas import PayoutQuery  # noqa: E402
+from backend.payout_cube import (  # noqa: E402
+    age_breaks_from_bounds,
+    age_class,
+    cube_key,
+    payload_hash,
+    rto_class_key,
+    validity_window,
+)
+
+SCHEMA_PATH = ROOT / "db" / "schema.sql"
+
+# Options hard-coded in frontend/index.html (gvw-slab-select)
+GVW_SLAB_OPTIONS = ["0|2.5", "2.5|3.5", "3.5|7.5", "7.5|12", "12|20", "20|25", "25|40", "40|MAX"]
+BUNDLE_POLICIES = ("bundle(1+3)", "bundle(1+5)", "bundle(5+5)")
+INSERT_BATCH = 1000
+
+_WORKER_SNAPSHOT: Optional[dict] = None
+
+
+def _ensure_cube_tables(conn) -> None:
+    sql = SCHEMA_PATH.read_text(encoding="utf-8")
+    cur = conn.cursor()
+    for stmt in [s.strip() for s in sql.split(";") if s.strip()]:
+        if "payout_cube" in stmt:
+            cur.execute(stmt)
+    conn.commit()
+    cur.close()
+
+
+def _norm(value: Optional[str]) -> str:
+    return " ".join((value or "").strip().lower().split())
+
+
+def _form_shape(category: str, vehicle_type: Optional[str]) -> Dict[str, bool]:
+    """Field visibility for a category/vehicle type, as in applyCategoryVisibility (frontend/js/index.js)."""
+    cat = _norm(category)
+    vt = _norm(vehicle_type)
+    is_tw = "two wheeler" in cat
+    is_pc = "private car" in cat
+    is_pcv = cat == "pcv" or "passenger" in cat
+    is_misc = "misc" in cat
+    is_gcv = cat == "gcv" or "goods" in cat
+    is_auto = vt == "auto" or vt.startswith("auto ")
+    pcv_bus = is_pcv and (vt.startswith("educational bus") or vt.startswith("staff bus"))
+    pcv_taxi = is_pcv and vt == "taxi"
+    gcv_no_make_model = is_gcv and ("flatbed" in vt or "3 wheeler" in vt)
+    hide_make_model = gcv_no_make_model or pcv_bus
+    # reloadSlabs / reloadSeating; seating is hidden in the form but accepted by the API
+    return {
+        "vehicle_type": is_tw or is_pcv or is_misc or is_gcv,
+        "fuel": (is_tw or is_pc or is_pcv) and not pcv_bus,
+        "make": (is_tw or is_pc or is_pcv or is_gcv) and not hide_make_model and not pcv_taxi,
+        "model": (is_pc or is_pcv or is_gcv) and not is_auto and not hide_make_model,
+        "gvw": is_gcv and "4 wheeler" in vt,
+        "trailer": is_misc and vt == "tractor",
+        "slab": (is_tw or is_pc or is_pcv) and not is_auto and not pcv_bus,
+        "seating": is_pcv,
+        "two_wheeler": is_tw,
+    }
+
+
+def _build_state_codes() -> List[str]:
+    states = set(STATE_CODE_MAP.values())
+    states.update(STATE_CODE_MAP.get(s, s) for s in db.get_distinct_states())
+    return sorted(states)
+
+
+def _category_bits(snapshot: dict, category_code: str) -> int:
+    """Rows that can match category_code (blank/All/Except-not-listing rows included)."""
+    return snapshot["index"].token_match("Vehicle_Category", [category_code], db._WILDCARD_CELLS)
+
+
+def _rto_classes(snapshot: dict, bits: int, state: str, codes: List[str]) -> Dict[str, str]:
+    """Map each RTO code of a state to the first code included/excluded by exactly the same rows."""
+    index = snapshot["index"]
+    state_bits = bits & index.token_match("State", [state], db._WILDCARD_CELLS)
+    signatures: Dict[str, Tuple[int, int]] = {code: (0, 0) for code in codes}
+    for pos in iter_bits(state_bits):
+        rule = index.rules[pos]
+        for code in rule.included_rtos:
+            if code in signatures:
+                inc, exc = signatures[code]
+                signatures[code] = (inc | 1 << pos, exc)
+        for code in rule.excluded_rtos:
+            if code in signatures:
+                inc, exc = signatures[code]
+                signatures[code] = (inc, exc | 1 << pos)
+    representative: Dict[Tuple[int, int], str] = {}
+    return {code: representative.setdefault(signatures[code], code) for code in codes}
+
+
+def _category_classes(snapshot: dict, category_code: str, states: List[str]) -> Tuple[List[int], Dict[str, Dict[str, str]]]:
+    """(age_breaks, {"category|state": {rto: representative}}) for one category."""
+    index = snapshot["index"]
+    bits = _category_bits(snapshot, category_code)
+    age_breaks = age_breaks_from_bounds((index.rules[p].age_min, index.rules[p].age_max) for p in iter_bits(bits))
+    rto: Dict[str, Dict[str, str]] = {}
+    for state in states:
+        codes = [o["code"] for o in db.get_distinct_rto_options(state)] if state != "Others" else []
+        if codes:
+            rto[rto_class_key(category_code, state)] = _rto_classes(snapshot, bits, state, codes)
+    return age_breaks, rto
+
+
+def _state_rto_options(category_code: str, states: List[str], rto_classes: Dict[str, Dict[str, str]]) -> List[Tuple[str, Optional[str]]]:
+    """(state_code, rto) pairs with one representative RTO per class."""
+    options: List[Tuple[str, Optional[str]]] = []
+    for state in states:
+        rto_map = rto_classes.get(rto_class_key(category_code, state))
+        if not rto_map:
+            options.append((state, None))
+            continue
+        options.extend((state, code) for code in sorted(set(rto_map.values())))
+    return options
+
+
+def _age_options(age_breaks: List[int]) -> List[int]:
+    """One representative age per class within the UI's 1..50 range."""
+    seen, ages = set(), []
+    for age in range(1, 51):
+        cls = age_class(age, age_breaks)
+        if cls not in seen:
+            seen.add(cls)
+            ages.append(age)
+    return ages
+
+
+def _business_ages(businesses: List[str], ages: List[int]) -> List[Tuple[str, str]]:
+    """(business_type, vehicle_age) pairs accepted by check_payout (New <-> 'New' vehicle, otherwise Old)."""
+    pairs: List[Tuple[str, str]] = []
+    kinds = {"new" if _norm(b) == "new" else "old" for b in businesses}
+    if "new" in kinds:
+        pairs.append(("New", "1"))
+    if "old" in kinds:
+        pairs.extend(("Old", str(a)) for a in ages)
+    return pairs
+
+
+def _slab_options(shape: Dict[str, bool], vehicle_type: Optional[str], fuel: Optional[str], category: str) -> List[Tuple[Optional[str], Optional[str]]]:
+    """(cc_slab, watt_slab) pairs the form can send: watt slabs for EV, CC slabs otherwise."""
+    if not shape["slab"] or not fuel:
+        return [(None, None)]
+    if _norm(fuel) == "ev":
+        if shape["two_wheeler"]:
+            return [(None, None)]
+        return [(None, w) for w in db.get_distinct_watt_slabs(vehicle_type, fuel, category)] or [(None, None)]
+    return [(c, None) for c in db.get_distinct_cc_slabs(vehicle_type, fuel, category)] or [(None, None)]
+
+
+def iter_category_combos(
+    category: str,
+    state_rtos: List[Tuple[str, Optional[str]]],
+    ages: List[int],
+) -> Iterator[dict]:
+    """Yield get_top_5_payouts filter dicts for one category, built by PayoutQuery.payout_filters
+    exactly as check_payout builds them (so 'Others' fuel/make/model become no filter)."""
+    vehicle_types: List[Optional[str]] = [None]
+    if _form_shape(category, None)["vehicle_type"]:
+        vehicle_types = list(db.get_distinct_vehicle_types(category)) or [None]
+
+    for vehicle_type in vehicle_types:
+        shape = _form_shape(category, vehicle_type)
+        fuels: List[Optional[str]] = [None]
+        if shape["fuel"]:
+            fuels = list(db.get_distinct_fuel_types(vehicle_type, category)) or [None]
+        for fuel in fuels:
+            if shape["two_wheeler"] and fuel and _norm(fuel) not in ("petrol", "ev"):
+                continue
+            policies = db.get_distinct_policy_types(vehicle_type, fuel, category)
+            business_ages = _business_ages(db.get_distinct_business_types(vehicle_type, fuel, category), ages)
+            makes: List[Optional[str]] = [None]
+            if shape["make"]:
+                makes = list(db.get_distinct_makes(vehicle_type, category, fuel)) or [None]
+            make_models: List[Tuple[Optional[str], Optional[str]]] = []
+            for make in makes:
+                models: List[Optional[str]] = [None]
+                if shape["model"]:
+                    # The form always offers 'Others' (no model filter) after the listed models
+                    models = [*db.get_distinct_models(make, vehicle_type, category), "Others"]
+                make_models.extend((make, model) for model in models)
+            gvw_slabs = GVW_SLAB_OPTIONS if shape["gvw"] else [None]
+            slabs = _slab_options(shape, vehicle_type, fuel, category)
+            seatings: List[Optional[str]] = [None]
+            if shape["seating"]:
+                seatings.extend(db.get_distinct_seating_capacities(vehicle_type, fuel, category))
+            trailers: List[Optional[str]] = [None]
+            if shape["trailer"]:
+                trailers = list(db.get_distinct_trailers(vehicle_type)) or [None]
+
+            for policy in policies:
+                policy_value = "".join(_norm(policy).split())
+                for business, age in business_ages:
+                    if policy_value in BUNDLE_POLICIES and business != "New":
+                        continue
+                    if business == "Old" and int(age) >= 16 and policy_value != "satp":
+                        continue
+                    for state, rto in state_rtos:
+                        for make, model in make_models:
+                            for gvw_slab, trailer, (cc_slab, watt_slab), seating in itertools.product(
+                                gvw_slabs, trailers, slabs, seatings
+                            ):
+                                query = PayoutQuery(
+                                    state=state,
+                                    rto_number=rto,
+                                    vehicle_category=category,
+                                    vehicle_type=vehicle_type,
+                                    fuel_type=fuel,
+                                    cc_slab=cc_slab,
+                                    seating_capacity=seating,
+                                    gvw_slab=gvw_slab,
+                                    watt_slab=watt_slab,
+                                    vehicle_age=age,
+                                    policy_type=policy,
+                                    business_type=business,
+                                    trailer=trailer,
+                                    make=make,
+                                    model=model,
+                                )
+                                yield query.payout_filters(state, rto or "N/A")
+
+
+def _rule_signature(rule) -> tuple:
+    return (
+        sorted((k, c.raw) for k, c in rule.cells.items()),
+        rule.final_payout, rule.age_min, rule.age_max, rule.gvw_min, rule.gvw_max, rule.applies_all_rto,
+        sorted(rule.included_rtos), sorted(rule.excluded_rtos),
+        rule.date_from.isoformat(), rule.date_till.isoformat(),
+    )
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _category_fingerprint(snapshot: dict, category_code: str) -> str:
+    """Hash of every rule that can match category_code."""
+    rules = [snapshot["index"].rules[pos] for pos in iter_bits(_category_bits(snapshot, category_code))]
+    return _digest(sorted(_digest(_rule_signature(r)) for r in rules))
+
+
+def _init_worker(snapshot: dict) -> None:
+    global _WORKER_SNAPSHOT
+    _WORKER_SNAPSHOT = snapshot
+
+
+def _compute_chunk(chunk: List[Tuple[str, dict]]) -> List[Tuple[str, str]]:
+    return [
+        (key, json.dumps(db.compute_payouts(_WORKER_SNAPSHOT, filters), ensure_ascii=True, sort_keys=True))
+        for key, filters in chunk
+    ]
+
+
+def _write_rows(conn, import_id: int, category_code: str, rows: List[Tuple[str, str]]) -> int:
+    """Store (combo_key, payload) rows; identical payloads are stored once. Returns distinct payloads."""
+    payloads = {payload_hash(payload): payload for _, payload in rows}
+    cur = conn.cursor()
+    items = list(payloads.items())
+    for start in range(0, len(items), INSERT_BATCH):
+        cur.executemany(
+            "INSERT IGNORE INTO payout_cube_payload (import_id, payload_hash, payload) VALUES (%s, %s, %s)",
+            [(import_id, h, payload) for h, payload in items[start:start + INSERT_BATCH]],
+        )
+    for start in range(0, len(rows), INSERT_BATCH):
+        cur.executemany(
+            "INSERT INTO payout_cube (import_id, combo_key, vehicle_category, payload_hash) VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE vehicle_category = VALUES(vehicle_category), payload_hash = VALUES(payload_hash)",
+            [(import_id, key, category_code, payload_hash(payload)) for key, payload in rows[start:start + INSERT_BATCH]],
+        )
+    conn.commit()
+    cur.close()
+    return len(payloads)
+
+
+def _load_reusable_meta(conn, import_id: int, signature: str, today: date) -> Optional[dict]:
+    """Latest cube meta (this import first, else the newest other import) built with the same global signature."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT import_id, category_fingerprints, valid_from, valid_until "
+        "FROM payout_cube_meta "
+        "WHERE signature = %s ORDER BY (import_id = %s) DESC, import_id DESC LIMIT 1",
+        (signature, import_id),
+    )
+    row = cur.fetchone()
+    cur.close()
+    if not row:
+        return None
+    source_id, fingerprints, valid_from, valid_until = row
+    if (valid_from and today < valid_from) or (valid_until and today >= valid_until):
+        return None
+    return {"import_id": int(source_id), "fingerprints": json.loads(fingerprints)}
+
+
+def _copy_category(cur, import_id: int, source_id: int, category_code: str) -> int:
+    cur.execute(
+        "INSERT IGNORE INTO payout_cube_payload (import_id, payload_hash, payload) "
+        "SELECT DISTINCT %s, p.payload_hash, p.payload FROM payout_cube c "
+        "JOIN payout_cube_payload p ON p.import_id = c.import_id AND p.payload_hash = c.payload_hash "
+        "WHERE c.import_id = %s AND c.vehicle_category = %s",
+        (import_id, source_id, category_code),
+    )
+    cur.execute(
+        "INSERT INTO payout_cube (import_id, combo_key, vehicle_category, payload_hash) "
+        "SELECT %s, combo_key, vehicle_category, payload_hash FROM payout_cube "
+        "WHERE import_id = %s AND vehicle_category = %s",
+        (import_id, source_id, category_code),
+    )
+    return cur.rowcount
+
+
+def build_payout_cube(
+    workers: Optional[int] = None,
+    categories: Optional[List[str]] = None,
+    full: bool = False,
+    chunk_size: int = 500,
+) -> int:
+    started = time.perf_counter()
+    today = date.today()
+    conn = db.get_conn()
+    try:
+        _ensure_cube_tables(conn)
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, updated_at FROM imports WHERE status='completed' ORDER BY uploaded_at DESC LIMIT 1"
+        )
+        row = cur.fetchone()
+        if not row:
+            raise SystemExit("No completed import found. Run scripts/import_data.py first.")
+        import_id, import_updated_at = int(row[0]), row[1]
+
+        snapshot = db.get_rule_snapshot(import_id)
+        rules = snapshot["rules"]
+        valid_from, valid_until = validity_window(((r.date_from, r.date_till) for r in rules), today)
+        states = _build_state_codes()
+        signature = _digest([states, {s: [o["code"] for o in db.get_distinct_rto_options(s)] for s in states}])
+
+        all_categories = {VEHICLE_CATEGORY_MAP.get(c, c): c for c in db.get_distinct_vehicle_categories()}
+        fingerprints = {code: _category_fingerprint(snapshot, code) for code in all_categories}
+        classes: Dict[str, dict] = {"age_breaks": {}, "rto": {}}
+        for code in all_categories:
+            age_breaks, rto = _category_classes(snapshot, code, states)
+            classes["age_breaks"][code] = age_breaks
+            classes["rto"].update(rto)
+        forced = {VEHICLE_CATEGORY_MAP.get(c.strip(), c.strip()) for c in (categories or []) if c.strip()}
+        reusable = None if full else _load_reusable_meta(conn, import_id, signature, today)
+
+        if all_categories:
+            # Drop rows of categories that no longer exist in this import
+            cur.execute(
+                "DELETE FROM payout_cube WHERE import_id = %s AND vehicle_category NOT IN ("
+                + ", ".join(["%s"] * len(all_categories)) + ")",
+                (import_id, *all_categories),
+            )
+            conn.commit()
+
+        computed = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot,)) as pool:
+            for code, category in sorted(all_categories.items()):
+                unchanged = (
+                    reusable is not None
+                    and code not in forced
+                    and reusable["fingerprints"].get(code) == fingerprints[code]
+                )
+                if unchanged and reusable["import_id"] == import_id:
+                    print(f"[CUBE] {code}: unchanged, kept")
+                    continue
+                cur.execute("DELETE FROM payout_cube WHERE import_id = %s AND vehicle_category = %s", (import_id, code))
+                if unchanged:
+                    copied = _copy_category(cur, import_id, reusable["import_id"], code)
+                    conn.commit()
+                    print(f"[CUBE] {code}: unchanged, copied {copied} rows from import_id={reusable['import_id']}")
+                    continue
+                conn.commit()
+
+                t0 = time.perf_counter()
+                ages = _age_options(classes["age_breaks"][code])
+                state_rtos = _state_rto_options(code, states, classes["rto"])
+                combos: Dict[str, dict] = {}
+                for filters in iter_category_combos(category, state_rtos, ages):
+                    combos.setdefault(cube_key(filters, classes), filters)
+                items = list(combos.items())
+                chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+                rows: List[Tuple[str, str]] = []
+                for result in pool.map(_compute_chunk, chunks):
+                    rows.extend(result)
+                distinct = _write_rows(conn, import_id, code, rows)
+                computed += len(rows)
+                print(
+                    f"[CUBE] {code}: {len(rows)} combinations ({distinct} distinct results) "
+                    f"in {time.perf_counter() - t0:.1f}s"
+                )
+
+        # Payloads no longer referenced by any combination of this import
+        cur.execute(
+            "DELETE p FROM payout_cube_payload p LEFT JOIN payout_cube c "
+            "ON c.import_id = p.import_id AND c.payload_hash = p.payload_hash "
+            "WHERE p.import_id = %s AND c.combo_key IS NULL",
+            (import_id,),
+        )
+        cur.execute("SELECT COUNT(*) FROM payout_cube WHERE import_id = %s", (import_id,))
+        combo_count = int(cur.fetchone()[0])
+        cur.execute(
+            """
+            INSERT INTO payout_cube_meta
+              (import_id, import_updated_at, signature, classes, category_fingerprints,
+               valid_from, valid_until, combo_count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+              import_updated_at = VALUES(import_updated_at), signature = VALUES(signature),
+              classes = VALUES(classes), category_fingerprints = VALUES(category_fingerprints),
+              valid_from = VALUES(valid_from), valid_until = VALUES(valid_until),
+              combo_count = VALUES(combo_count)
+            """,
+            (
+                import_id, import_updated_at, signature, json.dumps(classes), json.dumps(fingerprints),
+                valid_from if valid_from != date.min else None, valid_until, combo_count,
+            ),
+        )
+        conn.commit()
+        cur.close()
+        print(
+            f"[CUBE] Completed. import_id={import_id}, computed={computed}, total={combo_count}, "
+            f"valid_until={valid_until or 'open'}, elapsed={time.perf_counter() - started:.1f}s"
+        )
+        return combo_count
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute the payout answer cube for the active import")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument(
+        "--categories",
+        default="",
+        help="Comma-separated vehicle categories to rebuild even if their rules look unchanged",
+    )
+    parser.add_argument("--full", action="store_true", help="Recompute every category")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Combinations per worker task")
+    args = parser.parse_args()
+
+    build_payout_cube(
+        workers=args.workers,
+        categories=args.categories.split(",") if args.categories else None,
+        full=args.full,
+        chunk_size=args.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
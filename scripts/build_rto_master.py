@@ -0,0 +1,53 @@
+"""Compile data/extraction/district_rto into data/extraction/rto_master.json.
+
+The artifact holds, per state, the sorted RTO options and the exact
+`/api/rtos/{state}` response body, tagged with the SHA-1 of district_rto (see
+backend/rto_master.py). The API and the importer then read it instead of
+parsing the JS source. Re-run whenever district_rto changes; a stale artifact
+is ignored (and the source parsed) until then.
+
+Usage:
+    python scripts/build_rto_master.py
+    python scripts/build_rto_master.py --check    # exit 1 if the artifact is missing or stale
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from backend import database as db  # noqa: E402
+from backend import rto_master  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile the RTO master into a versioned JSON artifact")
+    parser.add_argument("--source", type=Path, default=rto_master.SOURCE_PATH, help="district_rto file")
+    parser.add_argument("--output", type=Path, default=rto_master.ARTIFACT_PATH, help="Artifact to write")
+    parser.add_argument("--check", action="store_true", help="Only verify the artifact is current")
+    args = parser.parse_args()
+
+    if args.check:
+        if rto_master.load_artifact(args.output, args.source) is None:
+            print(f"[RTO] {args.output} is missing or stale")
+            sys.exit(1)
+        print(f"[RTO] {args.output} is current")
+        return
+
+    artifact = db.build_rto_master(args.source)
+    if not artifact["states"]:
+        print(f"[RTO] No RTO master found in {args.source}")
+        sys.exit(1)
+    rto_master.write_artifact(artifact, args.output)
+    codes = sum(len(entry["options"]) for entry in artifact["states"].values())
+    print(f"[RTO] Wrote {args.output} ({len(artifact['states'])} states, {codes} codes, "
+          f"version {artifact['version'][:12]})")
+
+
+if __name__ == "__main__":
+    main()
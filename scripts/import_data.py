@@ -8,17 +8,20 @@ Default datasets:
 
 Optional:
 - data/extraction/gcv.xlsx (via --include-gcv)
+- payout cube rebuild for the completed import (via --build-cube)
 """
 
 from __future__ import annotations
 
 import argparse
-import ast
+import hashlib
 import json
 import os
 import re
 import sys
+import time
 from dataclasses import dataclass
+from datetime import date
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
@@ -30,7 +33,8 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from backend.config import STATE_CODE_MAP
+from backend.config import RATE_ATTRIBUTE_COLUMNS, RATE_TOKEN_FIELDS, RATE_TOKEN_MAX_LEN, STATE_CODE_MAP
+from backend.rto_master import load_source_map as load_rto_source_map
 
 EXTRACTION_DIR = ROOT / "data" / "extraction"
 SCHEMA_PATH = ROOT / "db" / "schema.sql"
@@ -44,6 +48,33 @@ DEFAULT_FILES = [
 ]
 GCV_FILE = EXTRACTION_DIR / "gcv.xlsx"
 
+# Composite indexes over the typed attribute columns (kept in sync with db/schema.sql).
+RATE_ATTRIBUTE_INDEXES = {
+    "idx_rates_state": "(import_id, state)",
+    "idx_rates_category_type": "(import_id, vehicle_category, vehicle_type)",
+    "idx_rates_type_fuel": "(import_id, vehicle_type, fuel_type)",
+    "idx_rates_policy_business": "(import_id, policy_type, business_type)",
+    "idx_rates_make_model": "(import_id, make(191), model(191))",
+    "idx_rates_validity": "(import_id, date_from, date_till)",
+    "idx_rates_row_hash": "(import_id, row_hash)",
+}
+# rates.date_from / date_till bounds for open-ended validity (MySQL DATE range)
+RATE_DATE_MIN = date(1000, 1, 1)
+RATE_DATE_MAX = date(9999, 12, 31)
+WILDCARD_CELLS = {"all", "all make", "n/a"}
+EXCLUSION_PREFIXES = ("except ", "declined ")
+BULK_BATCH_SIZE = 1000
+# Every table _bulk_insert_rates_from_file reads or writes (LOCK TABLES needs all of them)
+BULK_LOCK_TABLES = "rates WRITE, rate_token WRITE, rate_included_rto WRITE, rate_excluded_rto WRITE, rto WRITE"
+
+# rates columns written per sheet row (after import_id), in _rate_insert_record order
+RATE_VALUE_COLUMNS = [
+    "state_code", "company", "condition_text", "final_payout", "age_min", "age_max", "gvw_min", "gvw_max",
+    "applies_all_rto", "date_from", "date_till", "raw_json", "row_hash", *RATE_ATTRIBUTE_COLUMNS.values(),
+]
+RATE_INSERT_COLUMNS_SQL = "import_id, " + ", ".join(RATE_VALUE_COLUMNS)
+RATE_UPDATE_ASSIGNMENTS_SQL = ", ".join(f"{c} = %s" for c in RATE_VALUE_COLUMNS)
+
 
 def _connect() -> mysql.connector.MySQLConnection:
     load_dotenv()
@@ -96,6 +127,104 @@ def _run_schema(conn: mysql.connector.MySQLConnection) -> None:
     cur.close()
 
 
+# Matching columns compare case-sensitively, like JSON_UNQUOTE(raw_json ...) and the in-memory engine
+MATCH_COLLATION = "utf8mb4_bin"
+
+
+def _rate_attribute_ddl(column: str) -> str:
+    size = 512 if column in ("make", "model") else 255
+    return f"VARCHAR({size}) CHARACTER SET utf8mb4 COLLATE {MATCH_COLLATION} NULL"
+
+
+def _migrate_rates_table(conn: mysql.connector.MySQLConnection) -> None:
+    """Add typed attribute / validity date columns and indexes missing from an older `rates` table and backfill them from raw_json."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'rates'"
+    )
+    existing_columns = {str(r[0]).lower() for r in cur.fetchall()}
+    added: List[str] = []
+    for key, column in RATE_ATTRIBUTE_COLUMNS.items():
+        if column in existing_columns:
+            continue
+        cur.execute(f"ALTER TABLE rates ADD COLUMN {column} {_rate_attribute_ddl(column)}")
+        cur.execute(f"UPDATE rates SET {column} = NULLIF(JSON_UNQUOTE(JSON_EXTRACT(raw_json, '$.{key}')), 'null')")
+        added.append(column)
+
+    if "date_from" not in existing_columns:
+        cur.execute(f"ALTER TABLE rates ADD COLUMN date_from DATE NOT NULL DEFAULT '{RATE_DATE_MIN}'")
+        cur.execute(f"ALTER TABLE rates ADD COLUMN date_till DATE NOT NULL DEFAULT '{RATE_DATE_MAX}'")
+        cur.execute("SELECT id, raw_json FROM rates")
+        cur.executemany(
+            "UPDATE rates SET date_from = %s, date_till = %s WHERE id = %s",
+            [(*_rate_validity(_load_raw_json(raw)), int(rate_id)) for rate_id, raw in cur.fetchall()],
+        )
+        added.extend(["date_from", "date_till"])
+
+    if "row_hash" not in existing_columns:
+        cur.execute("ALTER TABLE rates ADD COLUMN row_hash CHAR(40) NULL")
+        cur.execute("SELECT id, raw_json FROM rates")
+        cur.executemany(
+            "UPDATE rates SET row_hash = %s WHERE id = %s",
+            [(_row_hash(_load_raw_json(raw)), int(rate_id)) for rate_id, raw in cur.fetchall()],
+        )
+        added.append("row_hash")
+
+    # Older schemas created the matching columns with the default (case-insensitive) collation
+    cur.execute(
+        "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND COLLATION_NAME <> %s "
+        "AND ((TABLE_NAME = 'rates' AND COLUMN_NAME IN (" + ", ".join(["%s"] * len(RATE_ATTRIBUTE_COLUMNS)) + ")) "
+        "OR (TABLE_NAME = 'rate_token' AND COLUMN_NAME = 'token'))",
+        (MATCH_COLLATION, *RATE_ATTRIBUTE_COLUMNS.values()),
+    )
+    for table, column in cur.fetchall():
+        if table == "rate_token":
+            cur.execute(f"ALTER TABLE rate_token MODIFY COLUMN token VARCHAR({RATE_TOKEN_MAX_LEN}) "
+                        f"CHARACTER SET utf8mb4 COLLATE {MATCH_COLLATION} NOT NULL")
+        else:
+            cur.execute(f"ALTER TABLE rates MODIFY COLUMN {column} {_rate_attribute_ddl(column)}")
+        added.append(f"{table}.{column} collation")
+
+    cur.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'rates'"
+    )
+    existing_indexes = {str(r[0]) for r in cur.fetchall()}
+    for name, columns in RATE_ATTRIBUTE_INDEXES.items():
+        if name not in existing_indexes:
+            cur.execute(f"CREATE INDEX {name} ON rates {columns}")
+    conn.commit()
+    cur.close()
+    if added:
+        print(f"[IMPORT] Added/converted rate columns: {', '.join(added)}")
+
+
+def _migrate_imports_table(conn: mysql.connector.MySQLConnection) -> None:
+    """Add imports.updated_at (bumped whenever an import's rows change) and the active-import index to an older schema."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'imports' AND COLUMN_NAME = 'updated_at'"
+    )
+    if not int(cur.fetchone()[0]):
+        cur.execute(
+            "ALTER TABLE imports ADD COLUMN updated_at DATETIME "
+            "DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP AFTER uploaded_at"
+        )
+        cur.execute("UPDATE imports SET updated_at = uploaded_at")
+        conn.commit()
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'imports' AND INDEX_NAME = 'idx_imports_active'"
+    )
+    if not int(cur.fetchone()[0]):
+        cur.execute("CREATE INDEX idx_imports_active ON imports (status, uploaded_at)")
+        conn.commit()
+    cur.close()
+
+
 def _first_non_empty_sheet(path: Path) -> Tuple[str, pd.DataFrame]:
     xl = pd.ExcelFile(path)
     for sheet in xl.sheet_names:
@@ -210,37 +339,8 @@ def _parse_rto_rule(rto_cell: Optional[str]) -> RtoRule:
 
 
 def _parse_rto_master(path: Path) -> Dict[str, Dict[str, str]]:
-    """Parse JS-like rtoMasterData object from data/extraction/district_rto."""
-    text = path.read_text(encoding="utf-8", errors="ignore")
-    marker = "const rtoMasterData ="
-    start = text.find(marker)
-    if start < 0:
-        return {}
-
-    # Find the first object block after marker.
-    brace_start = text.find("{", start)
-    if brace_start < 0:
-        return {}
-
-    depth = 0
-    brace_end = -1
-    for i in range(brace_start, len(text)):
-        ch = text[i]
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                brace_end = i
-                break
-    if brace_end < 0:
-        return {}
-
-    obj_str = text[brace_start : brace_end + 1]
-    try:
-        parsed = ast.literal_eval(obj_str)
-    except Exception:
-        return {}
+    """RTO master of data/extraction/district_rto (via the compiled rto_master.json when current)."""
+    parsed = load_rto_source_map(path)
 
     out: Dict[str, Dict[str, str]] = {}
     if not isinstance(parsed, dict):
@@ -339,7 +439,7 @@ def _finish_import_record(
 ) -> None:
     cur = conn.cursor()
     cur.execute(
-        "UPDATE imports SET row_count=%s, status=%s, notes=%s WHERE id=%s",
+        "UPDATE imports SET row_count=%s, status=%s, notes=%s, updated_at=CURRENT_TIMESTAMP WHERE id=%s",
         (row_count, status, notes, import_id),
     )
     conn.commit()
@@ -351,6 +451,7 @@ def _reset_data(conn: mysql.connector.MySQLConnection) -> None:
     cur.execute("SET FOREIGN_KEY_CHECKS=0")
     cur.execute("TRUNCATE TABLE rate_excluded_rto")
     cur.execute("TRUNCATE TABLE rate_included_rto")
+    cur.execute("TRUNCATE TABLE rate_token")
     cur.execute("TRUNCATE TABLE rates")
     cur.execute("TRUNCATE TABLE imports")
     cur.execute("TRUNCATE TABLE rto")
@@ -368,6 +469,105 @@ def _build_raw_json_row(df_row: pd.Series) -> Dict[str, object]:
     return raw
 
 
+def _rate_attribute_values(raw_json: Dict[str, object]) -> List[object]:
+    return [raw_json.get(key) for key in RATE_ATTRIBUTE_COLUMNS]
+
+
+def _load_raw_json(raw: object) -> Dict[str, object]:
+    return json.loads(raw) if isinstance(raw, (str, bytes, bytearray)) else (raw or {})
+
+
+def _rate_date(value: object, open_value: date, invalid_value: date) -> date:
+    """Parse a Date_from/Date_till cell: blank is open-ended, unparseable never matches."""
+    s = _as_clean_str(value)
+    if s is None:
+        return open_value
+    try:
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        return invalid_value
+
+
+def _rate_validity(raw_json: Dict[str, object]) -> Tuple[date, date]:
+    """(date_from, date_till) column values for one rate row."""
+    return (
+        _rate_date(raw_json.get("Date_from"), RATE_DATE_MIN, RATE_DATE_MAX),
+        _rate_date(raw_json.get("Date_till"), RATE_DATE_MAX, RATE_DATE_MIN),
+    )
+
+
+def _row_hash(raw_json: Dict[str, object]) -> str:
+    """Canonical SHA-1 of every field except Final Payout: identifies a row across payout refreshes."""
+    fields = {key: value for key, value in raw_json.items() if key != "Final Payout"}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, ensure_ascii=True).encode("utf-8")).hexdigest()
+
+
+def _existing_row_hashes(conn: mysql.connector.MySQLConnection, import_id: int) -> Dict[str, int]:
+    """row_hash -> rate id (lowest id per hash) of one import, read in one indexed scan."""
+    cur = conn.cursor()
+    cur.execute("SELECT row_hash, MIN(id) FROM rates WHERE import_id = %s AND row_hash IS NOT NULL GROUP BY row_hash", (import_id,))
+    existing = {str(row_hash): int(rate_id) for row_hash, rate_id in cur.fetchall()}
+    cur.close()
+    return existing
+
+
+def _explode_token_cell(value: object) -> List[Tuple[str, int]]:
+    """Split one cell into rate_token (token, is_exclusion) pairs.
+
+    '' marks a blank cell and '*' an All/All make/N/A cell. Except/Declined cells
+    become a ('*', 1) marker plus one (name, 1) pair per excluded name.
+    """
+    cell = _as_clean_str(value) or ""
+    low = cell.lower()
+    if not cell:
+        return [("", 0)]
+    if low in WILDCARD_CELLS:
+        return [("*", 0)]
+    for prefix in EXCLUSION_PREFIXES:
+        if low.startswith(prefix):
+            names = [t.strip() for t in cell[len(prefix):].split(",") if t.strip()]
+            return [("*", 1)] + [(name, 1) for name in names]
+    tokens = [t.strip() for t in cell.split(",") if t.strip()]
+    return [(t, 0) for t in tokens] or [("", 0)]
+
+
+def _rate_token_rows(rate_id: int, raw_json: Dict[str, object]) -> List[Tuple[int, str, str, int]]:
+    rows: Dict[Tuple[int, str, str, int], None] = {}
+    for field in RATE_TOKEN_FIELDS:
+        for token, is_exclusion in _explode_token_cell(raw_json.get(field)):
+            if len(token) > RATE_TOKEN_MAX_LEN:
+                # A truncated token could match a different value; the engines skip it instead
+                print(f"[IMPORT] WARNING rate {rate_id}: {field} token longer than {RATE_TOKEN_MAX_LEN} "
+                      f"characters is not indexed and will not match: {token[:40]!r}...")
+                continue
+            rows[(rate_id, field, token, is_exclusion)] = None
+    return list(rows)
+
+
+def _insert_rate_tokens(cur, rows: List[Tuple[int, str, str, int]]) -> None:
+    if rows:
+        cur.executemany(
+            "INSERT IGNORE INTO rate_token (rate_id, field, token, is_exclusion) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def _backfill_rate_tokens(conn: mysql.connector.MySQLConnection) -> None:
+    """Explode rates imported before rate_token existed (rows with no tokens yet)."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT r.id, r.raw_json FROM rates r "
+        "WHERE NOT EXISTS (SELECT 1 FROM rate_token t WHERE t.rate_id = r.id)"
+    )
+    pending = cur.fetchall()
+    for rate_id, raw in pending:
+        _insert_rate_tokens(cur, _rate_token_rows(int(rate_id), _load_raw_json(raw)))
+    conn.commit()
+    cur.close()
+    if pending:
+        print(f"[IMPORT] Backfilled rate_token rows for {len(pending)} existing rate(s)")
+
+
 def _insert_rates_from_file(
     conn: mysql.connector.MySQLConnection,
     import_id: int,
@@ -375,75 +575,31 @@ def _insert_rates_from_file(
     rto_cache: Dict[str, int],
     update_existing_payouts: bool = False,
     update_only: bool = False,
+    existing: Optional[Dict[str, int]] = None,
 ) -> Tuple[int, int]:
+    """Insert one file row by row; with update_existing_payouts, rows whose row_hash is already in
+    the import (existing, loaded once per import) update that rate instead."""
     sheet, df = _first_non_empty_sheet(path)
     print(f"[IMPORT] {path.name} -> sheet={sheet}, rows={len(df)}")
 
+    if update_existing_payouts and existing is None:
+        existing = _existing_row_hashes(conn, import_id)
     cur = conn.cursor()
     inserted = 0
     updated = 0
 
     for _, row in df.iterrows():
-        raw_json = _build_raw_json_row(row)
-        company = _as_clean_str(row.get("Company"))
-        final_payout = _to_float(row.get("Final Payout"))
-        if company is None or final_payout is None:
+        record = _rate_insert_record(row)
+        if record is None:
             # Mandatory fields for a valid payout row.
             continue
-
-        state_cell = _as_clean_str(row.get("State"))
-        state_code = _normalize_state_code(state_cell)
-        condition_text = _as_clean_str(row.get("Conditions"))
-        age_min = _to_int(row.get("Vehicle_Age_Min"))
-        age_max = _to_int(row.get("Vehicle_Age_Max"))
-        gvw_min = _to_float(row.get("GVW_Min"))
-        gvw_max = _to_float(row.get("GVW_Max"))
-
-        rto_cell = _as_clean_str(row.get("RTO_Code"))
-        rto_rule = _parse_rto_rule(rto_cell)
+        values, raw_json, rto_rule, row_hash = record
 
         if update_existing_payouts:
-            # Match existing row by full JSON payload except Final Payout.
-            # If found, update payout only (plus normalized helper fields).
-            cur.execute(
-                """
-                SELECT id
-                FROM rates
-                WHERE import_id = %s
-                  AND JSON_REMOVE(raw_json, '$."Final Payout"')
-                      = JSON_REMOVE(CAST(%s AS JSON), '$."Final Payout"')
-                LIMIT 1
-                """,
-                (import_id, json.dumps(raw_json, ensure_ascii=True)),
-            )
-            existing = cur.fetchone()
-            if existing:
-                existing_id = int(existing[0])
-                cur.execute(
-                    """
-                    UPDATE rates
-                    SET final_payout = %s,
-                        state_code = %s,
-                        condition_text = %s,
-                        age_min = %s,
-                        age_max = %s,
-                        gvw_min = %s,
-                        gvw_max = %s,
-                        raw_json = %s
-                    WHERE id = %s
-                    """,
-                    (
-                        final_payout,
-                        state_code,
-                        condition_text,
-                        age_min,
-                        age_max,
-                        gvw_min,
-                        gvw_max,
-                        json.dumps(raw_json, ensure_ascii=True),
-                        existing_id,
-                    ),
-                )
+            # Same fields except Final Payout (same row_hash): update payout (plus normalized helper fields).
+            existing_id = existing.get(row_hash)
+            if existing_id is not None:
+                cur.execute(f"UPDATE rates SET {RATE_UPDATE_ASSIGNMENTS_SQL} WHERE id = %s", (*values, existing_id))
                 updated += 1
                 continue
             if update_only:
@@ -451,27 +607,13 @@ def _insert_rates_from_file(
                 continue
 
         cur.execute(
-            """
-            INSERT INTO rates
-              (import_id, state_code, company, condition_text, final_payout,
-               age_min, age_max, gvw_min, gvw_max, applies_all_rto, raw_json)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                import_id,
-                state_code,
-                company,
-                condition_text,
-                final_payout,
-                age_min,
-                age_max,
-                gvw_min,
-                gvw_max,
-                1 if rto_rule.applies_all else 0,
-                json.dumps(raw_json, ensure_ascii=True),
-            ),
+            f"INSERT INTO rates ({RATE_INSERT_COLUMNS_SQL}) VALUES ({', '.join(['%s'] * (len(values) + 1))})",
+            (import_id, *values),
         )
         rate_id = int(cur.lastrowid)
+        if existing is not None:
+            existing.setdefault(row_hash, rate_id)
+        _insert_rate_tokens(cur, _rate_token_rows(rate_id, raw_json))
 
         # Included RTO codes
         for code in rto_rule.include_codes:
@@ -500,17 +642,147 @@ def _insert_rates_from_file(
     return inserted, updated
 
 
+def _rate_insert_record(row: pd.Series) -> Optional[Tuple[tuple, Dict[str, object], RtoRule, str]]:
+    """(RATE_VALUE_COLUMNS values, raw_json, RTO rule, row_hash) of one sheet row.
+
+    None when Company or Final Payout is missing (not a valid payout row).
+    """
+    raw_json = _build_raw_json_row(row)
+    company = _as_clean_str(row.get("Company"))
+    final_payout = _to_float(row.get("Final Payout"))
+    if company is None or final_payout is None:
+        return None
+    rto_rule = _parse_rto_rule(_as_clean_str(row.get("RTO_Code")))
+    date_from, date_till = _rate_validity(raw_json)
+    row_hash = _row_hash(raw_json)
+    values = (
+        _normalize_state_code(_as_clean_str(row.get("State"))),
+        company,
+        _as_clean_str(row.get("Conditions")),
+        final_payout,
+        _to_int(row.get("Vehicle_Age_Min")),
+        _to_int(row.get("Vehicle_Age_Max")),
+        _to_float(row.get("GVW_Min")),
+        _to_float(row.get("GVW_Max")),
+        1 if rto_rule.applies_all else 0,
+        date_from,
+        date_till,
+        json.dumps(raw_json, ensure_ascii=True),
+        row_hash,
+        *_rate_attribute_values(raw_json),
+    )
+    return values, raw_json, rto_rule, row_hash
+
+
+def _insert_many(cur, statement: str, rows: List[tuple], batch_size: int, suffix: str = "") -> None:
+    """Run `statement` (ending in VALUES) as multi-row INSERTs of up to batch_size rows each."""
+    if not rows:
+        return
+    row_marks = "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        cur.execute(f"{statement} {', '.join([row_marks] * len(chunk))}{suffix}", [v for row in chunk for v in row])
+
+
+def _ensure_rto_ids_bulk(cur, rto_cache: Dict[str, int], codes: Iterable[str], batch_size: int) -> Dict[str, int]:
+    """rto ids for codes, creating unknown codes with one multi-row INSERT (no commit)."""
+    ids = {code: rto_cache[code] for code in codes if code in rto_cache}
+    missing = sorted(set(codes) - set(ids))
+    if missing:
+        _insert_many(
+            cur,
+            "INSERT INTO rto (code, name) VALUES",
+            [(code, code) for code in missing],
+            batch_size,
+            " ON DUPLICATE KEY UPDATE name = COALESCE(name, VALUES(name))",
+        )
+        cur.execute(f"SELECT id, code FROM rto WHERE code IN ({', '.join(['%s'] * len(missing))})", missing)
+        ids.update({str(code): int(rid) for rid, code in cur.fetchall()})
+    return ids
+
+
+def _bulk_insert_rates_from_file(
+    conn: mysql.connector.MySQLConnection,
+    import_id: int,
+    path: Path,
+    rto_cache: Dict[str, int],
+    batch_size: int = BULK_BATCH_SIZE,
+) -> int:
+    """Insert-only import of one file in a single transaction (--bulk).
+
+    Rates, rate_token rows, RTO links and unknown RTO codes are built in memory
+    first and written as multi-row INSERTs of batch_size rows. Rate ids are
+    assigned from MAX(rates.id), so link rows need no per-row lastrowid: the
+    tables written here are held with LOCK TABLES ... WRITE until the commit,
+    which keeps any other session (another import, a payout update) from
+    inserting rates in between.
+    """
+    sheet, df = _first_non_empty_sheet(path)
+    print(f"[IMPORT] {path.name} -> sheet={sheet}, rows={len(df)} (bulk)")
+    records = [record for record in (_rate_insert_record(row) for _, row in df.iterrows()) if record is not None]
+    codes = {code for _, _, rule, _ in records for code in (*rule.include_codes, *rule.exclude_codes)}
+
+    cur = conn.cursor()
+    try:
+        # autocommit is off, so the locks last until the COMMIT below (then UNLOCK TABLES)
+        cur.execute(f"LOCK TABLES {BULK_LOCK_TABLES}")
+        rto_ids = _ensure_rto_ids_bulk(cur, rto_cache, codes, batch_size)
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM rates")
+        first_id = int(cur.fetchone()[0]) + 1
+
+        rate_rows: List[tuple] = []
+        token_rows: List[Tuple[int, str, str, int]] = []
+        included: Dict[Tuple[int, int], None] = {}
+        excluded: Dict[Tuple[int, int], None] = {}
+        for offset, (values, raw_json, rto_rule, _) in enumerate(records):
+            rate_id = first_id + offset
+            rate_rows.append((rate_id, import_id, *values))
+            token_rows.extend(_rate_token_rows(rate_id, raw_json))
+            for code in rto_rule.include_codes:
+                if code in rto_ids:
+                    included[(rate_id, rto_ids[code])] = None
+            for code in rto_rule.exclude_codes:
+                if code in rto_ids:
+                    excluded[(rate_id, rto_ids[code])] = None
+
+        _insert_many(cur, f"INSERT INTO rates (id, {RATE_INSERT_COLUMNS_SQL}) VALUES", rate_rows, batch_size)
+        _insert_many(cur, "INSERT IGNORE INTO rate_token (rate_id, field, token, is_exclusion) VALUES", token_rows, batch_size)
+        _insert_many(cur, "INSERT IGNORE INTO rate_included_rto (rate_id, rto_id) VALUES", list(included), batch_size)
+        _insert_many(cur, "INSERT IGNORE INTO rate_excluded_rto (rate_id, rto_id) VALUES", list(excluded), batch_size)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("UNLOCK TABLES")
+        cur.close()
+    rto_cache.update(rto_ids)
+    print(
+        f"[IMPORT] {path.name}: {len(rate_rows)} rate(s), {len(token_rows)} token row(s), "
+        f"{len(included) + len(excluded)} RTO link(s)"
+    )
+    return len(rate_rows)
+
+
 def import_excels(
     include_gcv: bool = False,
     replace_existing: bool = True,
     update_existing_payouts: bool = False,
     update_only: bool = False,
+    bulk: bool = False,
+    batch_size: int = BULK_BATCH_SIZE,
+    build_cube: bool = False,
+    cube_workers: Optional[int] = None,
 ) -> None:
     conn = _connect()
     try:
         _run_schema(conn)
+        _migrate_rates_table(conn)
+        _migrate_imports_table(conn)
         if replace_existing:
             _reset_data(conn)
+        else:
+            _backfill_rate_tokens(conn)
 
         rto_master = _parse_rto_master(RTO_MASTER_PATH)
         _seed_rto_codes(conn, rto_master)
@@ -530,18 +802,30 @@ def import_excels(
                 import_id = _create_import_record(conn, [p.name for p in files], uploaded_by="codex")
         else:
             import_id = _create_import_record(conn, [p.name for p in files], uploaded_by="codex")
+        # row_hash -> rate id of the target import, read once and shared by all files of this run.
+        existing = _existing_row_hashes(conn, import_id) if update_existing_payouts and not bulk else None
         total_rows = 0
         total_inserted = 0
         total_updated = 0
         try:
             for file_path in files:
-                inserted, updated = _insert_rates_from_file(
-                    conn,
-                    import_id,
-                    file_path,
-                    rto_cache,
-                    update_existing_payouts=update_existing_payouts,
-                    update_only=update_only,
+                started = time.perf_counter()
+                if bulk:
+                    inserted, updated = _bulk_insert_rates_from_file(conn, import_id, file_path, rto_cache, batch_size), 0
+                else:
+                    inserted, updated = _insert_rates_from_file(
+                        conn,
+                        import_id,
+                        file_path,
+                        rto_cache,
+                        update_existing_payouts=update_existing_payouts,
+                        update_only=update_only,
+                        existing=existing,
+                    )
+                elapsed = time.perf_counter() - started
+                print(
+                    f"[IMPORT] {file_path.name}: {inserted + updated} row(s) in {elapsed:.2f}s "
+                    f"({(inserted + updated) / elapsed if elapsed > 0 else 0:.0f} rows/s)"
                 )
                 total_inserted += inserted
                 total_updated += updated
@@ -564,6 +848,12 @@ def import_excels(
     finally:
         conn.close()
 
+    if build_cube:
+        # Imported lazily: it loads the rule snapshot through backend.database.
+        from build_payout_cube import build_payout_cube
+
+        build_payout_cube(workers=cube_workers)
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Import POSP payout Excel files into MySQL")
@@ -587,13 +877,43 @@ def main() -> None:
         action="store_true",
         help="With --update-payouts, update existing rows only and skip inserts for new rows.",
     )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Build each file's rates, tokens and RTO links in memory and write them with multi-row INSERTs in one transaction.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BULK_BATCH_SIZE,
+        help=f"Rows per multi-row INSERT with --bulk (default: {BULK_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--build-cube",
+        action="store_true",
+        help="Rebuild the payout cube (scripts/build_payout_cube.py) once the import has completed.",
+    )
+    parser.add_argument(
+        "--cube-workers",
+        type=int,
+        default=None,
+        help="Worker processes for --build-cube (default: CPU count)",
+    )
     args = parser.parse_args()
+    if args.cube_workers is not None and not args.build_cube:
+        parser.error("--cube-workers requires --build-cube")
+    if args.bulk and args.update_payouts:
+        parser.error("--bulk inserts new rows only; it cannot be combined with --update-payouts")
 
     import_excels(
         include_gcv=args.include_gcv,
         replace_existing=not args.append,
         update_existing_payouts=args.update_payouts,
         update_only=args.update_only,
+        bulk=args.bulk,
+        batch_size=max(1, args.batch_size),
+        build_cube=args.build_cube,
+        cube_workers=args.cube_workers,
     )
 
 
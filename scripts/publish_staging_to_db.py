@@ -6,10 +6,12 @@ Behavior:
 - Run import_data in append mode with payout-update logic:
   - existing row -> update payout
   - missing row -> insert new row
+- With --build-cube [--cube-workers N], rebuild the payout cube after the import.
 """
 
 from __future__ import annotations
 
+import argparse
 import shutil
 from datetime import datetime
 from pathlib import Path
@@ -42,6 +44,22 @@ def _headers(path: Path) -> list[str]:
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Publish confirmed staging files and import them into MySQL")
+    parser.add_argument(
+        "--build-cube",
+        action="store_true",
+        help="Rebuild the payout cube once the import has completed.",
+    )
+    parser.add_argument(
+        "--cube-workers",
+        type=int,
+        default=None,
+        help="Worker processes for --build-cube (default: CPU count)",
+    )
+    args = parser.parse_args()
+    if args.cube_workers is not None and not args.build_cube:
+        parser.error("--cube-workers requires --build-cube")
+
     if not STAGING_DIR.exists():
         raise SystemExit("data/staging not found. Run scripts/init_staging_templates.py first.")
 
@@ -92,6 +110,8 @@ def main() -> None:
         replace_existing=False,
         update_existing_payouts=True,
         update_only=False,
+        build_cube=args.build_cube,
+        cube_workers=args.cube_workers,
     )
     print(f"[PUBLISH] Done. backups: {backup_path}")
 
@@ -0,0 +1,177 @@
+"""Fold new query_log rows into the hourly/daily rollups and rotate old raw rows.
+
+Incremental: query_log_rollup_state keeps the highest query_log.id already
+counted. Each run aggregates only newer rows (in id chunks, each chunk in one
+transaction together with the watermark) into `query_log_hourly` and
+`query_log_daily`, keyed by (bucket, state, rto, vehicle_type, fuel_type,
+policy_type, result_bucket). Rows from the last --settle-seconds are left for
+the next run so late commits from other app processes are not skipped.
+
+Rotation: raw rows older than --retention-days that are already rolled up are
+deleted in small primary-key batches (hourly rollups after
+--hourly-retention-days). Daily rollups are kept.
+
+Run from cron, e.g. every 10 minutes:
+    python scripts/rollup_query_log.py
+    python scripts/rollup_query_log.py --retention-days 30 --hourly-retention-days 180
+    python scripts/rollup_query_log.py --no-prune
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from backend import database as db  # noqa: E402
+
+SCHEMA_PATH = ROOT / "db" / "schema.sql"
+STATE_NAME = "query_log"
+
+RESULT_BUCKET_SQL = (
+    "CASE WHEN COALESCE(result_count, 0) = 0 THEN '0' "
+    "WHEN result_count < 5 THEN '1-4' ELSE '5+' END"
+)
+_DIMENSIONS_SQL = (
+    "COALESCE(state, ''), COALESCE(rto, ''), COALESCE(vehicle_type, ''), "
+    "COALESCE(fuel_type, ''), COALESCE(policy_type, ''), " + RESULT_BUCKET_SQL
+)
+_ROLLUP_SQL = (
+    "INSERT INTO {table} ({bucket_col}, state, rto, vehicle_type, fuel_type, policy_type, result_bucket, "
+    "queries, results_total) "
+    "SELECT {bucket_expr}, " + _DIMENSIONS_SQL + ", COUNT(*), SUM(COALESCE(result_count, 0)) "
+    "FROM query_log WHERE id > %s AND id <= %s "
+    "GROUP BY 1, 2, 3, 4, 5, 6, 7 "
+    "ON DUPLICATE KEY UPDATE queries = queries + VALUES(queries), "
+    "results_total = results_total + VALUES(results_total)"
+)
+_BUCKET_EXPR = {
+    "hourly": "DATE_FORMAT(ts, '%Y-%m-%d %H:00:00')",
+    "daily": "DATE(ts)",
+}
+
+
+def _ensure_rollup_tables(conn) -> None:
+    sql = SCHEMA_PATH.read_text(encoding="utf-8")
+    cur = conn.cursor()
+    for stmt in [s.strip() for s in sql.split(";") if s.strip()]:
+        if "CREATE TABLE IF NOT EXISTS query_log" in stmt:
+            cur.execute(stmt)
+    # Older installs created query_log without the ts index used for rotation
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'query_log' AND INDEX_NAME = 'idx_query_log_ts'"
+    )
+    if not int(cur.fetchone()[0]):
+        cur.execute("CREATE INDEX idx_query_log_ts ON query_log (ts)")
+    cur.execute("INSERT IGNORE INTO query_log_rollup_state (name, last_id) VALUES (%s, 0)", (STATE_NAME,))
+    conn.commit()
+    cur.close()
+
+
+def _rollup_upper_id(cur, settle_seconds: int) -> int:
+    """Highest id old enough to roll up (uses idx_query_log_ts)."""
+    cutoff = datetime.now() - timedelta(seconds=settle_seconds)
+    cur.execute("SELECT id FROM query_log WHERE ts < %s ORDER BY ts DESC, id DESC LIMIT 1", (cutoff,))
+    row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+def rollup_query_log(conn, settle_seconds: int = 60, chunk_size: int = 50000) -> int:
+    """Aggregate query_log rows newer than the watermark. Returns the number of raw rows folded in."""
+    cur = conn.cursor()
+    cur.execute("SELECT last_id FROM query_log_rollup_state WHERE name = %s", (STATE_NAME,))
+    last_id = int(cur.fetchone()[0])
+    upper = _rollup_upper_id(cur, settle_seconds)
+    folded = 0
+    while last_id < upper:
+        hi = min(last_id + chunk_size, upper)
+        for granularity, (table, bucket_col) in db.QUERY_LOG_ROLLUPS.items():
+            cur.execute(
+                _ROLLUP_SQL.format(table=table, bucket_col=bucket_col, bucket_expr=_BUCKET_EXPR[granularity]),
+                (last_id, hi),
+            )
+        cur.execute("SELECT COUNT(*) FROM query_log WHERE id > %s AND id <= %s", (last_id, hi))
+        folded += int(cur.fetchone()[0])
+        cur.execute("UPDATE query_log_rollup_state SET last_id = %s WHERE name = %s", (hi, STATE_NAME))
+        conn.commit()
+        last_id = hi
+    cur.close()
+    return folded
+
+
+def _delete_in_batches(conn, sql: str, params: tuple, batch_size: int) -> int:
+    cur = conn.cursor()
+    deleted = 0
+    while True:
+        cur.execute(sql + " LIMIT %s", (*params, batch_size))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            break
+    cur.close()
+    return deleted
+
+
+def prune_query_log(conn, retention_days: int, hourly_retention_days: int, batch_size: int = 10000) -> tuple:
+    """Delete rolled-up raw rows and hourly rollups past their retention. Returns (raw, hourly) deleted."""
+    cur = conn.cursor()
+    cur.execute("SELECT last_id FROM query_log_rollup_state WHERE name = %s", (STATE_NAME,))
+    last_id = int(cur.fetchone()[0])
+    cur.close()
+    now = datetime.now()
+    raw = _delete_in_batches(
+        conn,
+        "DELETE FROM query_log WHERE id <= %s AND ts < %s ORDER BY id",
+        (last_id, now - timedelta(days=retention_days)),
+        batch_size,
+    )
+    hourly = _delete_in_batches(
+        conn,
+        "DELETE FROM query_log_hourly WHERE bucket_start < %s",
+        (now - timedelta(days=hourly_retention_days),),
+        batch_size,
+    )
+    return raw, hourly
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Roll query_log up into hourly/daily summaries and rotate raw rows")
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        default=int(os.getenv("QUERY_LOG_RETENTION_DAYS", "30")),
+        help="Keep raw query_log rows this many days (default: QUERY_LOG_RETENTION_DAYS or 30)",
+    )
+    parser.add_argument(
+        "--hourly-retention-days",
+        type=int,
+        default=int(os.getenv("QUERY_LOG_HOURLY_RETENTION_DAYS", "180")),
+        help="Keep hourly rollups this many days (default: QUERY_LOG_HOURLY_RETENTION_DAYS or 180)",
+    )
+    parser.add_argument("--settle-seconds", type=int, default=60, help="Leave rows this recent for the next run")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Raw rows per rollup transaction")
+    parser.add_argument("--no-prune", action="store_true", help="Only roll up, do not delete anything")
+    args = parser.parse_args()
+
+    started = time.time()
+    with db.db_connection() as conn:
+        _ensure_rollup_tables(conn)
+        folded = rollup_query_log(conn, settle_seconds=args.settle_seconds, chunk_size=args.chunk_size)
+        print(f"[ROLLUP] Folded {folded} query_log row(s) into hourly/daily rollups")
+        if not args.no_prune:
+            raw, hourly = prune_query_log(conn, args.retention_days, args.hourly_retention_days)
+            print(f"[ROLLUP] Deleted {raw} raw row(s) older than {args.retention_days} day(s), "
+                  f"{hourly} hourly row(s) older than {args.hourly_retention_days} day(s)")
+    print(f"[ROLLUP] Done in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""backend/database.warm_payout_cache time budget, with the database calls replaced."""
+import threading
+import time
+
+from backend import database as db
+
+
+def test_dropdown_phase_counts_against_the_time_budget(monkeypatch):
+    release = threading.Event()
+
+    def slow_catalog():
+        release.wait(5)
+        return 0
+
+    monkeypatch.setattr(db, '_in_memory_engine', lambda: False)
+    monkeypatch.setattr(db, '_warm_dropdowns', slow_catalog)
+    monkeypatch.setattr(db, '_top_logged_filters', lambda top_k, days: [{'state': 'TN'}])
+    monkeypatch.setattr(db, 'get_top_5_payouts_batch', lambda chunk: [[] for _ in chunk])
+    started = time.monotonic()
+    try:
+        stats = db.warm_payout_cache(top_k=10, max_seconds=0.2, workers=2)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+    assert stats['timed_out'] and stats['dropdowns'] == 0
+    assert stats['warmed'] == 1
@@ -0,0 +1,332 @@
+"""The SQL, in-memory (scan and RuleIndex) and NumPy payout engines rank the same
+filter sets identically.
+
+The rules are a small sheet built to hit every matching rule: Except/Declined
+cells, wildcard cells ('', All, All Make, N/A), age and GVW bounds, RTO
+include/exclude lists, Date_from/Date_till windows and fractional payouts.
+The in-process engines always run. The SQL engine needs a MySQL server: set
+PAYOUT_PARITY_DB to the name of a scratch database (it is reset by the import)
+and the DB_HOST/DB_PORT/DB_USER/DB_PASS variables the app reads.
+"""
+import json
+import os
+import random
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import import_data as imp
+from backend import database as db
+from backend.config import RATE_TOKEN_FIELDS
+from backend.rule_index import RuleIndex
+from backend.vector_engine import VectorRuleTable
+
+TOP_N = 10
+
+_COLUMNS = [
+    "Company", "State", "RTO_Code", "Vehicle_Category", "Date_from", "Date_till", "Make", "Model",
+    "Vehicle_Type", "Fuel_Type", "Vehicle_Age_Min", "Vehicle_Age_Max", "Policy_Type", "Business_Type",
+    "CC_Slab", "Watt_Slab", "Seating_Capacity", "GVW_Min", "GVW_Max", "Conditions", "Final Payout",
+]
+
+
+def _row(company, payout, **cells):
+    return {"Company": company, "Final Payout": payout, **cells}
+
+
+SHEET = [
+    # Private Car: Except make/model/fuel/state cells, wildcards, fractional payouts, age bounds
+    _row("New India", 0.25, State="TN", Vehicle_Category="Private Car", Make="Except Tata,Maruti",
+         Policy_Type="Comprehensive(1+1)", Business_Type="Old,Rollover,Renewal", Conditions="Commission on OD"),
+    _row("New India", 0.12, State="TN", Vehicle_Category="Private Car", Make="Except Tata,Maruti",
+         Policy_Type="Comprehensive(1+1)", Business_Type="Old,Rollover,Renewal", Conditions="Commission on TP"),
+    _row("Acko", 22, State="All", Vehicle_Category="Private Car", Make="Maruti", Model="Except Models: Alto,Eeco",
+         Fuel_Type="Petrol,Diesel", Vehicle_Age_Min=1, Vehicle_Age_Max=5, Policy_Type="Comprehensive(1+1),SAOD",
+         CC_Slab="Upto 1000 CC,1000 to 1500 CC", Conditions="Commission on OD"),
+    _row("Digit", 0.3, State="Except TN,KA", Vehicle_Category="Private Car", Make="All Make", Model="N/A",
+         Fuel_Type="Except Diesel", Vehicle_Age_Min=3, Policy_Type="SAOD", Business_Type="Old",
+         Conditions="Commission on OD"),
+    _row("Digit", 18, State="KA", RTO_Code="01,02,03", Vehicle_Category="Private Car", Fuel_Type="Diesel",
+         Vehicle_Age_Max=10, Policy_Type="All", Business_Type="New", CC_Slab="1500 to 2500 CC",
+         Conditions="NCB > 25%, Commission on OD"),
+    _row("Tata AIG", 0.175, State="TN,PY", RTO_Code="Except 01,09", Vehicle_Category="Private Car", Make="Hyundai",
+         Model="Creta,i20", Fuel_Type="Petrol", Policy_Type="Bundle(1+3)", Conditions="Commission on OD"),
+    _row("Tata AIG", 35, State="TN", Vehicle_Category="Private Car", Policy_Type="SATP",
+         Date_till="2020-12-31", Conditions="Commission on TP"),
+    _row("Tata AIG", 40, State="TN", Vehicle_Category="Private Car", Policy_Type="SATP",
+         Date_from="2099-01-01", Conditions="Commission on TP"),
+    _row("Oriental Insurance", 15, Vehicle_Category="Private Car", Policy_Type="SATP", Conditions="Commission on TP"),
+    # Two Wheeler
+    _row("HDFC Ergo", 0.2, State="Except TN,KL,KA", Vehicle_Category="Two Wheeler", Vehicle_Type="Bike,Scooter",
+         Make="Except Honda,Hero", Policy_Type="Comprehensive(1+1)", Business_Type="New",
+         CC_Slab="75 to 150 CC,Below 75 CC", Conditions="commission on OD"),
+    _row("HDFC Ergo", 27.5, State="KL", Vehicle_Category="Two Wheeler", Vehicle_Type="Scooter", Make="Honda",
+         Fuel_Type="EV", Watt_Slab="Upto 2000 Watt", Vehicle_Age_Min=0, Vehicle_Age_Max=2,
+         Policy_Type="SAOD", Conditions="commission on OD"),
+    _row("Acko", 0.31, State="TN", RTO_Code="10,11,12", Vehicle_Category="Two Wheeler", Vehicle_Type="Bike",
+         Policy_Type="Bundle(1+5),Comprehensive(1+1),SATP", Business_Type="Old", CC_Slab="150 to 350 CC",
+         Conditions="commission on TP"),
+    # PCV: seating capacity, vehicle type exclusions
+    _row("National Insurance", 24, State="MP", Vehicle_Category="PCV", Vehicle_Type="Taxi", Fuel_Type="Petrol,CNG",
+         Seating_Capacity="Upto 10", Policy_Type="Comprehensive(1+1)", Conditions="Commission on OD"),
+    _row("National Insurance", 11, State="MP", Vehicle_Category="PCV", Vehicle_Type="Taxi", Fuel_Type="Petrol,CNG",
+         Seating_Capacity="Upto 10", Policy_Type="Comprehensive(1+1)", Conditions="Commission on TP"),
+    _row("Reliance", 0.145, State="Except MP", Vehicle_Category="PCV", Vehicle_Type="Except Auto",
+         Seating_Capacity="7 to 17,20 to 36", Policy_Type="SATP", Business_Type="Old", Conditions="Commission on TP"),
+    _row("Reliance", 9, Vehicle_Category="PCV", Vehicle_Type="Auto", Fuel_Type="EV", Watt_Slab="Above 2000 Watt",
+         Policy_Type="Comprehensive(1+1),SAOD", Conditions="Commission on OD"),
+    # Misc: Declined vehicle types
+    _row("Bajaj Allianz", 0.4, State="TN", Vehicle_Category="Misc", Vehicle_Type="Declined Tractor,Crane",
+         Policy_Type="Comprehensive(1+1),SATP", Business_Type="New,Old", Conditions="Commission on OD"),
+    _row("Bajaj Allianz", 12, State="TN", Vehicle_Category="Misc", Vehicle_Type="Tractor,E-Rickshaw",
+         Policy_Type="SATP", Conditions="Commission on TP"),
+    # GCV: GVW bounds (open ended on either side)
+    _row("ICICI Lombard", 15, State="TN,KA,KL", Vehicle_Category="GCV", Vehicle_Type="4 WHEELER GOODS",
+         Make="Except Tata", GVW_Min=2.301, GVW_Max=4.5, Policy_Type="Comprehensive(1+1),SATP",
+         Conditions="Commission on OD"),
+    _row("ICICI Lombard", 0.12, State="TN,KA,KL", Vehicle_Category="GCV", Vehicle_Type="4 WHEELER GOODS",
+         GVW_Min=4.5001, GVW_Max=12, Policy_Type="Comprehensive(1+1)", Business_Type="Old",
+         Conditions="Commission on OD"),
+    _row("SBI General", 21, State="Except HR,MP", Vehicle_Category="GCV", Vehicle_Type="3 WHEELER GOODS,Flatbed",
+         GVW_Min=12.0001, Vehicle_Age_Min=2, Vehicle_Age_Max=8, Policy_Type="SATP", Conditions="Commission on TP"),
+    _row("SBI General", 0.09, State="KA", Vehicle_Category="GCV", Vehicle_Type="Flatbed", GVW_Max=2.3,
+         Policy_Type="SAOD", Business_Type="New", Conditions="CPA Mandatory"),
+]
+
+
+def _sheet() -> pd.DataFrame:
+    return pd.DataFrame(SHEET, columns=_COLUMNS)
+
+
+def _fractional_payouts(sheet: pd.DataFrame) -> list:
+    """(sheet position, payout) of the rows with a 0..1 payout.
+
+    The import stores them as percentages; rates written by older imports or
+    payout updates still hold the fraction, so the tests put it back.
+    """
+    return [(pos, payout) for pos, payout in enumerate(sheet["Final Payout"]) if 0 < payout < 1]
+
+
+class _RatesConnection:
+    """Answers the queries of database._load_compiled_rules from the sheet, as the import would store it."""
+
+    def __init__(self, sheet: pd.DataFrame):
+        self.rates, self.included, self.excluded = [], [], []
+        fractions = dict(_fractional_payouts(sheet))
+        for rate_id, (_, row) in enumerate(sheet.iterrows(), start=1):
+            values, _, rto_rule, _ = imp._rate_insert_record(row)
+            payout = fractions.get(rate_id - 1, values[3])
+            self.rates.append((rate_id, payout, *values[4:11], values[11]))
+            self.included += [(rate_id, code) for code in rto_rule.include_codes]
+            self.excluded += [(rate_id, code) for code in rto_rule.exclude_codes]
+
+    def cursor(self, **kwargs):
+        conn = self
+
+        class Cursor:
+            def execute(self, sql, params=()):
+                if "rate_included_rto" in sql:
+                    self.rows = conn.included
+                elif "rate_excluded_rto" in sql:
+                    self.rows = conn.excluded
+                else:
+                    self.rows = conn.rates
+
+            def fetchall(self):
+                return list(self.rows)
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+
+def _snapshot(rules) -> dict:
+    snapshot = {'rules': rules, 'index': RuleIndex(rules, RATE_TOKEN_FIELDS), 'vector': VectorRuleTable(rules)}
+    snapshot['active'] = db._active_rule_set(snapshot, date.today())
+    return snapshot
+
+
+def _filter_sets(rules, count: int = 600, seed: int = 7) -> list:
+    """Targeted filter sets, then random ones: each starts from one rule's cells and swaps in
+    other tokens of the sheet, the names of Except/Declined lists and the wildcard spellings."""
+    rng = random.Random(seed)
+
+    def tokens(key):
+        cells = [r.cell(key) for r in rules]
+        return sorted({t for c in cells for t in c.tokens | c.excluded}) + ['Others', 'All', 'N/A']
+
+    def pick(rule, key, blank=0.3):
+        own = sorted(rule.cell(key).tokens | rule.cell(key).excluded)
+        roll = rng.random()
+        if roll < blank:
+            return None
+        if own and roll < 0.8:
+            return rng.choice(own)
+        return rng.choice(tokens(key))
+
+    rtos = sorted({c for r in rules for c in r.included_rtos | r.excluded_rtos}) + ['N/A', 'Others']
+    targeted = [
+        dict(state='TN', vehicle_category='Private Car', policy_type='Comprehensive(1+1)', business_type='Old', make='Honda'),
+        dict(state='TN', vehicle_category='Private Car', policy_type='Comprehensive(1+1)', business_type='Old', make='Maruti'),
+        dict(state='AP', vehicle_category='Private Car', policy_type='SAOD', business_type='Old', fuel_type='Petrol',
+             make='Maruti', model='Swift', vehicle_age='4', cc_slab='1000 to 1500 CC'),
+        dict(state='AP', vehicle_category='Private Car', policy_type='SAOD', business_type='Old', fuel_type='Diesel',
+             make='Maruti', model='Alto', vehicle_age='4'),
+        dict(state='TN', rto_code='09', vehicle_category='Private Car', policy_type='Bundle(1+3)', fuel_type='Petrol',
+             make='Hyundai', model='Creta'),
+        dict(state='TN', rto_code='05', vehicle_category='Private Car', policy_type='Bundle(1+3)', fuel_type='Petrol',
+             make='Hyundai', model='Creta'),
+        dict(state='TN', vehicle_category='Private Car', policy_type='SATP'),
+        dict(state='KA', rto_code='02', vehicle_category='Private Car', policy_type='SATP', business_type='New',
+             fuel_type='Diesel', vehicle_age='1', cc_slab='1500 to 2500 CC'),
+        dict(state='AP', vehicle_category='Two Wheeler', vehicle_type='Bike', policy_type='Comprehensive(1+1)',
+             business_type='New', make='Bajaj', cc_slab='Below 75 CC'),
+        dict(state='KL', vehicle_category='Two Wheeler', vehicle_type='Scooter', fuel_type='EV', make='Honda',
+             policy_type='SAOD', vehicle_age='1', watt_slab='Upto 2000 Watt'),
+        dict(state='TN', rto_code='11', vehicle_category='Two Wheeler', vehicle_type='Bike', policy_type='SATP',
+             business_type='Old', cc_slab='150 to 350 CC'),
+        dict(state='MP', vehicle_category='PCV', vehicle_type='Taxi', fuel_type='CNG', policy_type='Comprehensive(1+1)',
+             seating_capacity='Upto 10'),
+        dict(state='RJ', vehicle_category='PCV', vehicle_type='Staff Bus', policy_type='SATP', business_type='Old',
+             seating_capacity='20 to 36'),
+        dict(state='RJ', vehicle_category='PCV', vehicle_type='Auto', fuel_type='EV', policy_type='SAOD',
+             watt_slab='Above 2000 Watt'),
+        dict(state='TN', vehicle_category='Misc', vehicle_type='Ambulance', policy_type='SATP', business_type='Old'),
+        dict(state='TN', vehicle_category='Misc', vehicle_type='Tractor', policy_type='SATP', business_type='Old'),
+        dict(state='KA', vehicle_category='GCV', vehicle_type='4 WHEELER GOODS', make='Eicher',
+             policy_type='Comprehensive(1+1)', business_type='Old', gvw_value='3'),
+        dict(state='KA', vehicle_category='GCV', vehicle_type='4 WHEELER GOODS', make='Tata',
+             policy_type='Comprehensive(1+1)', business_type='Old', gvw_value='3'),
+        dict(state='KL', vehicle_category='GCV', vehicle_type='4 WHEELER GOODS', policy_type='Comprehensive(1+1)',
+             business_type='Old', gvw_slab='4.5|12'),
+        dict(state='TN', vehicle_category='GCV', vehicle_type='Flatbed', policy_type='SATP', vehicle_age='5',
+             gvw_slab='12|MAX'),
+        dict(state='KA', vehicle_category='GCV', vehicle_type='Flatbed', policy_type='SAOD', business_type='New',
+             gvw_value='1.5'),
+    ]
+    randomized = []
+    for _ in range(count):
+        rule = rng.choice(rules)
+        randomized.append(dict(
+            state=pick(rule, 'State', 0.2), rto_code=rng.choice([None, *rtos]),
+            vehicle_category=pick(rule, 'Vehicle_Category', 0.1), vehicle_type=pick(rule, 'Vehicle_Type'),
+            fuel_type=pick(rule, 'Fuel_Type'), policy_type=pick(rule, 'Policy_Type', 0.2),
+            business_type=pick(rule, 'Business_Type'), make=pick(rule, 'Make'), model=pick(rule, 'Model', 0.6),
+            cc_slab=pick(rule, 'CC_Slab', 0.6), watt_slab=pick(rule, 'Watt_Slab', 0.7),
+            seating_capacity=pick(rule, 'Seating_Capacity', 0.7),
+            vehicle_age=rng.choice([None, '0', '1', '2', '3', '5', '8', '10', '15']),
+            gvw_value=rng.choice([None, None, '1.5', '2.3', '3', '4.5', '4.50005', '12', '20']),
+            gvw_slab=rng.choice([None, None, '2|4.5', '4.5|12', '12|MAX']),
+        ))
+    return targeted + randomized
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return db._load_compiled_rules(_RatesConnection(_sheet()), None)
+
+
+def test_in_process_engines_agree(rules):
+    snapshot = _snapshot(rules)
+    nonempty = 0
+    for filters in _filter_sets(rules):
+        scanned = db._memory_payout_rows(rules, filters)
+        indexed = db._memory_payout_rows(rules, filters, snapshot['index'], snapshot['active'])
+        vector = db._vector_payout_rows(snapshot['vector'], filters, snapshot['active']['mask'])
+        assert indexed == scanned, filters
+        assert vector == scanned, filters
+        nonempty += bool(scanned)
+    assert nonempty > 100
+
+
+def test_fixture_exercises_the_matching_rules(rules):
+    def companies(**filters):
+        return [row['company_name'] for row in db._rank_payout_rows(db._memory_payout_rows(rules, filters), TOP_N)]
+
+    # Except cells
+    assert 'New India' in companies(state='TN', vehicle_category='Private Car', policy_type='Comprehensive(1+1)', make='Honda')
+    assert 'New India' not in companies(state='TN', vehicle_category='Private Car', policy_type='Comprehensive(1+1)', make='Maruti')
+    # Declined cells
+    assert 'Bajaj Allianz' in companies(state='TN', vehicle_category='Misc', vehicle_type='Ambulance', policy_type='SATP')
+    assert companies(state='TN', vehicle_category='Misc', vehicle_type='Crane', policy_type='Comprehensive(1+1)') == []
+    # Wildcards: All Make / N/A model, Policy_Type All
+    assert 'Digit' in companies(state='AP', vehicle_category='Private Car', policy_type='SAOD', fuel_type='Petrol',
+                                make='Kia', model='Seltos', vehicle_age='4')
+    # Age bounds
+    assert 'Digit' not in companies(state='AP', vehicle_category='Private Car', policy_type='SAOD', vehicle_age='2')
+    # GVW bounds
+    gcv = dict(state='KA', vehicle_category='GCV', vehicle_type='4 WHEELER GOODS', policy_type='Comprehensive(1+1)')
+    assert 'ICICI Lombard' in companies(**gcv, gvw_value='3')
+    assert 'ICICI Lombard' not in companies(**gcv, gvw_value='20')
+    # Fractional payouts are ranked as percentages
+    ranked = db._rank_payout_rows(db._memory_payout_rows(
+        rules, dict(state='TN', vehicle_category='Private Car', policy_type='Comprehensive(1+1)', make='Honda')), TOP_N)
+    assert [(r['company_name'], r['payout_percentage']) for r in ranked] == [
+        ('New India', 25.0), ('New India', 12.0),
+    ]
+
+
+def _sql_connection(monkeypatch, tmp_path):
+    db_name = os.getenv('PAYOUT_PARITY_DB')
+    if not db_name:
+        pytest.skip("PAYOUT_PARITY_DB not set (scratch MySQL database for the SQL engine)")
+    sheet_path = tmp_path / "parity.xlsx"
+    _sheet().to_excel(sheet_path, index=False)
+    monkeypatch.setenv('DB_NAME', db_name)
+    monkeypatch.setattr(imp, 'DEFAULT_FILES', [sheet_path])
+    imp.import_excels()
+    conn = imp._connect()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM rates WHERE import_id = %s ORDER BY id", (imp._get_latest_import_id(conn),))
+    rate_ids = [r[0] for r in cur.fetchall()]
+    for pos, payout in _fractional_payouts(_sheet()):
+        cur.execute("UPDATE rates SET final_payout = %s WHERE id = %s", (payout, rate_ids[pos]))
+    conn.commit()
+    cur.close()
+    return conn
+
+
+def test_sql_engine_agrees_with_in_process_engines(monkeypatch, tmp_path):
+    conn = _sql_connection(monkeypatch, tmp_path)
+    try:
+        import_id = imp._get_latest_import_id(conn)
+        rules = db._load_compiled_rules(conn, import_id)
+        snapshot = _snapshot(rules)
+        for filters in _filter_sets(rules, count=300):
+            expected = db._rank_payout_rows(db._memory_payout_rows(rules, filters), TOP_N)
+            vector = db._vector_payout_rows(snapshot['vector'], filters, snapshot['active']['mask'])
+            sql_all = db._sql_payout_rows(conn, import_id, filters)
+            sql_page = db._sql_payout_rows(conn, import_id, filters, TOP_N)
+            assert db._rank_payout_rows(vector, TOP_N) == expected, filters
+            assert db._rank_payout_rows(sql_all, TOP_N) == expected, json.dumps(filters)
+            assert db._rank_payout_rows(sql_page, TOP_N) == expected, json.dumps(filters)
+    finally:
+        conn.close()
+
+
+def test_sql_dropdown_cascade_agrees_with_facet_match(monkeypatch, tmp_path):
+    """_distinct_with_filters in SQL and through RuleIndex.facet_match, filtering on the Except/Declined columns."""
+    conn = _sql_connection(monkeypatch, tmp_path)
+    try:
+        rules = db._load_compiled_rules(conn, imp._get_latest_import_id(conn))
+    finally:
+        conn.close()
+    index = RuleIndex(rules, RATE_TOKEN_FIELDS)
+    monkeypatch.setattr(db, 'get_conn', imp._connect)
+    monkeypatch.setattr(db, '_ACTIVE_IMPORT', None)
+    monkeypatch.setattr(db, '_get_rule_index', lambda conn=None: index)
+    exclusion_keys = sorted({key for row in SHEET for key, value in row.items()
+                             if str(value).lower().startswith(('except ', 'declined '))} - {'RTO_Code'})
+    checked = 0
+    for key in exclusion_keys:
+        cells = [rule.cell(key) for rule in rules]
+        values = sorted({t for c in cells for t in c.tokens | c.excluded}) + ['Others', ' Diesel ']
+        for value in values:
+            monkeypatch.setattr(db, '_in_memory_engine', lambda: False)
+            sql = db._distinct_with_filters('Company', [(key, value)])
+            monkeypatch.setattr(db, '_in_memory_engine', lambda: True)
+            assert db._distinct_with_filters('Company', [(key, value)]) == sql, (key, value)
+            checked += bool(sql)
+    assert checked > 10
@@ -0,0 +1,102 @@
+"""backend/query_log.QueryLogWriter with a recording fake connection."""
+import json
+import time
+
+from backend.query_log import QueryLogWriter
+
+INSERT_SQL = "INSERT INTO query_log (state, result_count, ts) VALUES (%s,%s,COALESCE(%s, NOW()))"
+
+
+class _DataError(Exception):
+    pass
+
+
+class _Recorder:
+    def __init__(self, fail=False, max_state=None):
+        self.rows = []
+        self.fail = fail
+        self.max_state = max_state
+
+    def connect(self):
+        recorder = self
+
+        class Cursor:
+            def executemany(self, sql, rows):
+                if recorder.fail:
+                    raise RuntimeError("database down")
+                if recorder.max_state is not None and any(len(row[0]) > recorder.max_state for row in rows):
+                    raise _DataError("Data too long for column 'state'")
+                recorder.rows.extend(rows)
+
+            def close(self):
+                pass
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+            def commit(self):
+                pass
+
+            def close(self):
+                pass
+
+        return Connection()
+
+
+def _writer(recorder, spill_path=None):
+    return QueryLogWriter(
+        recorder.connect, lambda cur: None, INSERT_SQL, flush_ms=20, spill_path=spill_path, row_errors=(_DataError,)
+    )
+
+
+def _wait_for(predicate, seconds=5.0):
+    deadline = time.monotonic() + seconds
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_rows_are_written_with_their_queued_timestamp():
+    recorder = _Recorder()
+    writer = _writer(recorder)
+    writer.enqueue([("TN", 3, "2024-05-01 10:05:00")])
+    writer.stop()
+    assert recorder.rows == [("TN", 3, "2024-05-01 10:05:00")]
+
+
+def test_failed_flush_replays_with_original_timestamp(tmp_path):
+    recorder = _Recorder(fail=True)
+    writer = _writer(recorder, spill_path=str(tmp_path / "query_log.jsonl"))
+    writer.enqueue([("TN", 3, "2024-05-01 10:05:00")])
+    assert _wait_for(lambda: writer.stats()["spilled"] == 1)
+    recorder.fail = False
+    writer._replay_after = 0.0
+    assert _wait_for(lambda: recorder.rows)
+    writer.stop()
+    assert recorder.rows == [("TN", 3, "2024-05-01 10:05:00")]
+
+
+def test_leftover_replay_file_is_read_on_start(tmp_path):
+    spill = tmp_path / "query_log.jsonl"
+    # A crash mid-replay left .replay behind; newer rows were spilled since (one from an older version, without ts)
+    (tmp_path / "query_log.jsonl.replay").write_text(json.dumps(["KA", 1, "2024-05-01 09:00:00"]) + "\n")
+    spill.write_text(json.dumps(["TN", 2]) + "\n")
+    recorder = _Recorder()
+    writer = _writer(recorder, spill_path=str(spill))
+    writer.start()
+    assert _wait_for(lambda: len(recorder.rows) == 2)
+    writer.stop()
+    assert recorder.rows == [("KA", 1, "2024-05-01 09:00:00"), ("TN", 2, None)]
+    assert not spill.exists() and not (tmp_path / "query_log.jsonl.replay").exists()
+
+
+def test_rejected_row_is_dropped_alone_and_not_spilled(tmp_path):
+    recorder = _Recorder(max_state=2)
+    spill = tmp_path / "query_log.jsonl"
+    writer = _writer(recorder, spill_path=str(spill))
+    writer.enqueue([("TN", 1, "2024-05-01 10:00:00"), ("X" * 80, 2, "2024-05-01 10:00:00"), ("KA", 3, "2024-05-01 10:00:00")])
+    writer.stop()
+    assert recorder.rows == [("TN", 1, "2024-05-01 10:00:00"), ("KA", 3, "2024-05-01 10:00:00")]
+    assert writer.stats()["dropped"] == 1
+    assert not spill.exists()
@@ -0,0 +1,105 @@
+"""scripts/rollup_query_log.py against SQLite, with statements passed through
+the same parameter substitution as mysql.connector (only %s is replaced)."""
+import re
+import sqlite3
+from datetime import datetime
+
+import rollup_query_log as rollup
+
+_MYSQL_FORMAT = {"Y": "%Y", "m": "%m", "d": "%d", "H": "%H", "i": "%M", "s": "%S"}
+
+
+def _date_format(value, fmt):
+    """MySQL DATE_FORMAT: %% is a literal %, %X a format specifier."""
+    ts = datetime.fromisoformat(value)
+    return re.sub(r"%(.)", lambda m: "%" if m.group(1) == "%" else ts.strftime(_MYSQL_FORMAT[m.group(1)]), fmt)
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self._cur = conn.cursor()
+
+    def execute(self, sql, params=()):
+        sql = sql.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE")
+        sql = re.sub(r"ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET", sql)
+        sql = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+        self._cur.execute(sql, params)
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def close(self):
+        self._cur.close()
+
+
+class _Connection:
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.create_function("DATE_FORMAT", 2, _date_format)
+        dimensions = ", ".join(f"{c} TEXT NOT NULL" for c in ("state", "rto", "vehicle_type", "fuel_type", "policy_type", "result_bucket"))
+        keys = "state, rto, vehicle_type, fuel_type, policy_type, result_bucket"
+        self.db.executescript(f"""
+            CREATE TABLE query_log (id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT, state TEXT, rto TEXT,
+                vehicle_type TEXT, fuel_type TEXT, policy_type TEXT, result_count INT, filters_json TEXT);
+            CREATE TABLE query_log_hourly (bucket_start TEXT NOT NULL, {dimensions}, queries INT NOT NULL DEFAULT 0,
+                results_total INT NOT NULL DEFAULT 0, PRIMARY KEY (bucket_start, {keys}));
+            CREATE TABLE query_log_daily (bucket_date TEXT NOT NULL, {dimensions}, queries INT NOT NULL DEFAULT 0,
+                results_total INT NOT NULL DEFAULT 0, PRIMARY KEY (bucket_date, {keys}));
+            CREATE TABLE query_log_rollup_state (name TEXT PRIMARY KEY, last_id INT NOT NULL DEFAULT 0);
+            INSERT INTO query_log_rollup_state (name, last_id) VALUES ('query_log', 0);
+        """)
+
+    def cursor(self):
+        return _Cursor(self.db)
+
+    def commit(self):
+        self.db.commit()
+
+
+def _log(conn, ts, state, result_count):
+    conn.db.execute(
+        "INSERT INTO query_log (ts, state, vehicle_type, result_count) VALUES (?, ?, 'Two Wheeler', ?)",
+        (ts, state, result_count),
+    )
+
+
+def test_hourly_and_daily_rollup_buckets():
+    conn = _Connection()
+    _log(conn, "2024-05-01 10:05:00", "TN", 3)
+    _log(conn, "2024-05-01 10:55:00", "TN", 2)
+    _log(conn, "2024-05-01 11:10:00", "TN", 0)
+    _log(conn, "2024-05-02 09:00:00", "KA", 7)
+
+    assert rollup.rollup_query_log(conn, settle_seconds=0) == 4
+
+    hourly = conn.db.execute(
+        "SELECT bucket_start, state, result_bucket, queries, results_total FROM query_log_hourly ORDER BY 1, 2, 3"
+    ).fetchall()
+    assert hourly == [
+        ("2024-05-01 10:00:00", "TN", "1-4", 2, 5),
+        ("2024-05-01 11:00:00", "TN", "0", 1, 0),
+        ("2024-05-02 09:00:00", "KA", "5+", 1, 7),
+    ]
+    daily = conn.db.execute(
+        "SELECT bucket_date, state, SUM(queries) FROM query_log_daily GROUP BY 1, 2 ORDER BY 1"
+    ).fetchall()
+    assert daily == [("2024-05-01", "TN", 3), ("2024-05-02", "KA", 1)]
+
+
+def test_rollup_is_incremental():
+    conn = _Connection()
+    _log(conn, "2024-05-01 10:05:00", "TN", 1)
+    rollup.rollup_query_log(conn, settle_seconds=0)
+    _log(conn, "2024-05-01 10:45:00", "TN", 1)
+
+    assert rollup.rollup_query_log(conn, settle_seconds=0) == 1
+    assert conn.db.execute("SELECT bucket_start, queries FROM query_log_hourly").fetchall() == [
+        ("2024-05-01 10:00:00", 2)
+    ]
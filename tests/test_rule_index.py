@@ -0,0 +1,29 @@
+"""backend/rule_index.RuleIndex over cells compiled like the in-memory engine's."""
+from backend import database as db
+from backend.rule_index import RuleIndex, iter_bits
+
+CELLS = [None, 'All', 'N/A', 'Petrol', 'Petrol, Diesel', 'Except Diesel', 'Declined Diesel,CNG', 'Except CNG']
+
+
+class _Rule:
+    def __init__(self, value):
+        self._cell = db._compile_cell(value)
+
+    def cell(self, key):
+        return self._cell if key == 'Fuel_Type' else db._BLANK_CELL
+
+
+def _facet(values):
+    index = RuleIndex([_Rule(v) for v in CELLS], ['Fuel_Type'])
+    return [CELLS[pos] for pos in iter_bits(index.facet_match('Fuel_Type', values))]
+
+
+def test_facet_match_applies_exclusion_lists():
+    assert _facet(['Diesel']) == ['All', 'Petrol, Diesel', 'Except CNG']
+    assert _facet(['CNG']) == ['All', 'Except Diesel']
+    assert _facet(['Petrol']) == ['All', 'Petrol', 'Petrol, Diesel', 'Except Diesel', 'Declined Diesel,CNG', 'Except CNG']
+    assert _facet(['Diesel', 'CNG']) == ['All', 'Petrol, Diesel']
+
+
+def test_facet_match_strips_values():
+    assert _facet([' Diesel ']) == _facet(['Diesel'])
@@ -0,0 +1,20 @@
+"""get_distinct_* helpers over static data must not need the database."""
+from backend import database as db
+
+
+def _no_database():
+    raise AssertionError('static dropdown helper read the data version')
+
+
+def test_static_helpers_skip_the_data_version(monkeypatch):
+    monkeypatch.setattr(db, 'get_data_version', _no_database)
+    assert db.get_distinct_vehicle_ages()[:2] == ['New', '1']
+    assert db.get_distinct_rtos('TN')
+    assert db.get_distinct_rto_options('TN')
+
+
+def test_rto_options_are_not_shared_between_callers():
+    options = db.get_distinct_rto_options('TN')
+    original = options[0]['label']
+    options[0]['label'] = 'changed'
+    assert db.get_distinct_rto_options('TN')[0]['label'] == original